@@ -34,6 +34,7 @@ class TestSuite:
         stdout: Optional[Any] = ...,
         stderr: Optional[Any] = ...,
     ) -> None: ...
+    def build_xml_doc(self, encoding: Optional[str] = ...) -> Any: ...
 
 class TestCase:
     name: Any = ...
@@ -85,9 +86,15 @@ class TestCase:
         self, message: Optional[Any] = ..., output: Optional[Any] = ...
     ) -> None: ...
 
+def to_xml_report_string(
+    test_suites: List[TestSuite],
+    prettyprint: bool = True,
+    encoding: Optional[str] = None,
+) -> str: ...
 def to_xml_report_file(
     file_descriptor: IO[Any],
     test_suites: List[TestSuite],
     prettyprint: bool = True,
     encoding: Optional[str] = None,
 ) -> None: ...
+def _clean_illegal_xml_chars(string_to_clean: str) -> str: ...
@@ -1,19 +1,52 @@
 """Command line argument parsing for cwltest."""
 
 import argparse
+import shlex
 import sys
 from importlib.metadata import PackageNotFoundError, version
 
 from cwltest import DEFAULT_TIMEOUT
 
 
+def _shard(value: str) -> tuple[int, int]:
+    """Parse a shard specification like 2/5 into a 0-based index and a count."""
+    try:
+        index, count = (int(number) for number in value.split("/"))
+    except ValueError as err:
+        raise argparse.ArgumentTypeError(
+            f"invalid shard {value!r}, expected INDEX/COUNT like 1/4"
+        ) from err
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(
+            f"invalid shard {value!r}, INDEX must be between 1 and COUNT"
+        )
+    return index - 1, count
+
+
+def _tag_timeout(value: str) -> tuple[str, int]:
+    """Parse a timeout for a tag like workflow=1800."""
+    tag, _, seconds = value.partition("=")
+    try:
+        return tag, int(seconds)
+    except ValueError as err:
+        raise argparse.ArgumentTypeError(
+            f"invalid tag timeout {value!r}, expected TAG=SECONDS like workflow=1800"
+        ) from err
+
+
 def arg_parser() -> argparse.ArgumentParser:
     """Generate a command Line argument parser for cwltest."""
     parser = argparse.ArgumentParser(
         description="Common Workflow Language testing framework"
     )
     parser.add_argument(
-        "--test", type=str, help="YAML file describing test cases", required=True
+        "--test",
+        type=str,
+        action="append",
+        required=True,
+        help="YAML file describing test cases. Repeat to run several test "
+        "files on the same pool of workers; -n, -s, -N and -S then apply to "
+        "each of them.",
     )
     parser.add_argument(
         "--basedir", type=str, help="Basedir to use for tests", default="."
@@ -77,7 +110,11 @@ def arg_parser() -> argparse.ArgumentParser:
         dest="testargs",
     )
     parser.add_argument(
-        "args", help="arguments to pass first to tool runner", nargs=argparse.REMAINDER
+        "args",
+        help="arguments to pass first to tool runner; ${CWLTEST_CORES} and "
+        "${CWLTEST_RAM} in them, and in the --test-arg prefixes, are replaced "
+        "by the cores and MiB of memory of each test",
+        nargs=argparse.REMAINDER,
     )
     parser.add_argument(
         "-j",
@@ -104,12 +141,344 @@ def arg_parser() -> argparse.ArgumentParser:
             DEFAULT_TIMEOUT, DEFAULT_TIMEOUT / 60
         ),
     )
+    parser.add_argument(
+        "--tag-timeout",
+        type=_tag_timeout,
+        action="append",
+        default=[],
+        metavar="TAG=SECONDS",
+        help="The timeout of the tests with a tag, instead of --timeout; the "
+        "longest one applies to tests with several such tags. Can be repeated. "
+        "The timeout field of a test takes precedence.",
+    )
+    parser.add_argument(
+        "--adaptive-timeout",
+        type=float,
+        default=None,
+        metavar="FACTOR",
+        help="Derive the timeout of each test from its durations in --history: "
+        "their 95th percentile times FACTOR, adjusted to the speed of this "
+        "host measured at start up, and not below 30 seconds. Only shortens "
+        "the timeout given by --tag-timeout or --timeout, and only for tests "
+        "with at least 3 recorded durations.",
+    )
+    parser.add_argument(
+        "--hang-timeout",
+        type=float,
+        default=None,
+        metavar="SECONDS",
+        help="Fail a test as hung, before --timeout, when its runner made no "
+        "progress for that long: no process of the runner used CPU time, did "
+        "I/O, started or exited, and no file was written in the output "
+        "directory. Needs /proc.",
+    )
+    parser.add_argument(
+        "--kill-grace",
+        type=float,
+        default=3.0,
+        metavar="SECONDS",
+        help="How long the processes of a runner that timed out, was "
+        "interrupted or left some of them running are given to exit after "
+        "SIGTERM, before SIGKILL.",
+    )
+    parser.add_argument(
+        "--reruns",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Run a failed test again, up to N times, after the tests queued "
+        "before and in a new output directory. A test that passes on a rerun "
+        "passes, and is reported as flaky.",
+    )
+    parser.add_argument(
+        "--reruns-delay",
+        type=float,
+        default=0.0,
+        metavar="SECONDS",
+        help="Wait that long before the first rerun of a test, and twice as "
+        "long before each of its next reruns.",
+    )
+    parser.add_argument(
+        "--test-memory",
+        type=int,
+        default=None,
+        metavar="MIB",
+        help="Limit the memory of the runner of each test to MIB mebibytes: "
+        "the address space of each of its processes, or with --cgroup, the "
+        "memory of all of them. A test over the limit fails as such.",
+    )
+    parser.add_argument(
+        "--test-cpus",
+        type=float,
+        default=None,
+        metavar="N",
+        help="With --cgroup, limit the runner of each test to the time of N "
+        "CPUs, which can be fractional.",
+    )
+    parser.add_argument(
+        "--test-cpu-time",
+        type=int,
+        default=None,
+        metavar="SECONDS",
+        help="Limit each process of the runner of a test to that much CPU time.",
+    )
+    parser.add_argument(
+        "--test-disk",
+        type=int,
+        default=None,
+        metavar="MIB",
+        help="Fail a test once the files in its output directory take more "
+        "than MIB mebibytes; it also limits the size of each file written by "
+        "the runner.",
+    )
+    parser.add_argument(
+        "--pin-cpus",
+        action="store_true",
+        help="Run the runner of each test on a set of CPUs of its own, "
+        "disjoint from the ones of the other tests running at the same time: "
+        "as many as the coresMin of its tool, or an equal share between the "
+        "-j slots. The CPUs are listed in the CWLTEST_CPUS environment "
+        "variable of the runner, and counted in CWLTEST_NUM_CPUS.",
+    )
+    parser.add_argument(
+        "--preflight",
+        action="store_true",
+        help="Before running the tests, check that their tools, job files and "
+        "the File and Directory locations in these exist, and report the "
+        "missing ones.",
+    )
+    parser.add_argument(
+        "--preflight-only",
+        action="store_true",
+        help="Only run the --preflight check, exiting with 1 when files are "
+        "missing.",
+    )
+    parser.add_argument(
+        "--skip-broken",
+        action="store_true",
+        help="Run the --preflight check, and report the tests with missing "
+        "files as failed without running them.",
+    )
+    parser.add_argument(
+        "--prefetch-images",
+        action="store_true",
+        help="Pull the dockerPull images of the DockerRequirements of the "
+        "selected tests while they run, each image once; a test waits for "
+        "its own images before it starts.",
+    )
+    parser.add_argument(
+        "--container-cli",
+        type=str,
+        default="docker",
+        metavar="COMMAND",
+        help="The command to pull the images with, for instance podman "
+        "(default docker).",
+    )
+    parser.add_argument(
+        "--prefetch-jobs",
+        type=int,
+        default=4,
+        metavar="N",
+        help="How many images are pulled at the same time (default 4).",
+    )
+    parser.add_argument(
+        "--cgroup",
+        type=str,
+        default=None,
+        metavar="DIR",
+        help="A cgroup v2 directory delegated to cwltest, with the memory and "
+        "cpu controllers enabled in its cgroup.subtree_control. Each test then "
+        "runs in a cgroup of its own, created there, for --test-memory and "
+        "--test-cpus.",
+    )
     parser.add_argument(
         "--badgedir",
         type=str,
         help="Create JSON badges, one for each tag (plus a computed 'all' tag) "
         " and store them in this directory.",
     )
+    parser.add_argument(
+        "--executor",
+        type=str,
+        default=None,
+        metavar="NAME",
+        help="Run the tests with a Python function instead of --tool: the "
+        "name of a 'cwltest.executor' entry point, or MODULE:FUNCTION. The "
+        "function has the signature of the pytest_cwl_execute_test hook, and "
+        "runs in a pool of -j processes that import it once.",
+    )
+    parser.add_argument(
+        "--batch-executor",
+        type=str,
+        default=None,
+        metavar="NAME",
+        help="Run the tests in batches with a Python function: the name of a "
+        "'cwltest.batch_executor' entry point, or MODULE:FUNCTION. The function "
+        "has the signature of the pytest_cwl_execute_tests_batch hook; up to -j "
+        "batches run at the same time, in the cwltest process. When it returns "
+        "None, the tests run with --executor, or --tool.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=10,
+        metavar="N",
+        help="The largest number of tests in a batch of --batch-executor.",
+    )
+    parser.add_argument(
+        "--session-hooks",
+        type=str,
+        default=None,
+        metavar="MODULE",
+        help="A module, or the path of a Python file, with the "
+        "pytest_cwl_session_start and pytest_cwl_session_finish hooks to call "
+        "before and after the tests. What the start hook returns is given to "
+        "the functions of --executor and --batch-executor that have a 'session' "
+        "parameter.",
+    )
+    parser.add_argument(
+        "--max-tests-per-worker",
+        type=int,
+        default=None,
+        metavar="N",
+        help="With --executor, replace each worker process after N tests, "
+        "to free the memory leaked by the function.",
+    )
+    parser.add_argument(
+        "--max-worker-rss",
+        type=int,
+        default=None,
+        metavar="MIB",
+        help="With --executor, replace a worker process once its resident "
+        "memory exceeds MIB mebibytes after a test.",
+    )
+    parser.add_argument(
+        "--track-memory",
+        action="store_true",
+        help="With --executor, measure the growth of the memory of the "
+        "workers during each test, also with tracemalloc, and report the "
+        "tests that grew it the most.",
+    )
+    parser.add_argument(
+        "--output-limit",
+        type=int,
+        default=256,
+        metavar="KIB",
+        help="How much of the standard output and error of each runner is "
+        "kept for the results and the reports: the first and last KIB/2 "
+        "kibibytes of each (default 256). They are written to files while "
+        "the runner runs, and the output object is parsed from the file.",
+    )
+    parser.add_argument(
+        "--log-dir",
+        type=str,
+        default=None,
+        metavar="DIR",
+        help="Keep the standard output and error of the runner of each test "
+        "in files under DIR, that the reports refer to when they are cut.",
+    )
+    parser.add_argument(
+        "--zygote",
+        type=str,
+        default=None,
+        metavar="MODULE:FUNCTION",
+        help="Start each test by forking a process that imported the console "
+        "script entry point of the CWL runner once, like cwltool.main:run, "
+        "instead of executing --tool. MODULE can also be the path of a Python "
+        "file. POSIX only.",
+    )
+    parser.add_argument(
+        "--warm-runner",
+        type=shlex.split,
+        default=None,
+        metavar="COMMAND",
+        help="Command line of a CWL runner that reads tests to run from its "
+        "standard input and keeps running (see the cwltest.warm module), to "
+        "use instead of starting --tool for each test. Up to -j of them are "
+        "kept running. 'python -m cwltest.warm cwltool.main:main' provides "
+        "this for runners with a main(argsl, stdout) function.",
+    )
+    parser.add_argument(
+        "--matrix",
+        type=str,
+        default=None,
+        metavar="FILE",
+        help="YAML file listing CWL runners and arguments (a list of mappings "
+        "with 'name', 'tool' and 'args') to run each test with, on the same "
+        "pool of workers. The JUnit XML report gets one test suite, and "
+        "--badgedir one sub-directory, for each of them; a table comparing "
+        "the results is printed at the end.",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running after the tests finished, and re-run the tests whose "
+        "entry, tool, job or input files change. Stop with Ctrl-C.",
+    )
+    parser.add_argument(
+        "--watch-interval",
+        type=float,
+        default=1.0,
+        help="Seconds between checks for changed files when inotify is not "
+        "available (default 1.0).",
+    )
+    parser.add_argument(
+        "--history",
+        type=str,
+        default=None,
+        help="JSON file where the outcome of each run is recorded, per CWL "
+        "runner (tool path and version).",
+    )
+    parser.add_argument(
+        "--skip-known-unsupported",
+        action="store_true",
+        help="Do not run the tests with an optional tag that the CWL runner "
+        "consistently reported as unsupported in earlier runs, according to "
+        "--history. They are reported as unsupported.",
+    )
+    parser.add_argument(
+        "--reprobe-interval",
+        type=float,
+        default=7.0,
+        help="Days after which the tests of a known unsupported tag are run "
+        "again, to check if the CWL runner still does not support it "
+        "(default 7).",
+    )
+    parser.add_argument(
+        "--isolate-flaky",
+        type=float,
+        default=None,
+        metavar="RATE",
+        help="Run the tests that passed only on a rerun in at least RATE (0 to "
+        "1) of their runs with --reruns, according to --history, after the "
+        "other tests and one at a time.",
+    )
+    parser.add_argument(
+        "--shard",
+        type=_shard,
+        default=None,
+        metavar="INDEX/COUNT",
+        help="Only run one part of the selected tests, for instance 2/4 for the "
+        "second of four parts. The parts take about the same time if --history "
+        "has durations of the tests, otherwise tests are assigned by a hash of "
+        "their identifier.",
+    )
+    parser.add_argument(
+        "--journal",
+        type=str,
+        default=None,
+        help="Append the result of each test to this file as soon as the test "
+        "completes, so that an interrupted run can be resumed with --resume.",
+    )
+    parser.add_argument(
+        "--resume",
+        type=str,
+        default=None,
+        metavar="JOURNAL",
+        help="Only run the tests that have no result in this journal yet, and "
+        "report on all of them. New results are appended to the same journal, "
+        "unless --journal is given.",
+    )
 
     try:
         ver = version("cwltest")
@@ -118,3 +487,137 @@ def arg_parser() -> argparse.ArgumentParser:
     parser.add_argument("--version", action="version", version=f"{sys.argv[0]} {ver}")
 
     return parser
+
+
+def merge_arg_parser() -> argparse.ArgumentParser:
+    """Generate a command line argument parser for ``cwltest merge``."""
+    parser = argparse.ArgumentParser(
+        prog="cwltest merge",
+        description="Combine the journals of several cwltest runs (for instance "
+        "from --shard or --resume) into one JUnit XML report and one set of "
+        "badges.",
+    )
+    parser.add_argument(
+        "journals", nargs="+", metavar="JOURNAL", help="Journal files, see --journal"
+    )
+    parser.add_argument(
+        "--policy",
+        choices=("latest", "worst"),
+        default="latest",
+        help="Which result to keep for a test that has several: the one written "
+        "last (the default) or the worst one (failure, then unsupported, then "
+        "success). Journals are read in the given order.",
+    )
+    parser.add_argument(
+        "--junit-xml", type=str, default=None, help="Path to JUnit xml file"
+    )
+    parser.add_argument(
+        "--badgedir",
+        type=str,
+        help="Create JSON badges, one for each tag (plus a computed 'all' tag) "
+        " and store them in this directory.",
+    )
+    return parser
+
+
+def coordinator_arg_parser() -> argparse.ArgumentParser:
+    """Generate a command line argument parser for ``cwltest coordinator``."""
+    parser = arg_parser()
+    parser.prog = "cwltest coordinator"
+    parser.description = (
+        "Run the tests on the workers (see 'cwltest worker') that connect to "
+        "this coordinator, instead of in this process. Accepts all the options "
+        "of cwltest, -j excepted."
+    )
+    parser.add_argument(
+        "--listen",
+        type=str,
+        required=True,
+        metavar="ADDRESS",
+        help="Address to wait for workers on: unix:PATH for a Unix domain "
+        "socket, or [tcp:]HOST:PORT. There is no authentication, do not "
+        "listen on addresses reachable by untrusted parties.",
+    )
+    parser.add_argument(
+        "--lease-timeout",
+        type=float,
+        default=None,
+        help="Seconds after which a test handed to a worker that did not send "
+        "back a result is handed to another worker. Defaults to --timeout "
+        "plus 60 seconds.",
+    )
+    return parser
+
+
+def worker_arg_parser() -> argparse.ArgumentParser:
+    """Generate a command line argument parser for ``cwltest worker``."""
+    parser = argparse.ArgumentParser(
+        prog="cwltest worker",
+        description="Run tests handed out by a cwltest coordinator.",
+    )
+    parser.add_argument(
+        "--connect",
+        type=str,
+        required=True,
+        metavar="ADDRESS",
+        help="Address of the coordinator: unix:PATH or [tcp:]HOST:PORT.",
+    )
+    parser.add_argument(
+        "-j",
+        type=int,
+        default=1,
+        help="Specifies the number of tests to run simultaneously "
+        "(defaults to one).",
+    )
+    parser.add_argument(
+        "--tool",
+        type=str,
+        default=None,
+        help="CWL runner executable to use, instead of the coordinator's one.",
+    )
+    parser.add_argument(
+        "--connect-timeout",
+        type=float,
+        default=60.0,
+        help="Seconds to keep trying to connect to the coordinator (default 60).",
+    )
+    return parser
+
+
+def serve_arg_parser() -> argparse.ArgumentParser:
+    """Generate a command line argument parser for ``cwltest serve``."""
+    parser = argparse.ArgumentParser(
+        prog="cwltest serve",
+        description="Keep loaded test files and a pool of test runners in "
+        "memory, and run tests on requests to a local HTTP API.",
+    )
+    parser.add_argument(
+        "--host",
+        type=str,
+        default="127.0.0.1",
+        help="Address to listen on (default 127.0.0.1). There is no "
+        "authentication, do not listen on addresses reachable by untrusted "
+        "parties.",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=8123,
+        help="Port to listen on (default 8123, 0 for any free port).",
+    )
+    parser.add_argument(
+        "-j",
+        type=int,
+        default=1,
+        help="Specifies the number of tests to run simultaneously, shared "
+        "by all the runs (defaults to one).",
+    )
+    parser.add_argument(
+        "--allow-tool",
+        action="append",
+        default=[],
+        metavar="TOOL",
+        help="A CWL runner that runs may give as --tool, besides cwl-runner. "
+        "Can be repeated.",
+    )
+    return parser
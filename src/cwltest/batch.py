@@ -0,0 +1,165 @@
+"""
+Run tests in batches, for runners that prefer to be given many jobs at once.
+
+Runners backed by a batch scheduler or a cluster schedule many jobs at once
+far better than one at a time. The tests queued here are handed to a
+function with the signature of the ``pytest_cwl_execute_tests_batch`` hook
+(see :py:mod:`cwltest.hooks`), up to a number of tests at a time, and their
+results come back as they complete.
+"""
+
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import Executor, Future
+from typing import Any, NamedTuple
+
+from cwltest import logger, utils
+from cwltest.utils import CWLTestConfig, TestResult
+
+
+class _Task(NamedTuple):
+    options: dict[str, Any]
+    test: dict[str, Any]
+    on_start: Callable[[], None] | None
+    future: Future[TestResult]
+
+
+class BatchExecutor(Executor):
+    """Hand the queued tests to a function, a batch at a time."""
+
+    def __init__(
+        self,
+        execute_batch: Callable[
+            [list[tuple[CWLTestConfig, str, str | None]]],
+            Iterable[tuple[int, tuple[int, dict[str, Any] | None]]] | None,
+        ],
+        max_workers: int,
+        batch_size: int,
+        execute: (
+            Callable[
+                [CWLTestConfig, str, str | None],
+                tuple[int, dict[str, Any] | None] | None,
+            ]
+            | None
+        ) = None,
+        linger: float = 0.1,
+    ) -> None:
+        """
+        Start ``max_workers`` threads, each running a batch at a time.
+
+        A batch holds up to ``batch_size`` tests; it starts once full, or when
+        no other test was queued for ``linger`` seconds. When
+        ``execute_batch`` returns None, the tests of the batch run one by one
+        with ``execute``, or the command line runner.
+        """
+        self.execute_batch = execute_batch
+        self.execute = execute
+        self.batch_size = batch_size
+        self.linger = linger
+        self._queue: queue.SimpleQueue[_Task | None] = queue.SimpleQueue()
+        self._threads = [
+            threading.Thread(target=self._work, daemon=True) for _ in range(max_workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit_test(
+        self,
+        options: dict[str, Any],
+        test: dict[str, Any],
+        on_start: Callable[[], None] | None = None,
+    ) -> Future[TestResult]:
+        """
+        Queue a test for the next batch.
+
+        ``options`` are the keyword arguments of the
+        :py:class:`cwltest.utils.CWLTestConfig` to run the test with, and
+        ``on_start`` is called when its batch starts.
+        """
+        future: Future[TestResult] = Future()
+        self._queue.put(_Task(options, test, on_start, future))
+        return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        """Stop the threads once the queued tests are done, or cancelled."""
+        if cancel_futures:
+            while True:
+                try:
+                    task = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if task is not None:
+                    task.future.cancel()
+        for _ in self._threads:
+            self._queue.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def _next_batch(self) -> tuple[list[_Task], bool]:
+        """Wait for the tests of a batch, and whether to stop after it."""
+        task = self._queue.get()
+        if task is None:
+            return [], True
+        batch = [task]
+        deadline = time.monotonic() + self.linger
+        while len(batch) < self.batch_size:
+            try:
+                task = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if task is None:
+                return batch, True
+            batch.append(task)
+            deadline = time.monotonic() + self.linger
+        return batch, False
+
+    def _work(self) -> None:
+        stop = False
+        while not stop:
+            batch, stop = self._next_batch()
+            batch = [
+                task for task in batch if task.future.set_running_or_notify_cancel()
+            ]
+            if batch:
+                self._run_batch(batch)
+
+    def _run_batch(self, batch: list[_Task]) -> None:
+        configs = []
+        for task in batch:
+            if task.on_start:
+                task.on_start()
+            config = CWLTestConfig(**task.options)
+            config.outdir = tempfile.mkdtemp()
+            configs.append(config)
+        logger.debug("Running a batch of %i tests", len(batch))
+        start_time = time.time()
+        try:
+            for index, result in utils.run_tests_batch(
+                self.execute_batch,
+                self.execute,
+                [
+                    (config, task.test)
+                    for config, task in zip(configs, batch, strict=True)
+                ],
+            ):
+                batch[index].future.set_result(result)
+        except Exception as err:
+            for config, task in zip(configs, batch, strict=True):
+                if not task.future.done():
+                    task.future.set_result(
+                        utils.exception_test_result(
+                            config,
+                            task.test,
+                            "The batch",
+                            err,
+                            time.time() - start_time,
+                        )
+                    )
+        finally:
+            for config in configs:
+                shutil.rmtree(config.outdir or "", True)
@@ -0,0 +1,342 @@
+"""
+Distribute the tests of a run over worker processes, through sockets.
+
+A coordinator holds the loaded tests in a queue. Workers, on the same
+machine or on others that see the same files, connect to it over TCP or a
+Unix domain socket, lease one test at a time, run it with
+:py:func:`cwltest.utils.run_test_plain` and send back the
+:py:class:`cwltest.utils.TestResult`.
+
+The protocol is line delimited JSON, one message per line:
+
+- coordinator to worker: ``{"type": "hello", "cwd": ...}`` on connection,
+  then ``{"type": "test", "lease": ..., "config": ..., "test": ...,
+  "number": ...}`` or ``{"type": "done"}`` in answer to each request;
+- worker to coordinator: ``{"type": "request"}``, and
+  ``{"type": "result", "lease": ..., "result": ...}`` for each leased test.
+
+A lease is given back to the queue when its connection is lost, or when no
+result arrived within the lease timeout. There is no authentication: only
+listen on addresses that untrusted parties cannot reach.
+"""
+
+import argparse
+import io
+import itertools
+import json
+import os
+import socket
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import Executor, Future
+from typing import Any, NamedTuple, cast
+
+from cwltest import logger
+from cwltest.argparser import worker_arg_parser
+from cwltest.resources import budget
+from cwltest.utils import (
+    CWLTestConfig,
+    TestResult,
+    load_optional_fsaccess_plugin,
+    run_test_plain,
+)
+
+
+def _parse_address(address: str) -> tuple[int, str | tuple[str, int]]:
+    """Parse ``unix:PATH``, ``tcp:HOST:PORT`` or ``HOST:PORT``."""
+    if address.startswith("unix:"):
+        return socket.AF_UNIX, address[len("unix:") :]
+    if address.startswith("tcp:"):
+        address = address[len("tcp:") :]
+    host, _, port = address.rpartition(":")
+    return socket.AF_INET, (host or "127.0.0.1", int(port))
+
+
+def _send(stream: io.BufferedIOBase, message: dict[str, Any]) -> None:
+    stream.write(json.dumps(message).encode("utf-8") + b"\n")
+    stream.flush()
+
+
+def _receive(stream: io.BufferedIOBase) -> dict[str, Any] | None:
+    line = stream.readline()
+    if not line:
+        return None
+    return cast(dict[str, Any], json.loads(line))
+
+
+class _Task:
+    """A test waiting for, or leased to, a worker."""
+
+    def __init__(
+        self,
+        options: dict[str, Any],
+        test: dict[str, Any],
+        number: int,
+        on_lease: Callable[[], None] | None,
+    ) -> None:
+        self.options = options
+        self.test = test
+        self.number = number
+        self.on_lease = on_lease
+        self.future: Future[TestResult] = Future()
+        self.started = False
+
+
+class _Lease(NamedTuple):
+    task: _Task
+    deadline: float
+
+
+class Coordinator(Executor):
+    """Hand out tests to the workers connected to a socket."""
+
+    def __init__(self, address: str, lease_timeout: float) -> None:
+        """Listen on ``address`` for workers."""
+        family, bind_address = _parse_address(address)
+        self.lease_timeout = lease_timeout
+        self._queue: deque[_Task] = deque()
+        self._leases: dict[int, _Lease] = {}
+        self._expired: dict[int, _Task] = {}
+        self._lease_ids = itertools.count(1)
+        self._condition = threading.Condition()
+        self._closing = False
+        if family == socket.AF_UNIX and os.path.exists(cast(str, bind_address)):
+            os.unlink(cast(str, bind_address))
+        self._server = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_INET:
+            self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind(bind_address)
+        self._server.listen()
+        if family == socket.AF_UNIX:
+            self.address = f"unix:{bind_address}"
+        else:
+            host, port = self._server.getsockname()[:2]
+            self.address = f"tcp:{host}:{port}"
+        logger.info("Waiting for workers on %s", self.address)
+        for target in (self._accept, self._expire_leases):
+            threading.Thread(target=target, daemon=True).start()
+
+    def submit_test(
+        self,
+        options: dict[str, Any],
+        test: dict[str, Any],
+        number: int,
+        on_lease: Callable[[], None] | None = None,
+    ) -> Future[TestResult]:
+        """
+        Queue a test for the workers.
+
+        ``options`` are the keyword arguments of the
+        :py:class:`cwltest.utils.CWLTestConfig` to run the test with, and
+        ``on_lease`` is called each time the test is handed to a worker.
+        """
+        task = _Task(options, test, number, on_lease)
+        with self._condition:
+            self._queue.append(task)
+            self._condition.notify()
+        return task.future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        """Tell the workers there is nothing left to do, and stop listening."""
+        with self._condition:
+            if cancel_futures:
+                for task in self._queue:
+                    task.future.cancel()
+                self._queue.clear()
+            while wait and any(
+                not task.future.done()
+                for task in itertools.chain(
+                    self._queue, (lease.task for lease in self._leases.values())
+                )
+            ):
+                self._condition.wait(1)
+            self._closing = True
+            self._condition.notify_all()
+        self._server.close()
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                connection, _ = self._server.accept()
+            except OSError:
+                return
+            threading.Thread(
+                target=self._serve, args=(connection,), daemon=True
+            ).start()
+
+    def _next_task(self) -> tuple[int, _Task] | None:
+        """Wait for a test to lease, None when the run is over."""
+        with self._condition:
+            while True:
+                while self._queue:
+                    task = self._queue.popleft()
+                    if task.future.done():
+                        continue
+                    if not task.started:
+                        if not task.future.set_running_or_notify_cancel():
+                            continue
+                        task.started = True
+                    lease_id = next(self._lease_ids)
+                    self._leases[lease_id] = _Lease(
+                        task, time.monotonic() + self.lease_timeout
+                    )
+                    return lease_id, task
+                if self._closing:
+                    return None
+                self._condition.wait()
+
+    def _release(self, lease_id: int, result: TestResult | None) -> None:
+        """End a lease with a result, or give the test back to the queue."""
+        with self._condition:
+            lease = self._leases.pop(lease_id, None)
+            task = lease.task if lease else self._expired.pop(lease_id, None)
+            if task is None:
+                return
+            if result is not None:
+                for expired in [i for i, t in self._expired.items() if t is task]:
+                    del self._expired[expired]
+                # the first result wins, even from an expired lease
+                if not task.future.done():
+                    task.future.set_result(result)
+            elif lease is not None and not task.future.done():
+                self._queue.appendleft(task)
+            self._condition.notify_all()
+
+    def _prune_expired(self) -> None:
+        """Forget the expired leases of the tests that completed since."""
+        for lease_id, task in list(self._expired.items()):
+            if task.future.done():
+                del self._expired[lease_id]
+
+    def _expire_leases(self) -> None:
+        while not self._closing:
+            time.sleep(min(1.0, self.lease_timeout / 2))
+            with self._condition:
+                self._prune_expired()
+                now = time.monotonic()
+                for lease_id, lease in list(self._leases.items()):
+                    if lease.deadline < now:
+                        logger.warning(
+                            "No result for test %i after %.0f seconds, requeuing it",
+                            lease.task.number,
+                            self.lease_timeout,
+                        )
+                        del self._leases[lease_id]
+                        self._expired[lease_id] = lease.task
+                        self._queue.appendleft(lease.task)
+                        self._condition.notify_all()
+
+    def _serve(self, connection: socket.socket) -> None:
+        lease_id: int | None = None
+        with connection, connection.makefile("rwb") as stream:
+            try:
+                _send(stream, {"type": "hello", "cwd": os.getcwd()})
+                while (message := _receive(stream)) is not None:
+                    if message["type"] == "result" and lease_id is not None:
+                        self._release(lease_id, TestResult.from_dict(message["result"]))
+                        lease_id = None
+                    elif message["type"] == "request":
+                        if (leased := self._next_task()) is None:
+                            _send(stream, {"type": "done"})
+                            return
+                        lease_id, task = leased
+                        if task.on_lease:
+                            task.on_lease()
+                        _send(
+                            stream,
+                            {
+                                "type": "test",
+                                "lease": lease_id,
+                                "config": task.options,
+                                "test": task.test,
+                                "number": task.number,
+                            },
+                        )
+            except (OSError, ValueError) as err:
+                logger.warning("Lost connection to a worker: %s", err)
+            finally:
+                if lease_id is not None:
+                    self._release(lease_id, None)
+
+
+_chdir_lock = threading.Lock()
+
+
+def run_worker(
+    address: str,
+    tool: str | None = None,
+    connect_timeout: float = 60.0,
+    slots: int = 1,
+) -> int:
+    """
+    Run the tests leased from a coordinator, until it has none left.
+
+    Connection attempts are repeated for ``connect_timeout`` seconds, so that
+    workers can be started before the coordinator. ``tool`` overrides the
+    CWL runner chosen by the coordinator. The budget of the runners is a share
+    of this host between ``slots`` tests at once. Returns the number of tests
+    run.
+    """
+    family, connect_address = _parse_address(address)
+    deadline = time.monotonic() + connect_timeout
+    while True:
+        connection = socket.socket(family, socket.SOCK_STREAM)
+        try:
+            connection.connect(connect_address)
+            break
+        except OSError:
+            connection.close()
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.5)
+
+    count = 0
+    with connection, connection.makefile("rwb") as stream:
+        if (hello := _receive(stream)) is None:
+            return count
+        with _chdir_lock:
+            # relative paths in the tests are resolved like on the coordinator
+            if os.getcwd() != hello["cwd"] and os.path.isdir(hello["cwd"]):
+                os.chdir(hello["cwd"])
+        while True:
+            _send(stream, {"type": "request"})
+            message = _receive(stream)
+            if message is None or message["type"] == "done":
+                return count
+            config = CWLTestConfig(**message["config"])
+            if tool:
+                config.tool = tool
+            config.cores, config.ram = budget(slots, config.memory_limit)
+            result = run_test_plain(config, message["test"], message["number"])
+            _send(
+                stream,
+                {
+                    "type": "result",
+                    "lease": message["lease"],
+                    "result": result.to_dict(),
+                },
+            )
+            count += 1
+
+
+def worker_main(argv: list[str]) -> int:
+    """Run the worker subcommand."""
+    args: argparse.Namespace = worker_arg_parser().parse_args(argv)
+    load_optional_fsaccess_plugin()
+    errors: list[Exception] = []
+
+    def work() -> None:
+        try:
+            run_worker(args.connect, args.tool, args.connect_timeout, args.j)
+        except Exception as err:
+            logger.error("Worker failed: %s", err)
+            errors.append(err)
+
+    threads = [threading.Thread(target=work) for _ in range(args.j)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return 1 if errors else 0
@@ -0,0 +1,219 @@
+"""Remember the outcome of earlier runs, per CWL runner."""
+
+import hashlib
+import json
+import math
+import os
+import shutil
+import statistics
+import subprocess  # nosec
+import tempfile
+import time
+from collections.abc import Iterable
+from typing import Any
+
+from cwltest import REQUIRED, UNSUPPORTED_FEATURE, logger
+from cwltest.utils import TestResult, get_test_id
+
+# Number of consecutive UNSUPPORTED_FEATURE results before a tag is skipped
+UNSUPPORTED_STREAK = 2
+# Number of durations kept for each test
+DURATION_SAMPLES = 10
+# Number of durations needed to derive the timeout of a test
+ADAPTIVE_SAMPLES = 3
+# Percentile of the durations of a test its adaptive timeout is based on
+ADAPTIVE_PERCENTILE = 95
+# Shortest adaptive timeout, in seconds
+ADAPTIVE_MIN_TIMEOUT = 30
+# Number of runs with reruns needed to tell how flaky a test is
+FLAKY_SAMPLES = 3
+
+
+def runner_identity(tool: str) -> str:
+    """Identify a CWL runner by its resolved path and its --version output."""
+    path = os.path.abspath(shutil.which(tool) or tool)
+    try:
+        process = subprocess.run(  # nosec
+            [path, "--version"], capture_output=True, text=True, timeout=60
+        )
+        lines = (process.stdout.strip() or process.stderr.strip()).splitlines()
+        version = lines[0] if lines else "unknown version"
+    except (OSError, subprocess.TimeoutExpired):
+        version = "unknown version"
+    return f"{path} {version}"
+
+
+def host_speed() -> float:
+    """
+    Time a fixed CPU bound workload on this host, in seconds.
+
+    Durations recorded on hosts of different speeds are compared after
+    dividing them by this measurement. It takes the best of a few rounds of
+    hashing and of plain Python code, a fraction of a second in total.
+    """
+    data = bytes(1 << 20)
+    best = math.inf
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(4):
+            hashlib.sha256(data).digest()
+        sum(i * i for i in range(100000))
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+class RunHistory:
+    """Results of earlier runs, kept per CWL runner in a JSON file."""
+
+    def __init__(self, path: str) -> None:
+        """Load the history from ``path``, if it exists."""
+        self.path = path
+        self.data: dict[str, Any] = {"runners": {}}
+        try:
+            with open(path) as handle:
+                self.data = json.load(handle)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as err:
+            logger.warning("Ignoring unreadable history file %s: %s", path, err)
+
+    def runner(self, identity: str) -> dict[str, Any]:
+        """Return the record of a runner, creating it if needed."""
+        return self.data["runners"].setdefault(identity, {"tags": {}})  # type: ignore[no-any-return]
+
+    def known_unsupported_tags(self, identity: str, reprobe_after: float) -> set[str]:
+        """
+        Return the tags that the runner consistently does not support.
+
+        Tags that were last tried more than ``reprobe_after`` seconds ago are
+        left out, so that their tests run again.
+        """
+        now = time.time()
+        return {
+            tag
+            for tag, record in self.runner(identity)["tags"].items()
+            if record["streak"] >= UNSUPPORTED_STREAK
+            and now - record["probed"] < reprobe_after
+        }
+
+    def expected_durations(self, identity: str, suite: str) -> dict[str, float]:
+        """Return the median recorded duration of the tests of a suite."""
+        prefix = f"{suite}#"
+        return {
+            key[len(prefix) :]: statistics.median(record["durations"])
+            for key, record in self.runner(identity).get("tests", {}).items()
+            if key.startswith(prefix) and record["durations"]
+        }
+
+    def adaptive_timeouts(
+        self, identity: str, suite: str, factor: float, speed: float
+    ) -> dict[str, int]:
+        """
+        Derive the timeout of the tests of a suite from their recorded durations.
+
+        The durations, relative to the speed of the host they were measured
+        on, are scaled to the ``speed`` of this host (see
+        :py:func:`host_speed`). Their high percentile times ``factor`` is the
+        timeout, at least ADAPTIVE_MIN_TIMEOUT seconds. Tests with fewer than
+        ADAPTIVE_SAMPLES such durations are left out.
+        """
+        prefix = f"{suite}#"
+        timeouts = {}
+        for key, record in self.runner(identity).get("tests", {}).items():
+            if not key.startswith(prefix):
+                continue
+            relative = [
+                duration / recorded_speed
+                for duration, recorded_speed in zip(
+                    record["durations"], record.get("speeds", []), strict=False
+                )
+                if recorded_speed
+            ]
+            if len(relative) < ADAPTIVE_SAMPLES:
+                continue
+            percentile = statistics.quantiles(relative, n=100, method="inclusive")[
+                ADAPTIVE_PERCENTILE - 1
+            ]
+            timeouts[key[len(prefix) :]] = max(
+                ADAPTIVE_MIN_TIMEOUT, math.ceil(percentile * speed * factor)
+            )
+        return timeouts
+
+    def flaky_tests(self, identity: str, suite: str) -> dict[str, float]:
+        """
+        Return how often the tests of a suite passed only when run again.
+
+        That is the fraction of their recorded runs with reruns in which they
+        passed on a rerun, for the tests with at least FLAKY_SAMPLES such
+        runs, and a rate above zero.
+        """
+        prefix = f"{suite}#"
+        rates = {}
+        for key, record in self.runner(identity).get("tests", {}).items():
+            flaky = record.get("flaky", [])
+            if key.startswith(prefix) and len(flaky) >= FLAKY_SAMPLES and any(flaky):
+                rates[key[len(prefix) :]] = sum(flaky) / len(flaky)
+        return rates
+
+    def record(
+        self,
+        identity: str,
+        suite: str,
+        results: Iterable[tuple[dict[str, Any], TestResult]],
+        speed: float | None = None,
+        reruns: bool = False,
+    ) -> None:
+        """
+        Update the tag and test statistics from the results of executed tests.
+
+        ``speed`` is the :py:func:`host_speed` of the host the tests ran on,
+        recorded along the durations. With ``reruns``, when failed tests were
+        run again, whether the tests that passed did so on a rerun is
+        recorded too. The streak of an optional tag grows by one when all its
+        tests were unsupported, and is reset otherwise.
+        """
+        tags = self.runner(identity)["tags"]
+        tests = self.runner(identity).setdefault("tests", {})
+        now = time.time()
+        # whether all the tests of each optional tag were unsupported
+        unsupported: dict[str, bool] = {}
+        for test, result in results:
+            test_record = tests.setdefault(
+                f"{suite}#{get_test_id(test)}", {"durations": []}
+            )
+            durations = test_record["durations"]
+            # durations recorded by older versions are of unknown speed
+            speeds = test_record.setdefault("speeds", [None] * len(durations))
+            durations.append(round(result.duration, 3))
+            speeds.append(speed)
+            del durations[:-DURATION_SAMPLES]
+            del speeds[:-DURATION_SAMPLES]
+            if reruns and result.return_code == 0:
+                flaky = test_record.setdefault("flaky", [])
+                flaky.append(int(result.flaky))
+                del flaky[:-DURATION_SAMPLES]
+            test_tags = test.get("tags", [REQUIRED])
+            if REQUIRED in test_tags:
+                continue
+            for tag in test_tags:
+                unsupported[tag] = unsupported.get(tag, True) and (
+                    result.return_code == UNSUPPORTED_FEATURE
+                )
+        # a run counts once for a tag, and only if none of its tests ran
+        for tag, all_unsupported in unsupported.items():
+            record = tags.setdefault(tag, {"streak": 0, "probed": now})
+            record["probed"] = now
+            if all_unsupported:
+                record["streak"] += 1
+            else:
+                record["streak"] = 0
+
+    def save(self) -> None:
+        """Write the history back, atomically."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            "w", dir=directory, prefix=".cwltest-history", delete=False
+        ) as handle:
+            json.dump(self.data, handle, indent=1, sort_keys=True)
+        os.replace(handle.name, self.path)
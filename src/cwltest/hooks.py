@@ -1,12 +1,13 @@
 """Hooks for pytest-cwl users."""
 
+from collections.abc import Iterable
 from typing import Any
 
 from cwltest import utils
 
 
 def pytest_cwl_execute_test(  # type: ignore[empty-body]
-    config: utils.CWLTestConfig, processfile: str, jobfile: str | None
+    config: utils.CWLTestConfig, processfile: str, jobfile: str | None, session: Any
 ) -> tuple[int, dict[str, Any] | None]:
     """
     Execute CWL test using a Python function instead of a command line runner.
@@ -20,4 +21,46 @@ def pytest_cwl_execute_test(  # type: ignore[empty-body]
 
     :param processfile: a path to a CWL document
     :param jobfile: an optionl path to JSON/YAML input object
+    :param session: what :py:func:`pytest_cwl_session_start` returned; like
+      any hook parameter, implementations may leave it out
+    """
+
+
+def pytest_cwl_execute_tests_batch(
+    tests: list[tuple[utils.CWLTestConfig, str, str | None]], session: Any
+) -> Iterable[tuple[int, tuple[int, dict[str, Any] | None]]] | None:
+    """
+    Execute several CWL tests at once, for runners that prefer batches.
+
+    Takes precedence over :py:func:`pytest_cwl_execute_test`, which the tests
+    fall back to when this returns None.
+
+    The return value is an iterable, like a generator, of ``(index, (status
+    code, CWL output object))`` tuples in the order the tests complete, where
+    ``index`` is the position of the test in ``tests``, and the rest is like
+    the return value of :py:func:`pytest_cwl_execute_test`.
+
+    :param tests: the ``(config, processfile, jobfile)`` of each test, like
+      the parameters of :py:func:`pytest_cwl_execute_test`
+    :param session: what :py:func:`pytest_cwl_session_start` returned
+    """
+
+
+def pytest_cwl_session_start(tests: list[dict[str, Any]]) -> Any:
+    """
+    Set up what all the CWL tests of a run share, before the first one runs.
+
+    The return value is a context object, given as the ``session`` parameter
+    of the other hooks; with ``pytest-xdist``, each worker starts its own
+    session.
+
+    :param tests: the entries of the tests that will run
+    """
+
+
+def pytest_cwl_session_finish(session: Any) -> None:
+    """
+    Tear down what :py:func:`pytest_cwl_session_start` set up, after the run.
+
+    :param session: what :py:func:`pytest_cwl_session_start` returned
     """
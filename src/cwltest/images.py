@@ -0,0 +1,135 @@
+"""
+Pull the container images of the selected tests before they need them.
+
+The first tests that need an image would otherwise wait for the runner to
+pull it, and several tests running at once may pull the same image. The
+distinct ``dockerPull`` images of the ``DockerRequirement`` of the tools of
+the selected tests, and of the documents they refer to, are pulled with a
+container command line interface, ``docker`` by default, a few at a time,
+while the tests run. A test waits for the pulls of its own images only.
+"""
+
+import functools
+import os
+import subprocess  # nosec
+import threading
+from collections.abc import Iterable
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any
+
+from ruamel.yaml import YAML
+
+from cwltest import logger
+from cwltest.watch import get_test_dependencies
+
+
+def _docker_pulls(document: Any, found: set[str]) -> None:
+    """Collect the dockerPull images of the DockerRequirements of a document."""
+    if isinstance(document, dict):
+        if document.get("class") == "DockerRequirement" and isinstance(
+            document.get("dockerPull"), str
+        ):
+            found.add(document["dockerPull"])
+        for key, value in document.items():
+            # requirements and hints can be maps from the class to the fields
+            if (
+                key == "DockerRequirement"
+                and isinstance(value, dict)
+                and isinstance(value.get("dockerPull"), str)
+            ):
+                found.add(value["dockerPull"])
+            _docker_pulls(value, found)
+    elif isinstance(document, list):
+        for entry in document:
+            _docker_pulls(entry, found)
+
+
+@functools.lru_cache(maxsize=None)
+def _document_images(path: str, mtime: float) -> frozenset[str]:
+    try:
+        with open(path, encoding="utf-8") as handle:
+            document = YAML(typ="safe", pure=True).load(handle)
+    except Exception:  # nosec
+        # not a CWL document, or the runner will report it
+        return frozenset()
+    found: set[str] = set()
+    _docker_pulls(document, found)
+    return frozenset(found)
+
+
+def required_images(test: dict[str, Any]) -> set[str]:
+    """Return the images that the tool and job of a test pull."""
+    images: set[str] = set()
+    for path in get_test_dependencies(test):
+        if not path.endswith((".cwl", ".yml", ".yaml", ".json")):
+            continue
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            continue
+        images.update(_document_images(path, mtime))
+    return images
+
+
+class ImagePrefetcher:
+    """Pull images with a container command, a few at a time."""
+
+    def __init__(self, command: list[str], max_workers: int) -> None:
+        """Pull with ``command``, like ``["docker"]``, ``max_workers`` at a time."""
+        self.command = command
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._pulls: dict[str, Future[None]] = {}
+        self._reported: set[str] = set()
+        self._lock = threading.Lock()
+
+    def prefetch(self, images: Iterable[str]) -> None:
+        """Start pulling the images not pulled yet."""
+        for image in images:
+            if image not in self._pulls:
+                self._pulls[image] = self._executor.submit(self._pull, image)
+
+    def _pull(self, image: str) -> None:
+        inspect = subprocess.run(  # nosec
+            [*self.command, "image", "inspect", image],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        if inspect.returncode == 0:
+            logger.debug("Image %s is already present", image)
+            return
+        logger.info("Pulling image %s", image)
+        pull = subprocess.run(  # nosec
+            [*self.command, "pull", image],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        if pull.returncode != 0:
+            raise RuntimeError(pull.stderr.strip() or f"exit code {pull.returncode}")
+
+    def wait(self, images: Iterable[str] | None = None) -> None:
+        """
+        Wait for the pulls of ``images``, or of all the images.
+
+        A pull that failed is only reported: the runner then pulls the image
+        itself, and reports the failure as it does.
+        """
+        wanted = None if images is None else set(images)
+        pulls = {
+            image: pull
+            for image, pull in self._pulls.items()
+            if wanted is None or image in wanted
+        }
+        wait(pulls.values())
+        for image, pull in pulls.items():
+            if pull.cancelled() or (err := pull.exception()) is None:
+                continue
+            with self._lock:
+                if image in self._reported:
+                    continue
+                self._reported.add(image)
+            logger.warning("Pulling image %s failed: %s", image, err)
+
+    def shutdown(self) -> None:
+        """Stop pulling, after the pulls in progress."""
+        self._executor.shutdown(cancel_futures=True)
@@ -0,0 +1,91 @@
+"""Durable record of test results, written as each test completes."""
+
+import json
+import os
+import threading
+from collections.abc import Iterator
+from typing import IO, Any, cast
+
+from cwltest import logger
+from cwltest.utils import TestResult
+
+
+class Journal:
+    """
+    Append-only JSON Lines file with one completed test per line.
+
+    Each line holds the test suite name, the test number and identifier, the
+    test entry, and the :py:meth:`TestResult.to_dict` of its result. Lines are
+    flushed to disk as they are written, so that an interrupted run can be
+    resumed with all results up to the interruption.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Open the journal at ``path`` for appending."""
+        self.path = path
+        self._lock = threading.Lock()
+        self._handle: IO[str] = open(path, "a", encoding="utf-8")
+        if self._handle.tell() > 0:
+            with open(path, "rb") as previous:
+                previous.seek(-1, os.SEEK_END)
+                if previous.read(1) != b"\n":
+                    # terminate a line left incomplete by a crash
+                    self._handle.write("\n")
+
+    def append(
+        self,
+        suite: str,
+        number: int,
+        test_id: str,
+        test: dict[str, Any],
+        result: TestResult,
+    ) -> None:
+        """Durably record the result of a test."""
+        line = json.dumps(
+            {
+                "suite": suite,
+                "number": number,
+                "id": test_id,
+                "test": test,
+                "result": result.to_dict(),
+            }
+        )
+        with self._lock:
+            self._handle.write(line + "\n")
+            self._handle.flush()
+            os.fsync(self._handle.fileno())
+
+    def close(self) -> None:
+        """Close the journal file."""
+        with self._lock:
+            self._handle.close()
+
+
+def read_journal(path: str) -> Iterator[dict[str, Any]]:
+    """
+    Yield the records of a journal, in the order they were written.
+
+    A partially written last line, left by a crash, is ignored.
+    """
+    for _, record in index_journal(path):
+        yield record
+
+
+def index_journal(path: str) -> Iterator[tuple[int, dict[str, Any]]]:
+    """Yield the records of a journal with their offset in the file."""
+    offset = 0
+    with open(path, "rb") as handle:
+        for number, line in enumerate(handle, start=1):
+            if line.strip():
+                try:
+                    yield offset, json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning("Ignoring truncated line %i of %s", number, path)
+            offset += len(line)
+
+
+def read_journal_record(path: str, offset: int) -> dict[str, Any]:
+    """Read the record at the given offset of a journal."""
+    with open(path, "rb") as handle:
+        handle.seek(offset)
+        return cast(dict[str, Any], json.loads(handle.readline()))
@@ -0,0 +1,216 @@
+"""
+Cap the resources of the runner of each test, to run many tests at once.
+
+The runner of a test, and the processes it starts, get rlimits on their
+address space, CPU time and file size. Given a delegated cgroup v2 directory,
+one where cwltest may create cgroups, with the ``memory`` and ``cpu``
+controllers enabled in its ``cgroup.subtree_control``, each test also runs in
+a cgroup of its own, whose ``memory.max`` and ``cpu.max`` cover all of its
+processes together. The size of the output directory of a test is watched
+while it runs (see :py:func:`cwltest.utils.run_test_plain`).
+
+The limits are set by a small wrapper, that the runner is started through,
+before it executes the runner: setting them between fork and exec, with a
+``preexec_fn``, is unsafe in a process running threads, as cwltest does.
+
+rlimits apply to each process separately, and are only reported as exceeded
+from the exit status or the error output of the runner; the memory limit of
+a cgroup is the one to rely on.
+"""
+
+import contextlib
+import itertools
+import json
+import os
+import resource
+import signal
+import sys
+import time
+
+from cwltest import logger
+
+# the period of cpu.max, in microseconds
+_CPU_PERIOD = 100000
+# the time between SIGXCPU and SIGKILL, in seconds of CPU time
+_CPU_TIME_GRACE = 5
+
+_MEMORY_ERRORS = (
+    "MemoryError",
+    "Cannot allocate memory",
+    "std::bad_alloc",
+    "out of memory",
+)
+_DISK_ERRORS = ("File too large",)
+
+_ids = itertools.count(1)
+
+
+def check_cgroup(path: str, controllers: list[str]) -> None:
+    """Raise ValueError unless ``path`` is a cgroup cwltest can create cgroups in."""
+    try:
+        with open(os.path.join(path, "cgroup.subtree_control")) as subtree_control:
+            enabled = subtree_control.read().split()
+    except OSError as err:
+        raise ValueError(f"{path} is not a cgroup v2 directory: {err}") from err
+    missing = [controller for controller in controllers if controller not in enabled]
+    if missing:
+        raise ValueError(
+            f"the {', '.join(missing)} controllers are not enabled in "
+            f"{os.path.join(path, 'cgroup.subtree_control')}"
+        )
+    if not os.access(path, os.W_OK):
+        raise ValueError(f"{path} is not writable")
+
+
+class TestCgroup:
+    """The cgroup of the processes of a test."""
+
+    def __init__(self, parent: str, memory: int | None, cpus: float | None) -> None:
+        """Create a cgroup under ``parent``, with ``memory`` MiB and ``cpus`` CPUs."""
+        self.path = os.path.join(parent, f"cwltest-{os.getpid()}-{next(_ids)}")
+        os.mkdir(self.path)
+        try:
+            if memory:
+                self._write("memory.max", str(memory << 20))
+                # or the memory of the test would go to swap instead
+                with contextlib.suppress(OSError):
+                    self._write("memory.swap.max", "0")
+            if cpus:
+                self._write("cpu.max", f"{round(cpus * _CPU_PERIOD)} {_CPU_PERIOD}")
+        except OSError:
+            self.remove()
+            raise
+
+    def _write(self, name: str, value: str) -> None:
+        with open(os.path.join(self.path, name), "w") as control:
+            control.write(value)
+
+    @property
+    def procs(self) -> str:
+        """Return the path of the file to write a pid to, to move it here."""
+        return os.path.join(self.path, "cgroup.procs")
+
+    def oom_killed(self) -> bool:
+        """Tell whether a process of the cgroup was killed for its memory use."""
+        try:
+            with open(os.path.join(self.path, "memory.events")) as events:
+                for line in events:
+                    name, _, value = line.partition(" ")
+                    if name == "oom_kill" and int(value):
+                        return True
+        except (OSError, ValueError):
+            pass
+        return False
+
+    def remove(self) -> None:
+        """Kill the processes left in the cgroup, and remove it."""
+        with contextlib.suppress(OSError):
+            self._write("cgroup.kill", "1")
+        deadline = time.monotonic() + 5
+        while True:
+            try:
+                os.rmdir(self.path)
+                return
+            except OSError as err:
+                if time.monotonic() >= deadline:
+                    logger.warning("Could not remove cgroup %s: %s", self.path, err)
+                    return
+            time.sleep(0.05)
+
+
+def rlimits(
+    memory: int | None, cpu_time: int | None, disk: int | None
+) -> list[tuple[int, int, int]]:
+    """
+    Return the rlimits of a runner, as (resource, soft, hard) tuples.
+
+    ``memory`` and ``disk`` are in MiB, and ``cpu_time`` in seconds. The
+    runner gets SIGXCPU when it used ``cpu_time`` seconds of CPU time, and
+    SIGKILL a little later.
+    """
+    limits = []
+    if memory:
+        limits.append((resource.RLIMIT_AS, memory << 20, memory << 20))
+    if cpu_time:
+        limits.append((resource.RLIMIT_CPU, cpu_time, cpu_time + _CPU_TIME_GRACE))
+    if disk:
+        limits.append((resource.RLIMIT_FSIZE, disk << 20, disk << 20))
+    return limits
+
+
+def apply(
+    limits: list[tuple[int, int, int]],
+    procs: str | None,
+    cpus: list[int] | None = None,
+) -> None:
+    """
+    Limit the current process, before it runs the runner.
+
+    It joins the cgroup whose ``cgroup.procs`` file is ``procs``, if any,
+    sets the rlimits of ``limits``, within its current hard limits, and
+    only runs on ``cpus``, if given.
+    """
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+    if procs:
+        with open(procs, "w") as cgroup_procs:
+            cgroup_procs.write(str(os.getpid()))
+    for limit, soft, hard in limits:
+        current = resource.getrlimit(limit)[1]
+        if current != resource.RLIM_INFINITY:
+            soft, hard = min(soft, current), min(hard, current)
+        resource.setrlimit(limit, (soft, hard))
+
+
+def wrap(
+    command: list[str],
+    limits: list[tuple[int, int, int]],
+    procs: str | None,
+    cpus: list[int] | None = None,
+) -> list[str]:
+    """Return a command line that runs ``command`` limited as by :py:func:`apply`."""
+    spec = {"limits": limits, "procs": procs, "cpus": cpus}
+    return [sys.executable, "-m", "cwltest.limits", json.dumps(spec), *command]
+
+
+def main(argv: list[str]) -> int:
+    """Apply the limits of the command line of :py:func:`wrap`, and run the command."""
+    spec = json.loads(argv[0])
+    apply(
+        [(limit, soft, hard) for limit, soft, hard in spec["limits"]],
+        spec["procs"],
+        spec["cpus"],
+    )
+    try:
+        os.execvp(argv[1], argv[1:])  # nosec
+    except OSError as err:
+        print(f"cwltest: cannot run {argv[1]}: {err}", file=sys.stderr)
+    return 127
+
+
+def exceeded(
+    returncode: int | None,
+    error_output: str | None,
+    cgroup: TestCgroup | None,
+    memory: int | None,
+    cpu_time: int | None,
+    disk: int | None,
+) -> str | None:
+    """Describe the limit a test that failed exceeded, None if none did."""
+    if memory and (
+        (cgroup is not None and cgroup.oom_killed())
+        or any(error in (error_output or "") for error in _MEMORY_ERRORS)
+    ):
+        return f"Test exceeded the memory limit of {memory} MiB"
+    if cpu_time and returncode == -signal.SIGXCPU:
+        return f"Test exceeded the CPU time limit of {cpu_time} seconds"
+    if disk and (
+        returncode == -signal.SIGXFSZ
+        or any(error in (error_output or "") for error in _DISK_ERRORS)
+    ):
+        return f"Test exceeded the disk limit of {disk} MiB"
+    return None
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
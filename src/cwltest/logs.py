@@ -0,0 +1,161 @@
+"""
+Keep the standard output and error of the runners in files, not in memory.
+
+The standard output and error of the runner of each test are pipes, that
+cwltest copies to files as they come, so that the file size limit of the
+runner does not apply to them. The files are read once it exited, and the
+processes it left in its group were stopped: the output object of the test
+is parsed from the file, and only a head and a tail of each of them, up to a
+number of bytes, is kept for the results and the reports. What is left out
+is marked, with the path of the file when the files are kept in a log
+directory. Without one, the files are removed after the test.
+
+A process that left the group of the runner with the pipes open does not
+hold the test: the copies stop ``DRAIN_TIMEOUT`` seconds after the runner.
+"""
+
+import json
+import os
+import re
+import select
+import shutil
+import tempfile
+import threading
+import time
+from typing import IO, Any
+
+#: seconds to wait for the pipes to be drained, once the runner is gone
+DRAIN_TIMEOUT = 1.0
+
+
+def _decode(data: bytes) -> str:
+    text = data.decode("utf-8", errors="replace")
+    # like the universal newlines of subprocess
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def _copy(pipe: int, stream: IO[bytes], stop: threading.Event) -> None:
+    """Copy what is written to a pipe to a file, until it is closed or ``stop``."""
+    with open(pipe, "rb", buffering=0) as source:
+        while not stop.is_set():
+            readable, _, _ = select.select([source], [], [], 0.1)
+            if readable:
+                if not (chunk := source.read(1 << 16)):
+                    break
+                stream.write(chunk)
+                # the files in a log directory can be followed as they grow
+                stream.flush()
+
+
+def excerpt(stream: IO[bytes], limit: int, path: str | None = None) -> str:
+    """
+    Return the text of a file, or its first and last ``limit / 2`` bytes.
+
+    The bytes left out are marked, along ``path``, where the whole file is,
+    if given.
+    """
+    size = os.fstat(stream.fileno()).st_size
+    stream.seek(0)
+    if size <= limit:
+        return _decode(stream.read())
+    head = stream.read(limit // 2)
+    stream.seek(size - limit // 2)
+    tail = stream.read()
+    omitted = size - len(head) - len(tail)
+    where = f", the whole output is in {path}" if path else ""
+    return f"{_decode(head)}\n[... {omitted} bytes omitted{where} ...]\n{_decode(tail)}"
+
+
+class RunnerOutput:
+    """The files of the standard output and error of the runner of a test."""
+
+    def __init__(
+        self, directory: str | None, name: str, capture_stderr: bool, limit: int
+    ) -> None:
+        """
+        Create the files, in a new directory under ``directory`` if given.
+
+        ``name`` starts the name of that directory, ``limit`` is how many
+        bytes of each file are kept in memory, and the standard error is left
+        to the one of cwltest unless ``capture_stderr``.
+        """
+        self.kept = directory is not None
+        prefix = re.sub(r"[^\w.-]", "_", name)[:100] + "-"
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+        self.directory = tempfile.mkdtemp(prefix=prefix, dir=directory)
+        self.limit = limit
+        self.stdout = open(os.path.join(self.directory, "stdout"), "w+b")
+        self.stderr = (
+            open(os.path.join(self.directory, "stderr"), "w+b")
+            if capture_stderr
+            else None
+        )
+        self._copies: list[threading.Thread] = []
+        self._pipes: list[int] = []
+        self._stop = threading.Event()
+        self.stdout_pipe = self._pipe(self.stdout)
+        self.stderr_pipe = self._pipe(self.stderr) if self.stderr else None
+
+    def _pipe(self, stream: IO[bytes]) -> int:
+        """Return a pipe to give the runner, copied to ``stream``."""
+        read, write = os.pipe()
+        copy = threading.Thread(
+            target=_copy, args=(read, stream, self._stop), daemon=True
+        )
+        copy.start()
+        self._copies.append(copy)
+        self._pipes.append(write)
+        return write
+
+    def started(self) -> None:
+        """
+        Close the pipes, once the runner has them.
+
+        The copies then end when the runner, and the processes it started,
+        exited.
+        """
+        for pipe in self._pipes:
+            os.close(pipe)
+        self._pipes = []
+
+    def _wait(self) -> None:
+        """
+        Wait for the copies, for at most DRAIN_TIMEOUT seconds.
+
+        The pipes stay open as long as a process has them, even one that
+        escaped the group of the runner.
+        """
+        self.started()
+        deadline = time.monotonic() + DRAIN_TIMEOUT
+        for copy in self._copies:
+            copy.join(max(0.0, deadline - time.monotonic()))
+        self._stop.set()
+        for copy in self._copies:
+            copy.join()
+
+    def _excerpt(self, stream: IO[bytes]) -> str:
+        return excerpt(stream, self.limit, stream.name if self.kept else None)
+
+    def excerpts(self) -> tuple[str, str]:
+        """Return the head and tail of the standard output and error."""
+        self._wait()
+        return self._excerpt(self.stdout), (
+            self._excerpt(self.stderr) if self.stderr is not None else ""
+        )
+
+    def output_object(self) -> Any:
+        """Parse the output object of the test, empty when there is no output."""
+        self._wait()
+        self.stdout.seek(0)
+        data = self.stdout.read()
+        return json.loads(data) if data else {}
+
+    def close(self) -> None:
+        """Close the files, and remove them unless they are kept."""
+        self._wait()
+        self.stdout.close()
+        if self.stderr is not None:
+            self.stderr.close()
+        if not self.kept:
+            shutil.rmtree(self.directory, True)
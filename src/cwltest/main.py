@@ -2,11 +2,23 @@
 """Entry point for cwltest."""
 
 import argparse
+import contextlib
+import functools
 import os
+import shlex
+import shutil
 import sys
-from collections import Counter, defaultdict
-from concurrent.futures import ThreadPoolExecutor
-from typing import cast
+import tempfile
+import threading
+from collections.abc import Callable, Iterator
+from concurrent.futures import (
+    Executor,
+    Future,
+    InvalidStateError,
+    ThreadPoolExecutor,
+    as_completed,
+)
+from typing import Any, cast
 
 import junit_xml
 import schema_salad.avro
@@ -14,14 +26,29 @@ import schema_salad.ref_resolver
 import schema_salad.schema
 from schema_salad.exceptions import ValidationException
 
-from cwltest import logger, utils
-from cwltest.argparser import arg_parser
+from cwltest import (
+    REQUIRED,
+    UNSUPPORTED_FEATURE,
+    images,
+    limits,
+    logger,
+    preflight,
+    processes,
+    resources,
+    utils,
+)
+from cwltest.argparser import arg_parser, coordinator_arg_parser
+from cwltest.batch import BatchExecutor
+from cwltest.distributed import Coordinator, worker_main
+from cwltest.history import RunHistory, host_speed, runner_identity
+from cwltest.journal import Journal, read_journal
+from cwltest.pool import RecyclingProcessPool, WorkerDied
 from cwltest.utils import (
     CWLTestConfig,
-    CWLTestReport,
     TestResult,
     load_optional_fsaccess_plugin,
 )
+from cwltest.watch import FileWatcher, get_test_dependencies
 
 if sys.stderr.isatty():
     PREFIX = "\r"
@@ -31,12 +58,11 @@ else:
     SUFFIX = "\n"
 
 
-def _run_test(
-    args: argparse.Namespace,
+def _print_test_header(
     test: dict[str, str],
     test_number: int,
     total_tests: int,
-) -> TestResult:
+) -> None:
     if test.get("short_name"):
         sys.stderr.write(
             "%sTest [%i/%i] %s: %s%s\n"
@@ -61,21 +87,255 @@ def _run_test(
             )
         )
     sys.stderr.flush()
-    config = CWLTestConfig(
-        basedir=args.basedir,
-        test_baseuri=args.baseuri,
-        test_basedir=args.test_basedir,
-        classname=args.classname,
-        entry=args.test,
-        entry_line=test["line"],
-        tool=args.tool,
-        args=args.args,
-        testargs=args.testargs,
-        timeout=args.timeout,
-        verbose=args.verbose,
-        runner_quiet=not args.junit_verbose,
+
+
+def _test_timeout(args: argparse.Namespace, test: dict[str, Any]) -> int:
+    """
+    Return the timeout of a test.
+
+    That is its own timeout field, otherwise the longest --tag-timeout of its
+    tags, or --timeout, shortened to its adaptive timeout if there is one.
+    """
+    if test.get("timeout"):
+        return int(test["timeout"])
+    tags = test.get("tags", [])
+    timeout = max(
+        (seconds for tag, seconds in args.tag_timeout if tag in tags),
+        default=args.timeout,
+    )
+    adaptive = getattr(args, "adaptive_timeouts", {}).get(utils.get_test_id(test))
+    return int(min(timeout, adaptive)) if adaptive is not None else int(timeout)
+
+
+def _config_options(args: argparse.Namespace, test: dict[str, str]) -> dict[str, Any]:
+    """Return the arguments of the CWLTestConfig to run a test with."""
+    cores, ram = resources.budget(getattr(args, "slots", args.j), args.test_memory)
+    return {
+        "basedir": args.basedir,
+        "test_baseuri": args.baseuri,
+        "test_basedir": args.test_basedir,
+        "classname": args.classname,
+        "entry": args.test,
+        "entry_line": test["line"],
+        "tool": args.tool,
+        "args": args.args,
+        "testargs": args.testargs,
+        "timeout": _test_timeout(args, test),
+        "verbose": args.verbose,
+        "runner_quiet": not args.junit_verbose,
+        "warm_runner": args.warm_runner,
+        "zygote": args.zygote,
+        "kill_grace": args.kill_grace,
+        "hang_timeout": args.hang_timeout,
+        "memory_limit": args.test_memory,
+        "cpu_limit": args.test_cpus,
+        "cpu_time_limit": args.test_cpu_time,
+        "disk_limit": args.test_disk,
+        "cgroup": args.cgroup,
+        "cores": cores,
+        "ram": ram,
+        "output_limit": args.output_limit << 10,
+        "log_dir": args.log_dir,
+    }
+
+
+def _run_test(
+    args: argparse.Namespace,
+    test: dict[str, str],
+    test_number: int,
+    total_tests: int,
+) -> TestResult:
+    _print_test_header(test, test_number, total_tests)
+    config = CWLTestConfig(**_config_options(args, test))
+    prefetcher: images.ImagePrefetcher | None = getattr(args, "image_prefetcher", None)
+    if prefetcher is not None:
+        prefetcher.wait(images.required_images(test))
+    if args.executor:
+        config.outdir = tempfile.mkdtemp()
+        try:
+            execute = utils.bind_session(
+                utils.load_executor(args.executor), args.session_context
+            )
+            return utils.run_test_function(execute, config, test)
+        finally:
+            shutil.rmtree(config.outdir, True)
+    allocator: resources.CpuAllocator | None = getattr(args, "cpu_allocator", None)
+    if allocator is None:
+        return utils.run_test_plain(config, test, test_number)
+    config.cpus = allocator.acquire(
+        resources.declared_resources(test["tool"]).get("coresMin")
     )
-    return utils.run_test_plain(config, test, test_number)
+    config.cores = len(config.cpus)
+    try:
+        return utils.run_test_plain(config, test, test_number)
+    finally:
+        allocator.release(config.cpus)
+
+
+def _run_flaky_test(
+    args: argparse.Namespace,
+    test: dict[str, str],
+    test_number: int,
+    total_tests: int,
+) -> TestResult:
+    """Run a flaky test, once no other flaky test runs."""
+    with args.flaky_lane:
+        return _run_test(args, test, test_number, total_tests)
+
+
+def _not_run_result(
+    args: argparse.Namespace, test: dict[str, str], return_code: int, message: str
+) -> TestResult:
+    """Return the result of a test that did not run, or did not finish."""
+    config = CWLTestConfig(**_config_options(args, test))
+    tooluri, joburi = utils.prepare_test_uris(config, test)
+    return TestResult(
+        return_code,
+        "",
+        "",
+        0.0,
+        config.classname,
+        config.entry,
+        tooluri,
+        joburi,
+        message,
+    )
+
+
+def _job_result(
+    args: argparse.Namespace, test: dict[str, str], job: Future[TestResult]
+) -> TestResult:
+    """Wait for the result of a test, a failure if its worker process died."""
+    try:
+        return job.result()
+    except WorkerDied as err:
+        logger.error("Test %s: %s", test.get("id", ""), err)
+        return _not_run_result(args, test, 1, str(err))
+
+
+def _known_unsupported(args: argparse.Namespace, test: dict[str, str]) -> set[str]:
+    """
+    Return the tags of a test known to be unsupported, to not run it.
+
+    Required tests always run, as their unsupported features are failures.
+    """
+    tags = test.get("tags", [REQUIRED])
+    if REQUIRED in tags:
+        return set()
+    return cast(set[str], args.known_unsupported.intersection(tags))
+
+
+def _submit_test(
+    executor: Executor,
+    args: argparse.Namespace,
+    test: dict[str, str],
+    test_number: int,
+    total_tests: int,
+) -> Future[TestResult]:
+    """Start running a test, unless it is known to be unsupported."""
+    if skipped := _known_unsupported(args, test):
+        future: Future[TestResult] = Future()
+        future.set_result(
+            _not_run_result(
+                args,
+                test,
+                UNSUPPORTED_FEATURE,
+                "Not run, known unsupported feature: %s" % ", ".join(sorted(skipped)),
+            )
+        )
+        return future
+    if isinstance(executor, BatchExecutor):
+        return executor.submit_test(
+            _config_options(args, test),
+            test,
+            functools.partial(_print_test_header, test, test_number, total_tests),
+        )
+    if isinstance(executor, Coordinator):
+        return executor.submit_test(
+            _config_options(args, test),
+            test,
+            test_number,
+            functools.partial(_print_test_header, test, test_number, total_tests),
+        )
+    if utils.get_test_id(test) in args.isolated:
+        return executor.submit(_run_flaky_test, args, test, test_number, total_tests)
+    return executor.submit(_run_test, args, test, test_number, total_tests)
+
+
+class _Reruns(Future[TestResult]):
+    """
+    The result of a test that runs again when it fails.
+
+    A failed test is queued again, after the tests already queued, up to
+    ``args.reruns`` times, after ``args.reruns_delay`` seconds doubled at
+    each rerun. The result is the one of the last run, with the number of
+    runs.
+    """
+
+    def __init__(
+        self,
+        executor: Executor,
+        args: argparse.Namespace,
+        test: dict[str, str],
+        test_number: int,
+        total_tests: int,
+    ) -> None:
+        """Prepare to run a test; it starts running with :py:meth:`start`."""
+        super().__init__()
+        self.executor = executor
+        self.args = args
+        self.test = test
+        self.test_number = test_number
+        self.total_tests = total_tests
+        self.attempts: list[Future[TestResult]] = []
+        self.add_done_callback(self._cancel_attempt)
+
+    def start(self) -> None:
+        """Queue the first run of the test."""
+        if self.cancelled():
+            return
+        job = _submit_test(
+            self.executor, self.args, self.test, self.test_number, self.total_tests
+        )
+        self.attempts.append(job)
+        job.add_done_callback(self._attempted)
+
+    def _attempted(self, job: Future[TestResult]) -> None:
+        failed = not job.cancelled() and (
+            job.exception() is not None
+            or job.result().return_code not in (0, UNSUPPORTED_FEATURE)
+        )
+        if failed and len(self.attempts) <= self.args.reruns and not self.cancelled():
+            delay = self.args.reruns_delay * 2 ** (len(self.attempts) - 1)
+            logger.warning(
+                "Test [%i] %s failed, running it again%s (rerun %i of %i)",
+                self.test_number,
+                utils.get_test_id(self.test),
+                f" in {delay:g} seconds" if delay else "",
+                len(self.attempts),
+                self.args.reruns,
+            )
+            if delay:
+                timer = threading.Timer(delay, self.start)
+                timer.daemon = True
+                timer.start()
+            else:
+                self.start()
+            return
+        # the run may have been interrupted meanwhile
+        with contextlib.suppress(InvalidStateError):
+            if job.cancelled():
+                self.cancel()
+            elif (err := job.exception()) is not None:
+                self.set_exception(err)
+            else:
+                result = job.result()
+                result.attempts = len(self.attempts)
+                self.set_result(result)
+
+    def _cancel_attempt(self, outcome: Future[TestResult]) -> None:
+        if outcome.cancelled() and self.attempts:
+            self.attempts[-1].cancel()
 
 
 def _expand_number_range(nr: str) -> list[int]:
@@ -89,47 +349,23 @@ def _expand_number_range(nr: str) -> list[int]:
     return result
 
 
-def main() -> int:
-    """Run the main logic loop."""
-    args = arg_parser().parse_args(sys.argv[1:])
-    if "--" in args.args:
-        args.args.remove("--")
-
-    # Remove test arguments with wrong syntax
-    if args.testargs is not None:
-        args.testargs = [
-            testarg for testarg in args.testargs if testarg.count("==") == 1
-        ]
-
-    if not args.test:
-        arg_parser().print_help()
-        return 1
-
-    args.test_basedir = os.path.dirname(utils.absuri(args.test)) + "/"
-    if args.baseuri is None:
-        args.baseuri = "file://" + args.test_basedir
-    if not args.baseuri.endswith("/"):
-        args.baseuri = args.baseuri + "/"
-
-    try:
+def _load_tests(
+    args: argparse.Namespace, suites: utils.SuiteCache | None = None
+) -> list[dict[str, Any]]:
+    """Load the test file and apply the --only-tools and tag filters."""
+    if suites:
+        tests, metadata = suites.load(args.test)
+    else:
         tests, metadata = utils.load_and_validate_tests(args.test)
-    except ValidationException:
-        return 1
-
-    failures = 0
-    unsupported = 0
-    suite_name, _ = os.path.splitext(os.path.basename(args.test))
-    report: junit_xml.TestSuite | None = junit_xml.TestSuite(suite_name, [])
-
-    load_optional_fsaccess_plugin()
-
-    ntotal: dict[str, int] = Counter()
-    npassed: dict[str, list[CWLTestReport]] = defaultdict(list)
 
     if args.only_tools:
         alltests = tests
         tests = []
         for t in alltests:
+            if suites:
+                if suites.tool_class(t["tool"]) == "CommandLineTool":
+                    tests.append(t)
+                continue
             loader = schema_salad.ref_resolver.Loader({"id": "@id"})
             cwl = loader.resolve_ref(t["tool"])[0]
             if isinstance(cwl, dict):
@@ -159,32 +395,13 @@ def main() -> int:
                 )
         else:
             logger.warning("The `id` field is missing.")
+    return cast(list[dict[str, Any]], tests)
 
-    if args.show_tags:
-        alltags: set[str] = set()
-        for t in tests:
-            ts = t.get("tags", [])
-            alltags |= set(ts)
-        for tag in sorted(alltags):
-            print(tag)
-        return 0
-
-    if args.l:
-        for i, t in enumerate(tests):
-            if t.get("short_name"):
-                print(
-                    "[%i] %s: %s"
-                    % (
-                        i + 1,
-                        t["short_name"],
-                        t.get("doc", "").replace("\n", " ").strip(),
-                    )
-                )
-            else:
-                print("[%i] %s" % (i + 1, t.get("doc", "").replace("\n", " ").strip()))
-
-        return 0
 
+def _select_tests(
+    args: argparse.Namespace, tests: list[dict[str, Any]]
+) -> list[int] | None:
+    """Return the indexes of the tests selected by -n/-s/-N/-S, None on errors."""
     if args.n is not None or args.s is not None:
         ntest = []
         if args.n is not None:
@@ -196,7 +413,7 @@ def main() -> int:
                     ntest.append(test_number)
                 else:
                     logger.error('Test with short name "%s" not found ', s)
-                    return 1
+                    return None
     else:
         ntest = list(range(0, len(tests)))
 
@@ -210,47 +427,897 @@ def main() -> int:
                 exclude_n.append(test_number)
             else:
                 logger.error('Test with short name "%s" not found ', s)
-                return 1
+                return None
 
-    ntest = list(filter(lambda x: x not in exclude_n, ntest))
+    return list(filter(lambda x: x not in exclude_n, ntest))
 
-    total = 0
-    with ThreadPoolExecutor(max_workers=args.j) as executor:
-        jobs = [
-            executor.submit(
-                _run_test,
-                args,
-                tests[i],
+
+def _same_entry(old: dict[str, Any], new: dict[str, Any]) -> bool:
+    """Compare two test entries, ignoring their position in the test file."""
+    return {k: v for k, v in old.items() if k != "line"} == {
+        k: v for k, v in new.items() if k != "line"
+    }
+
+
+def _watch(
+    args: argparse.Namespace,
+    executor: Executor,
+    suite_name: str,
+    tests: list[dict[str, Any]],
+    ntest: list[int],
+    results: list[TestResult],
+    on_result: Callable[[str, int, dict[str, Any], TestResult], None] | None,
+    journal: Journal | None,
+) -> tuple[list[dict[str, Any]], list[int], list[TestResult]]:
+    """
+    Re-run the tests whose entry, tool, job or input files change.
+
+    The test file is reloaded when it changes and only new or modified
+    entries are re-run, like in the first run. Stops at the first
+    KeyboardInterrupt and returns the latest tests, selection, and results.
+    """
+    suite_path = os.path.abspath(args.test)
+    latest = {
+        utils.get_test_id(tests[i]): result
+        for i, result in zip(ntest, results, strict=True)
+    }
+    watcher = FileWatcher(args.watch_interval)
+    try:
+        while True:
+            dependencies = {
+                utils.get_test_id(tests[i]): get_test_dependencies(tests[i])
+                for i in ntest
+            }
+            watcher.watch(
+                set().union(*dependencies.values()) | {suite_path},
+            )
+            logger.info("Watching %i tests for changes", len(ntest))
+            changed = watcher.wait_for_changes()
+
+            rerun = {
+                test_id for test_id, paths in dependencies.items() if paths & changed
+            }
+            if suite_path in changed:
+                try:
+                    new_tests = _load_tests(args)
+                except ValidationException as err:
+                    logger.error("Not reloading %s: %s", args.test, err)
+                    continue
+                if (new_ntest := _select_tests(args, new_tests)) is None:
+                    continue
+                old_entries = {utils.get_test_id(tests[i]): tests[i] for i in ntest}
+                for i in new_ntest:
+                    test_id = utils.get_test_id(new_tests[i])
+                    if test_id not in old_entries or not _same_entry(
+                        old_entries[test_id], new_tests[i]
+                    ):
+                        rerun.add(test_id)
+                tests, ntest = new_tests, new_ntest
+
+            isolated: list[_Reruns] = []
+            jobs: dict[Future[TestResult], tuple[int, threading.Event]] = {}
+            for i in ntest:
+                if utils.get_test_id(tests[i]) in rerun:
+                    job = _start_test(executor, args, tests, i, isolated)
+                    jobs[job] = i, _add_done_callbacks(
+                        job,
+                        _result_callbacks(suite_name, tests, i, on_result, journal),
+                    )
+            for reruns in isolated:
+                reruns.start()
+            for job in as_completed(jobs):
+                i, notified = jobs[job]
+                test_id = utils.get_test_id(tests[i])
+                previous = latest.get(test_id)
+                latest[test_id] = _job_result(args, tests[i], job)
+                notified.wait()
+                if previous is None or (
+                    previous.return_code != latest[test_id].return_code
+                ):
+                    logger.info(
+                        "Test [%i] %s: %s",
+                        i + 1,
+                        test_id,
+                        _status(latest[test_id]),
+                    )
+            selected = [latest[utils.get_test_id(tests[i])] for i in ntest]
+            logger.info(
+                "%i tests passed, %i failures, %i unsupported features",
+                sum(1 for r in selected if r.return_code == 0),
+                sum(
+                    1 for r in selected if r.return_code not in (0, UNSUPPORTED_FEATURE)
+                ),
+                sum(1 for r in selected if r.return_code == UNSUPPORTED_FEATURE),
+            )
+    except KeyboardInterrupt:
+        processes.kill_all(args.kill_grace)
+    finally:
+        watcher.close()
+    return tests, ntest, [latest[utils.get_test_id(tests[i])] for i in ntest]
+
+
+def _start_test(
+    executor: Executor,
+    args: argparse.Namespace,
+    tests: list[dict[str, Any]],
+    i: int,
+    isolated: list[_Reruns],
+) -> Future[TestResult]:
+    """
+    Start running a test, rerun on failures with --reruns.
+
+    The flaky tests of --isolate-flaky are added to ``isolated`` instead, to
+    be started after the others.
+    """
+    if not args.reruns and not args.isolated:
+        return _submit_test(executor, args, tests[i], i + 1, len(tests))
+    reruns = _Reruns(executor, args, tests[i], i + 1, len(tests))
+    if utils.get_test_id(tests[i]) in args.isolated:
+        isolated.append(reruns)
+    else:
+        reruns.start()
+    return reruns
+
+
+def _result_callbacks(
+    suite_name: str,
+    tests: list[dict[str, Any]],
+    i: int,
+    on_result: Callable[[str, int, dict[str, Any], TestResult], None] | None,
+    journal: Journal | None = None,
+) -> list[Callable[[Future[TestResult]], None]]:
+    """Return the callbacks that report the result of a test, as it completes."""
+    callbacks: list[Callable[[Future[TestResult]], None]] = []
+    if on_result:
+        callbacks.append(
+            functools.partial(_notify_result, on_result, suite_name, i + 1, tests[i])
+        )
+    if journal:
+        callbacks.append(
+            functools.partial(_journal_result, journal, suite_name, i + 1, tests[i])
+        )
+    return callbacks
+
+
+def _journal_result(
+    journal: Journal,
+    suite_name: str,
+    number: int,
+    test: dict[str, Any],
+    job: Future[TestResult],
+) -> None:
+    if not job.cancelled() and job.exception() is None:
+        journal.append(suite_name, number, utils.get_test_id(test), test, job.result())
+
+
+def _resumed_results(
+    path: str, suite_name: str, tests: list[dict[str, Any]], ntest: list[int]
+) -> dict[int, TestResult]:
+    """Collect the results of the selected tests that are already in a journal."""
+    selected = {utils.get_test_id(tests[i]): i for i in ntest}
+    completed = {}
+    for record in read_journal(path):
+        i = selected.get(record["id"])
+        if (
+            record["suite"] == suite_name
+            and i is not None
+            and _same_entry(record["test"], tests[i])
+        ):
+            completed[i] = TestResult.from_dict(record["result"])
+    return completed
+
+
+def _status(result: TestResult) -> str:
+    if result.return_code == 0:
+        return "passed"
+    if result.return_code == UNSUPPORTED_FEATURE:
+        return "unsupported"
+    return "failed"
+
+
+def _notify_result(
+    on_result: Callable[[str, int, dict[str, Any], TestResult], None],
+    suite_name: str,
+    number: int,
+    test: dict[str, Any],
+    job: Future[TestResult],
+) -> None:
+    if not job.cancelled() and job.exception() is None:
+        on_result(suite_name, number, test, job.result())
+
+
+def _add_done_callbacks(
+    job: Future[TestResult], callbacks: list[Callable[[Future[TestResult]], None]]
+) -> threading.Event:
+    """Call ``callbacks`` once ``job`` is done; return an event set after them."""
+    called = threading.Event()
+
+    def call(job: Future[TestResult]) -> None:
+        try:
+            for callback in callbacks:
+                callback(job)
+        finally:
+            called.set()
+
+    job.add_done_callback(call)
+    return called
+
+
+def main() -> int:
+    """Run the main logic loop."""
+    if sys.argv[1:2] == ["merge"]:
+        from cwltest import merge
+
+        return merge.main(sys.argv[2:])
+    if sys.argv[1:2] == ["worker"]:
+        return worker_main(sys.argv[2:])
+    if sys.argv[1:2] == ["serve"]:
+        from cwltest import serve
+
+        return serve.main(sys.argv[2:])
+
+    if sys.argv[1:2] == ["coordinator"]:
+        args = coordinator_arg_parser().parse_args(sys.argv[2:])
+    else:
+        args = arg_parser().parse_args(sys.argv[1:])
+
+    if not args.test:
+        arg_parser().print_help()
+        return 1
+
+    return run(args)
+
+
+def _report_memory_growth(
+    executor: RecyclingProcessPool, run_suites: list["_Suite"], count: int = 10
+) -> None:
+    """Log the tests during which the memory of the workers grew the most."""
+    growths = []
+    for suite in run_suites:
+        for i, job in zip(suite.ntest, suite.jobs, strict=False):
+            if isinstance(job, _Reruns):
+                job = job.attempts[-1]
+            growth = executor.memory_growth.get(job)
+            # less than a MiB is the noise of the allocators
+            if growth is not None and growth.rss >= 2**20:
+                name = utils.get_test_id(suite.tests[i])
+                if len(run_suites) > 1:
+                    name = f"{suite.name}#{name}"
+                growths.append((growth, i + 1, name))
+    if not growths:
+        logger.info("No memory growth of the workers during the tests")
+        return
+    growths.sort(key=lambda item: item[0].rss, reverse=True)
+    logger.info("Largest memory growths of the workers:")
+    for growth, number, name in growths[:count]:
+        logger.info(
+            "  [%i] %s: %+.1f MiB resident, %+.1f MiB traced",
+            number,
+            name,
+            growth.rss / 2**20,
+            growth.traced / 2**20,
+        )
+
+
+@contextlib.contextmanager
+def _session(
+    start: Callable[..., Any] | None,
+    finish: Callable[..., Any] | None,
+    run_suites: list["_Suite"],
+) -> Iterator[Any]:
+    """Call the session hooks around a run, giving the context to the tests."""
+    session = None
+    if start:
+        session = utils.call_hook(
+            start, tests=[suite.tests[i] for suite in run_suites for i in suite.ntest]
+        )
+    for suite in run_suites:
+        suite.args.session_context = session
+    try:
+        yield session
+    finally:
+        if finish:
+            utils.call_hook(finish, session=session)
+
+
+class _Suite:
+    """A test file of a run, with its selected tests and their results."""
+
+    def __init__(
+        self,
+        args: argparse.Namespace,
+        name: str,
+        tests: list[dict[str, Any]],
+        variant: str | None = None,
+    ) -> None:
+        self.args = args
+        self.name = name
+        self.tests = tests
+        self.variant = variant
+        self.runner = ""
+        self.ntest: list[int] = []
+        self.completed: dict[int, TestResult] = {}
+        self.jobs: list[Future[TestResult]] = []
+        # set once the result of each job was reported and journaled
+        self.notified: list[threading.Event] = []
+        self.results: list[TestResult] = []
+
+
+def _preflight(run_suites: list[_Suite], skip_broken: bool) -> int:
+    """
+    Check the files of the tests to run, and report the missing ones.
+
+    With ``skip_broken``, the tests with missing files fail without running.
+    Returns the number of such tests.
+    """
+    selected = [
+        (suite, i)
+        for suite in run_suites
+        for i in suite.ntest
+        if i not in suite.completed
+    ]
+    problems = preflight.check_tests([suite.tests[i] for suite, i in selected])
+    broken = 0
+    # the suites of a --matrix share their tests, to report once
+    reported: set[tuple[str, int]] = set()
+    for (suite, i), test_problems in zip(selected, problems, strict=True):
+        if not test_problems:
+            continue
+        if skip_broken:
+            suite.completed[i] = _not_run_result(
+                suite.args,
+                suite.tests[i],
+                1,
+                "Not run, %s" % "; ".join(test_problems),
+            )
+        if (suite.args.test, i) in reported:
+            continue
+        reported.add((suite.args.test, i))
+        broken += 1
+        for problem in test_problems:
+            logger.error(
+                "Test [%i] %s: %s",
                 i + 1,
-                len(tests),
+                utils.get_test_id(suite.tests[i]),
+                problem,
             )
-            for i in ntest
+    if broken:
+        logger.error(
+            "Pre-flight check: %i of %i tests refer to missing files%s",
+            broken,
+            len({(suite.args.test, i) for suite, i in selected}),
+            ", not running them" if skip_broken else "",
+        )
+    else:
+        logger.info("Pre-flight check: all the files of the tests exist")
+    return broken
+
+
+def _print_matrix(run_suites: list[_Suite]) -> None:
+    """Print the status and duration of each test with each runner, side by side."""
+    variants = list(dict.fromkeys(cast(str, suite.variant) for suite in run_suites))
+    several_files = len(run_suites) > len(variants)
+    rows: dict[str, dict[str, str]] = {}
+    totals = {variant: [0, 0, 0, 0.0] for variant in variants}
+    for suite in run_suites:
+        variant = cast(str, suite.variant)
+        file_name = suite.name[len(variant) + 1 :]
+        for i, result in zip(suite.ntest, suite.results, strict=False):
+            test = f"[{i + 1}] {utils.get_test_id(suite.tests[i])}"
+            if several_files:
+                test = f"{file_name} {test}"
+            status = _status(result)
+            rows.setdefault(test, {})[variant] = f"{status} {result.duration:.1f}s"
+            totals[variant][["passed", "failed", "unsupported"].index(status)] += 1
+            totals[variant][3] += result.duration
+    table = [["test"] + variants]
+    for test, cells in rows.items():
+        table.append([test] + [cells.get(variant, "-") for variant in variants])
+    table.append(
+        ["total"]
+        + [
+            "%i passed, %i failed, %i unsupported %.1fs" % tuple(totals[variant])
+            for variant in variants
         ]
+    )
+    widths = [max(len(row[column]) for row in table) for column in range(len(table[0]))]
+    for row in table:
+        print(
+            "  ".join(
+                cell.ljust(width) for cell, width in zip(row, widths, strict=True)
+            ).rstrip()
+        )
+
+
+def _suite_names(paths: list[str]) -> list[str]:
+    """Name the test suites after their files, with their directories if needed."""
+    names = [os.path.splitext(os.path.basename(path))[0] for path in paths]
+    if len(set(names)) == len(names):
+        return names
+    common = os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in paths])
+    return [
+        os.path.splitext(os.path.relpath(os.path.abspath(path), common))[0]
+        for path in paths
+    ]
+
+
+def run(
+    args: argparse.Namespace,
+    executor: Executor | None = None,
+    on_result: Callable[[str, int, dict[str, Any], TestResult], None] | None = None,
+    suites: utils.SuiteCache | None = None,
+) -> int:
+    """
+    Run the tests selected by parsed command line arguments.
+
+    The tests of all the test files run on ``executor`` when given, otherwise
+    on a pool of ``args.j`` threads, or on the workers of a coordinator when
+    ``args.listen`` is set. ``on_result`` is called with the suite name,
+    number, entry and result of each test as soon as it completes. Test files
+    are loaded through ``suites`` when given. Returns the exit code of the run.
+    """
+    if "--" in args.args:
+        args.args.remove("--")
+
+    # Remove test arguments with wrong syntax
+    if args.testargs is not None:
+        args.testargs = [
+            testarg for testarg in args.testargs if testarg.count("==") == 1
+        ]
+
+    names = _suite_names(args.test)
+    if len(set(names)) != len(names):
+        logger.error("The same test file is given more than once")
+        return 1
+    variants: list[utils.MatrixVariant] = []
+    if args.matrix:
+        try:
+            variants = utils.load_matrix(args.matrix)
+        except (OSError, ValueError) as err:
+            logger.error("Invalid --matrix: %s", err)
+            return 1
+    if args.executor:
+        try:
+            utils.load_executor(args.executor)
+        except ValueError as err:
+            logger.error("Invalid --executor: %s", err)
+            return 1
+    if args.batch_executor:
+        try:
+            utils.load_batch_executor(args.batch_executor)
+        except ValueError as err:
+            logger.error("Invalid --batch-executor: %s", err)
+            return 1
+    start: Callable[..., Any] | None = None
+    finish: Callable[..., Any] | None = None
+    if args.session_hooks:
         try:
-            (
-                total,
-                passed,
-                failures,
-                unsupported,
-                ntotal,
-                npassed,
-                nfailures,
-                nunsupported,
-                report,
-            ) = utils.parse_results(
-                (job.result() for job in jobs), tests, suite_name, report
+            start, finish = utils.load_session_hooks(args.session_hooks)
+        except ValueError as err:
+            logger.error("Invalid --session-hooks: %s", err)
+            return 1
+    if args.skip_known_unsupported and not args.history:
+        logger.error("--skip-known-unsupported requires --history")
+        return 1
+    if args.adaptive_timeout and not args.history:
+        logger.error("--adaptive-timeout requires --history")
+        return 1
+    args.flaky_lane = None
+    if args.isolate_flaky is not None:
+        if not args.history:
+            logger.error("--isolate-flaky requires --history")
+            return 1
+        if args.executor or args.batch_executor or getattr(args, "listen", None):
+            logger.error("--isolate-flaky only applies to tests run by this process")
+            return 1
+        args.flaky_lane = threading.Lock()
+    if args.prefetch_images and getattr(args, "listen", None):
+        logger.error("--prefetch-images does not apply to remote workers")
+        return 1
+    if args.test_cpus and not args.cgroup:
+        logger.error("--test-cpus requires --cgroup")
+        return 1
+    if args.cgroup:
+        try:
+            limits.check_cgroup(
+                args.cgroup,
+                (["memory"] if args.test_memory else [])
+                + (["cpu"] if args.test_cpus else []),
+            )
+        except ValueError as err:
+            logger.error("Invalid --cgroup: %s", err)
+            return 1
+    # the tests share the host with the others of the executor, even of other runs
+    args.slots = getattr(executor, "workers", args.j)
+    args.cpu_allocator = None
+    if args.pin_cpus:
+        if (
+            args.executor
+            or args.batch_executor
+            or getattr(args, "listen", None)
+            or args.warm_runner
+            or not hasattr(os, "sched_setaffinity")
+        ):
+            logger.error("--pin-cpus only applies to runners started for each test")
+            return 1
+        # the executor may share its CPUs with other runs
+        args.cpu_allocator = getattr(
+            executor, "cpu_allocator", None
+        ) or resources.CpuAllocator(resources.available_cpus(), args.slots)
+        logger.info(
+            "Pinning the tests to %i CPUs, %i each unless they declare coresMin",
+            len(args.cpu_allocator.cpus),
+            args.cpu_allocator.share,
+        )
+
+    load_optional_fsaccess_plugin()
+
+    run_suites = []
+    for path, name in zip(args.test, names, strict=True):
+        suite_args = argparse.Namespace(**vars(args))
+        suite_args.test = path
+        suite_args.test_basedir = os.path.dirname(utils.absuri(path)) + "/"
+        if args.baseuri is None:
+            suite_args.baseuri = "file://" + suite_args.test_basedir
+        if not suite_args.baseuri.endswith("/"):
+            suite_args.baseuri = suite_args.baseuri + "/"
+        try:
+            tests = _load_tests(suite_args, suites)
+        except ValidationException:
+            return 1
+        run_suites.append(_Suite(suite_args, name, tests))
+
+    if args.show_tags:
+        alltags: set[str] = set()
+        for suite in run_suites:
+            for t in suite.tests:
+                ts = t.get("tags", [])
+                alltags |= set(ts)
+        for tag in sorted(alltags):
+            print(tag)
+        return 0
+
+    if args.l:
+        for suite in run_suites:
+            if len(run_suites) > 1:
+                print(suite.args.test)
+            for i, t in enumerate(suite.tests):
+                if t.get("short_name"):
+                    print(
+                        "[%i] %s: %s"
+                        % (
+                            i + 1,
+                            t["short_name"],
+                            t.get("doc", "").replace("\n", " ").strip(),
+                        )
+                    )
+                else:
+                    print(
+                        "[%i] %s" % (i + 1, t.get("doc", "").replace("\n", " ").strip())
+                    )
+
+        return 0
+
+    if variants:
+        # the cross product of test files and runners, sharing the loaded tests
+        run_suites = [
+            _Suite(
+                argparse.Namespace(
+                    **{
+                        **vars(suite.args),
+                        "tool": variant.tool or args.tool,
+                        "args": args.args + variant.args,
+                    }
+                ),
+                f"{variant.name}/{suite.name}",
+                suite.tests,
+                variant.name,
+            )
+            for suite in run_suites
+            for variant in variants
+        ]
+    if args.watch and len(run_suites) > 1:
+        logger.error("--watch only supports a single --test, without --matrix")
+        return 1
+
+    history = RunHistory(args.history) if args.history else None
+    # durations are recorded along the speed of the host, to compare them
+    speed = host_speed() if history else None
+    if speed and args.adaptive_timeout:
+        logger.info("Host speed baseline: %.3f seconds", speed)
+    identities: dict[str, str] = {}
+    known_unsupported: dict[str, set[str]] = {}
+    for suite in run_suites:
+        suite.args.known_unsupported = set()
+        suite.args.isolated = set()
+        if not history:
+            continue
+        tool = suite.args.tool
+        if tool not in identities:
+            identities[tool] = runner_identity(tool)
+            known_unsupported[tool] = set()
+            if args.skip_known_unsupported:
+                known_unsupported[tool] = history.known_unsupported_tags(
+                    identities[tool], args.reprobe_interval * 86400
+                )
+                known_unsupported[tool].discard(REQUIRED)
+                if known_unsupported[tool]:
+                    logger.info(
+                        "Not running tests with known unsupported tags%s: %s",
+                        f" on {tool}" if variants else "",
+                        ", ".join(sorted(known_unsupported[tool])),
+                    )
+        suite.runner = identities[tool]
+        suite.args.known_unsupported = known_unsupported[tool]
+        if args.adaptive_timeout and speed:
+            suite.args.adaptive_timeouts = history.adaptive_timeouts(
+                suite.runner, suite.name, args.adaptive_timeout, speed
             )
-        except KeyboardInterrupt:
-            for job in jobs:
-                job.cancel()
-            logger.error("Tests interrupted")
+        if args.isolate_flaky is not None:
+            suite.args.isolated = {
+                test_id
+                for test_id, rate in history.flaky_tests(
+                    suite.runner, suite.name
+                ).items()
+                if rate >= args.isolate_flaky
+            }
+
+    for suite in run_suites:
+        if (ntest := _select_tests(suite.args, suite.tests)) is None:
+            return 1
+        suite.ntest = ntest
+
+    if args.shard:
+        shard_index, shard_count = args.shard
+        selected = [(suite, i) for suite in run_suites for i in suite.ntest]
+        durations: dict[str, float] = {}
+        if history:
+            for suite in run_suites:
+                for test_id, duration in history.expected_durations(
+                    suite.runner, suite.name
+                ).items():
+                    durations[f"{suite.name}#{test_id}"] = duration
+        in_shard = set(
+            utils.select_shard(
+                [f"{s.name}#{utils.get_test_id(s.tests[i])}" for s, i in selected],
+                shard_index,
+                shard_count,
+                durations,
+            )
+        )
+        for suite in run_suites:
+            suite.ntest = []
+        for position, (suite, i) in enumerate(selected):
+            if position in in_shard:
+                suite.ntest.append(i)
+        logger.info(
+            "Running shard %i/%i: %i tests",
+            shard_index + 1,
+            shard_count,
+            len(in_shard),
+        )
+
+    if args.resume:
+        if args.journal is None:
+            args.journal = args.resume
+        if os.path.exists(args.resume):
+            for suite in run_suites:
+                suite.completed = _resumed_results(
+                    args.resume, suite.name, suite.tests, suite.ntest
+                )
+        logger.info(
+            "Resuming %s: %i of %i tests already completed",
+            args.resume,
+            sum(len(suite.completed) for suite in run_suites),
+            sum(len(suite.ntest) for suite in run_suites),
+        )
+    if args.preflight or args.preflight_only or args.skip_broken:
+        broken = _preflight(run_suites, args.skip_broken)
+        if args.preflight_only:
+            return 1 if broken else 0
+
+    journal = Journal(args.journal) if args.journal else None
+
+    prefetcher = None
+    if args.prefetch_images:
+        prefetcher = images.ImagePrefetcher(
+            shlex.split(args.container_cli), args.prefetch_jobs
+        )
+        for suite in run_suites:
+            for i in suite.ntest:
+                if i not in suite.completed:
+                    prefetcher.prefetch(images.required_images(suite.tests[i]))
+        if args.executor or args.batch_executor:
+            # the tests do not run in this process, to wait for their images
+            prefetcher.wait()
+        else:
+            for suite in run_suites:
+                suite.args.image_prefetcher = prefetcher
+
+    # the session is finished once the executor is shut down
+    with _session(start, finish, run_suites) as session:
+        if executor is None:
+            if getattr(args, "listen", None):
+                executor = Coordinator(
+                    args.listen,
+                    args.lease_timeout
+                    or max(
+                        (
+                            _test_timeout(suite.args, suite.tests[i])
+                            for suite in run_suites
+                            for i in suite.ntest
+                        ),
+                        default=args.timeout,
+                    )
+                    + 60,
+                )
+            elif args.batch_executor:
+                executor = BatchExecutor(
+                    utils.bind_session(
+                        utils.load_batch_executor(args.batch_executor),
+                        session,
+                    ),
+                    max_workers=args.j,
+                    batch_size=args.batch_size,
+                    execute=(
+                        utils.bind_session(utils.load_executor(args.executor), session)
+                        if args.executor
+                        else None
+                    ),
+                )
+            elif args.executor:
+                # the executor module is imported once in each worker process
+                executor = RecyclingProcessPool(
+                    max_workers=args.j,
+                    initializer=utils.load_executor,
+                    initargs=(args.executor,),
+                    max_tasks=args.max_tests_per_worker,
+                    max_rss=args.max_worker_rss and args.max_worker_rss << 20,
+                    track_memory=args.track_memory,
+                )
+            else:
+                executor = ThreadPoolExecutor(max_workers=args.j)
+        with executor:
+            # the flaky tests start after the others
+            isolated: list[_Reruns] = []
+            # all the test files share the executor, the next one starting while
+            # the last tests of the previous one are still running
+            for suite in run_suites:
+                tests = suite.tests
+                for i in suite.ntest:
+                    if i in suite.completed:
+                        done: Future[TestResult] = Future()
+                        done.set_result(suite.completed[i])
+                        suite.jobs.append(done)
+                        suite.notified.append(
+                            _add_done_callbacks(
+                                done, _result_callbacks(suite.name, tests, i, on_result)
+                            )
+                        )
+                        continue
+                    job = _start_test(executor, suite.args, tests, i, isolated)
+                    suite.jobs.append(job)
+                    suite.notified.append(
+                        _add_done_callbacks(
+                            job,
+                            _result_callbacks(suite.name, tests, i, on_result, journal),
+                        )
+                    )
+            if isolated:
+                logger.info(
+                    "Running %i flaky tests after the others, one at a time",
+                    len(isolated),
+                )
+            for reruns in isolated:
+                reruns.start()
+            try:
+                for suite in run_suites:
+                    for i, job, notified in zip(
+                        suite.ntest, suite.jobs, suite.notified, strict=True
+                    ):
+                        suite.results.append(
+                            _job_result(suite.args, suite.tests[i], job)
+                        )
+                        # or the run could end before the result is reported
+                        notified.wait()
+                if args.watch:
+                    (suite,) = run_suites
+                    suite.tests, suite.ntest, suite.results = _watch(
+                        suite.args,
+                        executor,
+                        suite.name,
+                        suite.tests,
+                        suite.ntest,
+                        suite.results,
+                        on_result,
+                        journal,
+                    )
+            except KeyboardInterrupt:
+                for suite in run_suites:
+                    for job in suite.jobs:
+                        job.cancel()
+                logger.error("Tests interrupted")
+                # the runners, in their own sessions, did not get the SIGINT
+                processes.kill_all(args.kill_grace)
+        if journal:
+            journal.close()
+    if prefetcher is not None:
+        prefetcher.shutdown()
+
+    total = failures = unsupported = 0
+    reports = []
+    for suite in run_suites:
+        (
+            suite_total,
+            _,
+            suite_failures,
+            suite_unsupported,
+            ntotal,
+            npassed,
+            nfailures,
+            nunsupported,
+            report,
+        ) = utils.parse_results(
+            suite.results,
+            [suite.tests[i] for i in suite.ntest],
+            suite.name,
+            utils.JUnitTestSuite(suite.name, []),
+            [i + 1 for i in suite.ntest],
+        )
+        total += suite_total
+        failures += suite_failures
+        unsupported += suite_unsupported
+        reports.append(cast(junit_xml.TestSuite, report))
+
+        if history:
+            # results may be incomplete after an interruption; the ones of
+            # --resume and --skip-broken are not of tests run now
+            history.record(
+                suite.runner,
+                suite.name,
+                [
+                    (suite.tests[i], result)
+                    for i, result in zip(suite.ntest, suite.results, strict=False)
+                    if i not in suite.completed
+                    and not _known_unsupported(suite.args, suite.tests[i])
+                ],
+                speed,
+                bool(args.reruns),
+            )
+
+        if args.badgedir:
+            badgedir = args.badgedir
+            if len(run_suites) > 1:
+                badgedir = os.path.join(args.badgedir, suite.name)
+                os.makedirs(os.path.dirname(badgedir), exist_ok=True)
+            utils.generate_badges(badgedir, ntotal, npassed, nfailures, nunsupported)
+
+        if len(run_suites) > 1:
+            logger.info(
+                "%s: %i tests passed, %i failures, %i unsupported features",
+                suite.name,
+                suite_total - (suite_failures + suite_unsupported),
+                suite_failures,
+                suite_unsupported,
+            )
+
+    if history:
+        history.save()
+
+    if isinstance(executor, RecyclingProcessPool) and args.track_memory:
+        _report_memory_growth(executor, run_suites)
+
+    if variants:
+        _print_matrix(run_suites)
 
     if args.junit_xml:
         with open(args.junit_xml, "w") as xml:
-            junit_xml.to_xml_report_file(xml, [cast(junit_xml.TestSuite, report)])
+            junit_xml.to_xml_report_file(xml, reports)
 
-    if args.badgedir:
-        utils.generate_badges(args.badgedir, ntotal, npassed, nfailures, nunsupported)
+    if orphans := sum(
+        result.orphans for suite in run_suites for result in suite.results
+    ):
+        logger.warning("Stopped %i processes left running by the runners", orphans)
 
     if failures == 0 and unsupported == 0:
         logger.info("All tests passed")
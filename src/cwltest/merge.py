@@ -0,0 +1,216 @@
+"""Merge the journals of several (partial) runs into one set of reports."""
+
+import argparse
+import os
+import tempfile
+from collections import Counter, defaultdict
+from typing import IO, NamedTuple
+from xml.etree import ElementTree  # nosec
+from xml.sax.saxutils import quoteattr  # nosec
+
+import junit_xml
+
+from cwltest import UNSUPPORTED_FEATURE, logger, utils
+from cwltest.argparser import merge_arg_parser
+from cwltest.journal import index_journal, read_journal_record
+from cwltest.utils import CWLTestReport, TestResult
+
+
+class _Entry(NamedTuple):
+    """Where to find the retained result of a test, and how it went."""
+
+    order: int
+    path: str
+    offset: int
+    number: int
+    return_code: int
+
+
+def _severity(return_code: int) -> int:
+    if return_code == 0:
+        return 0
+    if return_code == UNSUPPORTED_FEATURE:
+        return 1
+    return 2
+
+
+def _index(paths: list[str], policy: str) -> dict[str, list[_Entry]]:
+    """Pick the result to keep for each test, grouped by suite in test order."""
+    retained: dict[tuple[str, str], _Entry] = {}
+    suites: dict[str, None] = {}
+    order = 0
+    for path in paths:
+        for offset, record in index_journal(path):
+            key = (record["suite"], record["id"])
+            suites.setdefault(record["suite"])
+            entry = _Entry(
+                order, path, offset, record["number"], record["result"]["return_code"]
+            )
+            order += 1
+            previous = retained.get(key)
+            if (
+                previous is None
+                or policy == "latest"
+                or _severity(entry.return_code) >= _severity(previous.return_code)
+            ):
+                retained[key] = entry
+    grouped: dict[str, list[_Entry]] = {suite: [] for suite in suites}
+    for (suite, _), entry in retained.items():
+        grouped[suite].append(entry)
+    for entries in grouped.values():
+        entries.sort(key=lambda entry: (entry.number, entry.order))
+    return grouped
+
+
+def _write_cases(body: IO[str], suite: junit_xml.TestSuite) -> None:
+    """Write the test case elements of a suite, as junit_xml builds them."""
+    for element in suite.build_xml_doc():
+        ElementTree.indent(element, "\t", level=2)
+        element.tail = None
+        text = ElementTree.tostring(element, encoding="unicode")
+        # like junit_xml, leave out what XML cannot hold
+        body.write(f"\t\t{junit_xml._clean_illegal_xml_chars(text)}\n")
+
+
+def _write_junit(
+    xml: IO[str], suites: list[junit_xml.TestSuite], bodies: list[IO[str]]
+) -> None:
+    """Write the JUnit XML report, with test cases already written to ``bodies``."""
+    totals: dict[str, int | float] = dict.fromkeys(
+        ("disabled", "errors", "failures", "tests"), 0
+    )
+    totals["time"] = 0.0
+    headers = []
+    for suite in suites:
+        header = suite.build_xml_doc()
+        for key in ("disabled", "errors", "failures", "tests"):
+            totals[key] += int(header.get(key, 0))
+        totals["time"] += float(header.get("time", 0))
+        headers.append(header)
+    xml.write('<?xml version="1.0" ?>\n<testsuites')
+    for key, value in totals.items():
+        xml.write(f" {key}={quoteattr(str(value))}")
+    xml.write(">\n")
+    for header, body in zip(headers, bodies, strict=True):
+        xml.write("\t<testsuite")
+        for key, value in header.attrib.items():
+            xml.write(f" {key}={quoteattr(value)}")
+        xml.write(">\n")
+        body.seek(0)
+        while chunk := body.read(1 << 16):
+            xml.write(chunk)
+        xml.write("\t</testsuite>\n")
+    xml.write("</testsuites>\n")
+
+
+def merge(
+    paths: list[str],
+    policy: str = "latest",
+    junit_xml_path: str | None = None,
+    badgedir: str | None = None,
+) -> tuple[int, int, int]:
+    """
+    Merge the results of several journals.
+
+    When a test has several results, the one written last is kept, or with
+    the ``worst`` policy, the worst one (failure, then unsupported, then
+    success). Results are read back one at a time, so that their outputs are
+    never all in memory at once.
+
+    Returns the number of tests, failures and unsupported features.
+    """
+    badges: list[
+        tuple[
+            str,
+            dict[str, int],
+            dict[str, list[CWLTestReport]],
+            dict[str, list[CWLTestReport]],
+            dict[str, list[CWLTestReport]],
+        ]
+    ] = []
+    total = failures = unsupported = 0
+    suites: list[junit_xml.TestSuite] = []
+    bodies: list[IO[str]] = []
+    try:
+        for suite_name, entries in _index(paths, policy).items():
+            suite = junit_xml.TestSuite(suite_name, [])
+            body = tempfile.TemporaryFile("w+", encoding="utf-8")
+            suites.append(suite)
+            bodies.append(body)
+            ntotal: dict[str, int] = Counter()
+            npassed: dict[str, list[CWLTestReport]] = defaultdict(list)
+            nfailures: dict[str, list[CWLTestReport]] = defaultdict(list)
+            nunsupported: dict[str, list[CWLTestReport]] = defaultdict(list)
+            badges.append((suite_name, ntotal, npassed, nfailures, nunsupported))
+            for entry in entries:
+                record = read_journal_record(entry.path, entry.offset)
+                one_suite = junit_xml.TestSuite(suite_name, [])
+                (
+                    one_total,
+                    _,
+                    one_failure,
+                    one_unsupported,
+                    one_ntotal,
+                    one_npassed,
+                    one_nfailures,
+                    one_nunsupported,
+                    _,
+                ) = utils.parse_results(
+                    [TestResult.from_dict(record["result"])],
+                    [record["test"]],
+                    suite_name,
+                    one_suite,
+                    [entry.number],
+                )
+                total += one_total
+                failures += one_failure
+                unsupported += one_unsupported
+                for tag, count in one_ntotal.items():
+                    ntotal[tag] += count
+                for counts, one_counts in (
+                    (npassed, one_npassed),
+                    (nfailures, one_nfailures),
+                    (nunsupported, one_nunsupported),
+                ):
+                    for tag, reports in one_counts.items():
+                        counts[tag].extend(reports)
+                (case,) = one_suite.test_cases
+                if junit_xml_path:
+                    _write_cases(body, utils.JUnitTestSuite(suite_name, [case]))
+                # keep what the test suite header needs, without the outputs
+                case.stdout = case.stderr = None
+                suite.test_cases.append(case)
+
+        if junit_xml_path:
+            with open(junit_xml_path, "w", encoding="utf-8") as xml:
+                _write_junit(xml, suites, bodies)
+    finally:
+        for handle in bodies:
+            handle.close()
+
+    if badgedir:
+        for suite_name, ntotal, npassed, nfailures, nunsupported in badges:
+            suite_badgedir = badgedir
+            if len(badges) > 1:
+                # one directory for each suite, like a run of several test files
+                suite_badgedir = os.path.join(badgedir, suite_name)
+                os.makedirs(os.path.dirname(suite_badgedir), exist_ok=True)
+            utils.generate_badges(
+                suite_badgedir, ntotal, npassed, nfailures, nunsupported
+            )
+    return total, failures, unsupported
+
+
+def main(argv: list[str]) -> int:
+    """Run the merge subcommand."""
+    args: argparse.Namespace = merge_arg_parser().parse_args(argv)
+    total, failures, unsupported = merge(
+        args.journals, args.policy, args.junit_xml, args.badgedir
+    )
+    logger.info(
+        "%i tests passed, %i failures, %i unsupported features",
+        total - (failures + unsupported),
+        failures,
+        unsupported,
+    )
+    return 1 if failures else 0
@@ -1,21 +1,17 @@
 """Discovers CWL test files and converts them to pytest.Items."""
 
 import argparse
-import json
 import os
 import pickle  # nosec
-import time
 import traceback
-from collections.abc import Iterator
+from collections.abc import Callable, Iterable, Iterator
 from io import StringIO
 from pathlib import Path
 from typing import TYPE_CHECKING, Any, Optional, Protocol, Union, cast
-from urllib.parse import urljoin
 
 import pytest
 
-from cwltest import REQUIRED, UNSUPPORTED_FEATURE, logger, utils
-from cwltest.compare import CompareFail, compare
+from cwltest import utils
 
 if TYPE_CHECKING:
     from _pytest._code.code import TracebackStyle
@@ -43,100 +39,102 @@ def _get_comma_separated_option(config: pytest.Config, name: str) -> list[str]:
         return [options.strip()]
 
 
+def _hook_executor(
+    hook: "HookCaller", session: Any = None
+) -> Callable[
+    [utils.CWLTestConfig, str, str | None], tuple[int, dict[str, Any] | None] | None
+]:
+    """Wrap the pytest_cwl_execute_test hook into a function to run tests with."""
+
+    def execute(
+        config: utils.CWLTestConfig, processfile: str, jobfile: str | None
+    ) -> tuple[int, dict[str, Any] | None] | None:
+        hook_out = hook(
+            config=config, processfile=processfile, jobfile=jobfile, session=session
+        )
+        if not hook_out:
+            return None
+        return cast(tuple[int, Optional[dict[str, Any]]], hook_out[0])
+
+    return execute
+
+
 def _run_test_hook_or_plain(
     test: dict[str, str],
     config: utils.CWLTestConfig,
     hook: "HookCaller",
+    session: Any = None,
 ) -> utils.TestResult:
     """Run tests using a provided pytest_cwl_execute_test hook or the --cwl-runner."""
-    processfile, jobfile = utils.prepare_test_paths(test, config.basedir)
-    start_time = time.time()
-    reltool = os.path.relpath(test["tool"], start=config.test_basedir)
-    tooluri = urljoin(config.test_baseuri, reltool)
-    if test.get("job", None):
-        reljob = os.path.relpath(test["job"], start=config.test_basedir)
-        joburi = urljoin(config.test_baseuri, reljob)
-    else:
-        joburi = None
-    outerr = ""
-    hook_out = hook(config=config, processfile=processfile, jobfile=jobfile)
-    if not hook_out:
-        return utils.run_test_plain(config, test)
-    returncode, out = cast(tuple[int, Optional[dict[str, Any]]], hook_out[0])
-    duration = time.time() - start_time
-    outstr = json.dumps(out) if out is not None else "{}"
-    if returncode == UNSUPPORTED_FEATURE:
-        if REQUIRED not in test.get("tags", ["required"]):
-            return utils.TestResult(
-                UNSUPPORTED_FEATURE,
-                outstr,
-                "",
-                duration,
-                config.classname,
-                config.entry,
-                tooluri,
-                joburi,
-            )
-    elif returncode != 0:
-        if not bool(test.get("should_fail", False)):
-            logger.warning("Test failed unexpectedly: %s %s", processfile, jobfile)
-            logger.warning(test.get("doc"))
-            message = "Returned non-zero but it should be zero"
-            return utils.TestResult(
-                1,
-                outstr,
-                outerr,
-                duration,
-                config.classname,
-                config.entry,
-                tooluri,
-                joburi,
-                message,
-            )
-        return utils.TestResult(
-            0,
-            outstr,
-            outerr,
-            duration,
-            config.classname,
-            config.entry,
-            tooluri,
-            joburi,
+    return utils.run_test_function(_hook_executor(hook, session), config, test)
+
+
+def _cwl_session(item: "CWLItem") -> Any:
+    """Start the session on the first test that runs, and return its context."""
+    config = item.config
+    if not hasattr(config, "cwl_session"):
+        tests = [
+            other.spec for other in item.session.items if isinstance(other, CWLItem)
+        ]
+        hook_out = config.hook.pytest_cwl_session_start(tests=tests)
+        config.cwl_session = hook_out[0] if hook_out else None  # type: ignore[attr-defined]
+    return config.cwl_session  # type: ignore[attr-defined]
+
+
+class _Batches:
+    """Run the tests with the pytest_cwl_execute_tests_batch hook."""
+
+    def __init__(self, config: pytest.Config) -> None:
+        self.config = config
+        self.session: Any = None
+        self.scheduled: set[str] = set()
+        self.results: dict[str, utils.TestResult] = {}
+        self.batches: dict[str, tuple[list["CWLItem"], Iterator[Any]]] = {}
+
+    def _execute_batch(
+        self, tests: list[tuple[utils.CWLTestConfig, str, str | None]]
+    ) -> Iterable[tuple[int, tuple[int, dict[str, Any] | None]]] | None:
+        hook_out = self.config.hook.pytest_cwl_execute_tests_batch(
+            tests=tests, session=self.session
         )
-    if bool(test.get("should_fail", False)):
-        return utils.TestResult(
-            1,
-            outstr,
-            outerr,
-            duration,
-            config.classname,
-            config.entry,
-            tooluri,
-            joburi,
-            "Test should failed, but it did not.",
+        if not hook_out:
+            return None
+        return cast(
+            Iterable[tuple[int, tuple[int, Optional[dict[str, Any]]]]], hook_out[0]
         )
 
-    fail_message = ""
-
-    try:
-        compare(test.get("output"), out)
-    except CompareFail as ex:
-        logger.warning("""Test failed: %s %s""", processfile, jobfile)
-        logger.warning(test.get("doc"))
-        logger.warning("Compare failure %s", ex)
-        fail_message = str(ex)
-
-    return utils.TestResult(
-        (1 if fail_message else 0),
-        outstr,
-        outerr,
-        duration,
-        config.classname,
-        config.entry,
-        tooluri,
-        joburi,
-        fail_message,
-    )
+    def _start(self, item: "CWLItem") -> None:
+        """Run a batch of this test and the next ones of the session."""
+        self.session = _cwl_session(item)
+        items = item.session.items
+        batch = [item]
+        for other in items[items.index(item) + 1 :]:
+            if len(batch) >= self.config.getoption("cwl_batch_size"):
+                break
+            if (
+                isinstance(other, CWLItem)
+                and other.nodeid not in self.scheduled
+                and other.get_closest_marker("skip") is None
+            ):
+                batch.append(other)
+        results = utils.run_tests_batch(
+            self._execute_batch,
+            _hook_executor(self.config.hook.pytest_cwl_execute_test, self.session),
+            [(other.cwl_config(), other.spec) for other in batch],
+        )
+        for other in batch:
+            self.scheduled.add(other.nodeid)
+            self.batches[other.nodeid] = (batch, results)
+
+    def result(self, item: "CWLItem") -> utils.TestResult:
+        """Wait for the result of a test, from its batch."""
+        if item.nodeid not in self.scheduled:
+            self._start(item)
+        batch, results = self.batches.pop(item.nodeid)
+        while item.nodeid not in self.results:
+            index, result = next(results)
+            self.results[batch[index].nodeid] = result
+        return self.results.pop(item.nodeid)
 
 
 class CWLTestException(Exception):
@@ -156,10 +154,10 @@ class CWLItem(pytest.Item):
         super().__init__(name, parent)
         self.spec = spec
 
-    def runtest(self) -> None:
-        """Execute using cwltest."""
+    def cwl_config(self) -> utils.CWLTestConfig:
+        """Return the configuration to run this test with."""
         cwl_args = self.config.getoption("cwl_args")
-        config = utils.CWLTestConfig(
+        return utils.CWLTestConfig(
             basedir=self.config.getoption("cwl_basedir"),
             test_baseuri=self.config.getoption("cwl_basedir"),
             test_basedir=self.config.getoption("cwl_basedir"),
@@ -173,16 +171,24 @@ class CWLItem(pytest.Item):
             tool=self.config.getoption("cwl_runner"),
             args=cwl_args.split(" ") if cwl_args else None,
             testargs=self.config.getoption("cwl_test_arg"),
-            timeout=self.config.getoption("timeout", None),
+            timeout=self.spec.get("timeout") or self.config.getoption("timeout", None),
             verbose=self.config.getoption("verbose", 0) >= 1,
             runner_quiet=not self.config.getoption("cwl_runner_verbose", False),
         )
-        hook = self.config.hook.pytest_cwl_execute_test
-        result = _run_test_hook_or_plain(
-            self.spec,
-            config,
-            hook,
-        )
+
+    def runtest(self) -> None:
+        """Execute using cwltest."""
+        if self.config.hook.pytest_cwl_execute_tests_batch.get_hookimpls():
+            batches = self.config.cwl_batches  # type: ignore[attr-defined]
+            result = cast(_Batches, batches).result(self)
+        else:
+            hook = self.config.hook.pytest_cwl_execute_test
+            result = _run_test_hook_or_plain(
+                self.spec,
+                self.cwl_config(),
+                hook,
+                _cwl_session(self),
+            )
         cwl_results = self.config.cwl_results  # type: ignore[attr-defined]
         cast(list[tuple[dict[str, Any], utils.TestResult]], cwl_results).append(
             (self.spec, result)
@@ -346,6 +352,16 @@ __OPTIONS: list[tuple[str, dict[str, Any]]] = [
             "action": "append",
         },
     ),
+    (
+        "--cwl-batch-size",
+        {
+            "type": int,
+            "dest": "cwl_batch_size",
+            "default": 10,
+            "help": "The largest number of tests given at once to the "
+            "pytest_cwl_execute_tests_batch hook.",
+        },
+    ),
     (
         "--cwl-basedir",
         {
@@ -388,6 +404,7 @@ def pytest_configure(config: pytest.Config) -> None:
     """Store the raw tests and the test results."""
     cwl_results: list[tuple[dict[str, Any], utils.TestResult]] = []
     config.cwl_results = cwl_results  # type: ignore[attr-defined]
+    config.cwl_batches = _Batches(config)  # type: ignore[attr-defined]
 
 
 def _zip_results(
@@ -398,7 +415,11 @@ def _zip_results(
 
 
 def pytest_sessionfinish(session: pytest.Session) -> None:
-    """Generate badges."""
+    """Finish the session of the CWL tests, and generate badges."""
+    if hasattr(session.config, "cwl_session"):
+        session.config.hook.pytest_cwl_session_finish(
+            session=session.config.cwl_session
+        )
     cwl_badgedir = session.config.getoption("cwl_badgedir")
     if not cwl_badgedir:
         return
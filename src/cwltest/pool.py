@@ -0,0 +1,220 @@
+"""
+A pool of worker processes, replaced after some tests or past a memory use.
+
+In-process executors (see ``--executor``) run many tests in the same worker
+processes, where the memory leaked by the CWL runner piles up. This pool
+replaces a worker after a number of tasks, or once its resident memory
+exceeds a threshold. It can also measure how much the memory of the worker
+grew during each task, to find the tests that leak.
+"""
+
+import multiprocessing
+import multiprocessing.connection
+import os
+import queue
+import resource
+import sys
+import threading
+import tracemalloc
+from collections.abc import Callable
+from concurrent.futures import Executor, Future
+from typing import Any, NamedTuple, ParamSpec, TypeVar
+
+from cwltest import logger
+
+_P = ParamSpec("_P")
+_T = TypeVar("_T")
+
+
+class MemoryGrowth(NamedTuple):
+    """How much the memory of a worker grew while running a task, in bytes."""
+
+    rss: int
+    traced: int
+
+
+def _rss() -> int:
+    """Return the resident memory of this process, in bytes."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # the peak rather than the current use
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def _worker(
+    connection: multiprocessing.connection.Connection,
+    initializer: Callable[..., Any] | None,
+    initargs: tuple[Any, ...],
+    track_memory: bool,
+) -> None:
+    if initializer is not None:
+        initializer(*initargs)
+    if track_memory:
+        tracemalloc.start()
+    while (task := connection.recv()) is not None:
+        fn, args, kwargs = task
+        rss_before = _rss()
+        traced_before = tracemalloc.get_traced_memory()[0] if track_memory else 0
+        try:
+            outcome = (True, fn(*args, **kwargs))
+        except Exception as err:
+            outcome = (False, err)
+        rss = _rss()
+        traced = tracemalloc.get_traced_memory()[0] if track_memory else 0
+        connection.send(
+            (*outcome, rss, MemoryGrowth(rss - rss_before, traced - traced_before))
+        )
+
+
+class WorkerDied(RuntimeError):
+    """A worker process exited while running a call, killed for instance."""
+
+
+class _WorkItem(NamedTuple):
+    future: Future[Any]
+    fn: Callable[..., Any]
+    args: tuple[Any, ...]
+    kwargs: dict[str, Any]
+
+
+class RecyclingProcessPool(Executor):
+    """Run calls in worker processes, that are replaced now and then."""
+
+    def __init__(
+        self,
+        max_workers: int,
+        initializer: Callable[..., Any] | None = None,
+        initargs: tuple[Any, ...] = (),
+        max_tasks: int | None = None,
+        max_rss: int | None = None,
+        track_memory: bool = False,
+    ) -> None:
+        """
+        Start ``max_workers`` threads that hand the calls to worker processes.
+
+        Workers are started on first use and run ``initializer(*initargs)``.
+        A worker is replaced after ``max_tasks`` calls, or when its resident
+        memory exceeds ``max_rss`` bytes after a call. With ``track_memory``,
+        the growth of the Python objects of the worker is also measured, with
+        tracemalloc.
+        """
+        self.initializer = initializer
+        self.initargs = initargs
+        self.max_tasks = max_tasks
+        self.max_rss = max_rss
+        self.track_memory = track_memory
+        self.memory_growth: dict[Future[Any], MemoryGrowth] = {}
+        self._queue: queue.SimpleQueue[_WorkItem | None] = queue.SimpleQueue()
+        self._context = multiprocessing.get_context()
+        self._shutdown = False
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._work, daemon=True) for _ in range(max_workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(
+        self, fn: Callable[_P, _T], /, *args: _P.args, **kwargs: _P.kwargs
+    ) -> Future[_T]:
+        """Queue a call, for the next free worker."""
+        future: Future[_T] = Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            self._queue.put(_WorkItem(future, fn, args, kwargs))
+        return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        """Stop the workers once the queued calls are done, or cancelled."""
+        with self._lock:
+            self._shutdown = True
+            if cancel_futures:
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not None:
+                        item.future.cancel()
+            for _ in self._threads:
+                self._queue.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def _start_worker(
+        self,
+    ) -> tuple[
+        multiprocessing.process.BaseProcess, multiprocessing.connection.Connection
+    ]:
+        connection, child = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker,
+            args=(child, self.initializer, self.initargs, self.track_memory),
+            daemon=True,
+        )
+        process.start()
+        child.close()
+        return process, connection
+
+    def _work(self) -> None:
+        worker = None
+        tasks = 0
+        while (item := self._queue.get()) is not None:
+            if not item.future.set_running_or_notify_cancel():
+                continue
+            if worker is None:
+                worker = self._start_worker()
+                tasks = 0
+            process, connection = worker
+            try:
+                connection.send((item.fn, item.args, item.kwargs))
+                succeeded, value, rss, growth = connection.recv()
+            except (EOFError, OSError) as err:
+                process.join()
+                item.future.set_exception(
+                    WorkerDied(
+                        f"The worker process died (exit code {process.exitcode}): "
+                        f"{err}"
+                    )
+                )
+                worker = None
+                continue
+            tasks += 1
+            self.memory_growth[item.future] = growth
+            if succeeded:
+                item.future.set_result(value)
+            else:
+                item.future.set_exception(value)
+            if (self.max_tasks and tasks >= self.max_tasks) or (
+                self.max_rss and rss > self.max_rss
+            ):
+                logger.debug(
+                    "Replacing worker %i after %i tasks, using %i MiB",
+                    process.pid,
+                    tasks,
+                    rss >> 20,
+                )
+                self._stop_worker(process, connection)
+                worker = None
+        if worker is not None:
+            self._stop_worker(*worker)
+
+    @staticmethod
+    def _stop_worker(
+        process: multiprocessing.process.BaseProcess,
+        connection: multiprocessing.connection.Connection,
+    ) -> None:
+        try:
+            connection.send(None)
+        except OSError:
+            pass
+        connection.close()
+        process.join(5)
+        if process.is_alive():
+            process.kill()
+            process.join()
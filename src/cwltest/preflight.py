@@ -0,0 +1,127 @@
+"""
+Check that the files the selected tests refer to exist, before running them.
+
+A mistyped job path or a missing input file otherwise only shows when its
+test runs, possibly at the end of a long run. The tool and job of each test,
+and the ``location`` (or ``path``) of the ``File`` and ``Directory`` objects
+of the job and of the tool, like the defaults of its inputs, are checked
+with the filesystem access of cwltest, the one of the ``cwltest.fsaccess``
+plugin if there is one. Each location is checked once, many at a time.
+"""
+
+import os
+import urllib.parse
+from collections.abc import Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any
+
+from ruamel.yaml import YAML
+from schema_salad.ref_resolver import uri_file_path
+
+import cwltest.compare
+import cwltest.stdfsaccess
+
+# the checks mostly wait for the filesystem or the network
+_WORKERS = 16
+
+
+def _resolve(location: str, base: str) -> str:
+    """Make a location relative to the document it is in absolute."""
+    if urllib.parse.urlsplit(location).scheme or os.path.isabs(location):
+        return location
+    return os.path.normpath(os.path.join(base, location))
+
+
+def _file_objects(document: Any, base: str) -> Iterable[tuple[str, str]]:
+    """Yield the class and absolute location of the File and Directory objects."""
+    if isinstance(document, dict):
+        if document.get("class") in ("File", "Directory"):
+            location = document.get("location", document.get("path"))
+            # neither literals, nor expressions only the runner evaluates
+            if (
+                isinstance(location, str)
+                and not location.startswith("_:")
+                and "$(" not in location
+                and "${" not in location
+            ):
+                yield document["class"], _resolve(location, base)
+        for value in document.values():
+            yield from _file_objects(value, base)
+    elif isinstance(document, list):
+        for entry in document:
+            yield from _file_objects(entry, base)
+
+
+def _local(location: str) -> str:
+    if location.startswith("file://"):
+        return uri_file_path(location.split("#")[0])
+    return location.split("#")[0]
+
+
+def _document_references(
+    kind: str, location: str
+) -> tuple[list[str], list[tuple[str, str]]]:
+    """Return the problems of a tool or job document, and the files it refers to."""
+    path = _local(location)
+    if not _checkable(path):
+        return [], []
+    if not cwltest.compare.fs_access.isfile(path):
+        return [f"missing {kind} {path}"], []
+    if urllib.parse.urlsplit(path).scheme:
+        # a remote document is only checked for existence
+        return [], []
+    try:
+        with open(path, encoding="utf-8") as handle:
+            document = YAML(typ="safe", pure=True).load(handle)
+    except Exception as err:
+        return [f"unreadable {kind} {path}: {err}"], []
+    return [], list(_file_objects(document, os.path.dirname(path)))
+
+
+def _checkable(location: str) -> bool:
+    """Tell whether the filesystem access can check a location."""
+    if urllib.parse.urlsplit(location).scheme in ("", "file"):
+        return True
+    # only a plugin knows about other schemes
+    return not isinstance(cwltest.compare.fs_access, cwltest.stdfsaccess.StdFsAccess)
+
+
+def _check_file(kind: str, location: str) -> str | None:
+    """Return the problem with a File or Directory, None if it exists."""
+    fs_access = cwltest.compare.fs_access
+    path = _local(location)
+    exists = fs_access.isdir(path) if kind == "Directory" else fs_access.isfile(path)
+    return None if exists else f"missing {kind} {path}"
+
+
+def check_tests(tests: list[dict[str, Any]]) -> list[list[str]]:
+    """
+    Check the files the tests refer to.
+
+    Returns the problems found for each test, none when all its files exist.
+    """
+    with ThreadPoolExecutor(max_workers=_WORKERS) as executor:
+        documents = {
+            (kind, test[kind]): executor.submit(_document_references, kind, test[kind])
+            for test in tests
+            for kind in ("tool", "job")
+            if test.get(kind)
+        }
+        files: dict[tuple[str, str], Future[str | None]] = {}
+        for future in documents.values():
+            for reference in future.result()[1]:
+                if reference not in files and _checkable(reference[1]):
+                    files[reference] = executor.submit(_check_file, *reference)
+        problems = []
+        for test in tests:
+            test_problems = []
+            for kind in ("tool", "job"):
+                if not test.get(kind):
+                    continue
+                document_problems, references = documents[(kind, test[kind])].result()
+                test_problems.extend(document_problems)
+                for reference in references:
+                    if reference in files and (problem := files[reference].result()):
+                        test_problems.append(problem)
+            problems.append(list(dict.fromkeys(test_problems)))
+    return problems
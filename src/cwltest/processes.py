@@ -0,0 +1,256 @@
+"""
+Keep track of the process trees of the runners, to stop them as a whole.
+
+Each runner is started in its own session, so that the processes it starts in
+turn, like containers, expression evaluators or workflow steps, share its
+process group. When a test times out, is interrupted, or ends while some of
+these are still running, the whole group is sent SIGTERM, then SIGKILL after
+a grace period. The members of a group are found in ``/proc`` where there is
+one; elsewhere, the group is only signalled.
+
+The CPU time and I/O of the processes of a group also tell whether a runner
+still makes progress, to stop the ones that hang before their timeout.
+"""
+
+import os
+import signal
+import threading
+import time
+from typing import Protocol
+
+from cwltest import logger
+
+
+class Process(Protocol):
+    """The part of subprocess.Popen used here."""
+
+    pid: int
+
+    def poll(self) -> int | None:
+        """Return the exit code, None while running."""
+        ...
+
+
+_groups: set[int] = set()
+_groups_lock = threading.Lock()
+
+
+def register(process: Process) -> None:
+    """Remember the process group of a runner, to stop it on interruption."""
+    with _groups_lock:
+        _groups.add(process.pid)
+
+
+def unregister(process: Process) -> None:
+    """Forget the process group of a runner."""
+    with _groups_lock:
+        _groups.discard(process.pid)
+
+
+def _read_stat(pid: int) -> list[str] | None:
+    """Return the fields of /proc/PID/stat after the command name."""
+    try:
+        with open(f"/proc/{pid}/stat") as stat:
+            # the command name, between parentheses, may contain spaces
+            return stat.read().rpartition(")")[2].split()
+    except OSError:
+        return None
+
+
+def group_members(pgid: int) -> list[int] | None:
+    """Return the live processes of a process group, None without ``/proc``."""
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return None
+    members = []
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        fields = _read_stat(int(entry))
+        if fields is not None and int(fields[2]) == pgid and fields[0] not in "ZX":
+            members.append(int(entry))
+    return members
+
+
+def _group_exists(pgid: int) -> bool:
+    members = group_members(pgid)
+    if members is not None:
+        return bool(members)
+    try:
+        os.killpg(pgid, 0)
+    except (ProcessLookupError, PermissionError):
+        return False
+    return True
+
+
+def _signal_group(pgid: int, signum: int) -> None:
+    try:
+        os.killpg(pgid, signum)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def kill_tree(process: Process, grace: float) -> int:
+    """
+    Stop a runner and all the processes of its group.
+
+    Sends SIGTERM to the group, then SIGKILL to what is left of it after
+    ``grace`` seconds. Returns how many processes besides the runner itself
+    were in the group.
+    """
+    pgid = process.pid
+    if not hasattr(os, "killpg"):
+        # no process groups, only the runner can be stopped
+        if process.poll() is None:
+            os.kill(pgid, signal.SIGTERM)
+        return 0
+    members = group_members(pgid)
+    orphans = len([pid for pid in members or [] if pid != pgid])
+    _signal_group(pgid, signal.SIGTERM)
+    deadline = time.monotonic() + grace
+    while time.monotonic() < deadline:
+        # reap the runner, lest it counts as a member
+        process.poll()
+        if not _group_exists(pgid):
+            break
+        time.sleep(0.05)
+    else:
+        _signal_group(pgid, signal.SIGKILL)
+    return orphans
+
+
+def reap_orphans(process: Process, grace: float) -> int:
+    """
+    Stop what a runner that exited left running in its group.
+
+    Returns how many processes were stopped.
+    """
+    if not hasattr(os, "killpg"):
+        return 0
+    members = group_members(process.pid)
+    if members is None:
+        if not _group_exists(process.pid):
+            return 0
+        # an unknown number of them
+        members = [-1]
+    if members:
+        _signal_group(process.pid, signal.SIGTERM)
+        deadline = time.monotonic() + grace
+        while _group_exists(process.pid):
+            if time.monotonic() >= deadline:
+                _signal_group(process.pid, signal.SIGKILL)
+                break
+            time.sleep(0.05)
+    return len(members)
+
+
+def kill_all(grace: float) -> None:
+    """Stop the process trees of all the runners, after an interruption."""
+    with _groups_lock:
+        groups = list(_groups)
+    if groups:
+        logger.info("Stopping %i running tests", len(groups))
+    for pgid in groups:
+        _signal_group(pgid, signal.SIGTERM)
+    deadline = time.monotonic() + grace
+    while groups and time.monotonic() < deadline:
+        groups = [pgid for pgid in groups if _group_exists(pgid)]
+        time.sleep(0.05)
+    for pgid in groups:
+        _signal_group(pgid, signal.SIGKILL)
+
+
+def _io_bytes(pid: int) -> int:
+    """Return how many bytes a process read and wrote, 0 when unknown."""
+    total = 0
+    try:
+        with open(f"/proc/{pid}/io") as io:
+            for line in io:
+                name, _, value = line.partition(":")
+                if name in ("rchar", "wchar"):
+                    total += int(value)
+    except (OSError, ValueError):
+        pass
+    return total
+
+
+def directory_size(path: str) -> tuple[int, int]:
+    """Return the number of files and their total size under ``path``."""
+    count = size = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                size += os.lstat(os.path.join(dirpath, filename)).st_size
+            except OSError:
+                continue
+            count += 1
+    return count, size
+
+
+class ProgressMonitor:
+    """Tell whether a runner makes progress, from its process group and outputs."""
+
+    def __init__(self, pgid: int, outdir: str | None) -> None:
+        """Watch the process group ``pgid``, and the files under ``outdir``."""
+        self.pgid = pgid
+        self.outdir = outdir
+        self._last: tuple[object, ...] | None = None
+
+    def _sample(self) -> tuple[object, ...] | None:
+        members = group_members(self.pgid)
+        if members is None:
+            return None
+        cpu = io = 0
+        for pid in members:
+            fields = _read_stat(pid)
+            if fields is not None:
+                # utime, stime, cutime and cstime, in clock ticks
+                cpu += sum(int(field) for field in fields[11:15])
+            io += _io_bytes(pid)
+        outputs = directory_size(self.outdir) if self.outdir else (0, 0)
+        return frozenset(members), cpu, io, outputs
+
+    def progressed(self) -> bool:
+        """
+        Tell whether anything changed since the last call.
+
+        The runner made progress when a process of its group started or
+        exited, used CPU time or did I/O, or when a file was written in the
+        output directory. Without ``/proc``, progress cannot be told apart,
+        and is assumed.
+        """
+        sample = self._sample()
+        if sample is None:
+            return True
+        progressed = sample != self._last
+        self._last = sample
+        return progressed
+
+
+def snapshot(pgid: int) -> str:
+    """Describe the state of the processes of a group, one per line."""
+    members = group_members(pgid)
+    if members is None:
+        return "(no process information available)"
+    ticks = os.sysconf("SC_CLK_TCK")
+    lines = []
+    for pid in sorted(members):
+        fields = _read_stat(pid)
+        if fields is None:
+            continue
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as cmdline:
+                command = cmdline.read().replace(b"\0", b" ").decode(errors="replace")
+        except OSError:
+            command = ""
+        lines.append(
+            "pid {} ppid {} state {} cpu {:.2f}s: {}".format(
+                pid,
+                fields[1],
+                fields[0],
+                (int(fields[11]) + int(fields[12])) / ticks,
+                command.strip(),
+            )
+        )
+    return "\n".join(lines)
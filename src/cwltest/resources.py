@@ -0,0 +1,188 @@
+"""
+Share the CPUs and memory of the host between the tests that run at once.
+
+With ``--pin-cpus``, each test gets a set of CPUs of its own, disjoint from
+the sets of the other running tests, and its runner is started with that CPU
+affinity. A test gets as many CPUs as the ``coresMin`` of the
+``ResourceRequirement`` of its tool, when it declares one, otherwise an equal
+share of the CPUs between the ``-j`` slots.
+
+Each runner is also told its budget of cores and memory, so that it does not
+start as many jobs as if it had the host to itself: in its environment, and
+in the ``${CWLTEST_CORES}`` and ``${CWLTEST_RAM}`` placeholders of its
+arguments. The budget is a share of the host between the tests that the
+executor runs at once, and there is no memory budget when the memory of the
+host is unknown.
+"""
+
+import functools
+import math
+import os
+import re
+import threading
+from collections.abc import Iterable
+from typing import Any
+
+from ruamel.yaml import YAML
+from schema_salad.ref_resolver import uri_file_path
+
+from cwltest import logger
+
+
+def _numeric_fields(requirement: dict[str, Any], found: dict[str, float]) -> None:
+    for key, value in requirement.items():
+        # expressions can only be evaluated by the runner
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            found[key] = max(found.get(key, 0), value)
+
+
+def _numeric_requirements(document: Any, found: dict[str, float]) -> None:
+    """Collect the largest numeric fields of the ResourceRequirements."""
+    if isinstance(document, dict):
+        if document.get("class") == "ResourceRequirement":
+            _numeric_fields(document, found)
+        for key, value in document.items():
+            # requirements and hints can be maps from the class to the fields
+            if key == "ResourceRequirement" and isinstance(value, dict):
+                _numeric_fields(value, found)
+            _numeric_requirements(value, found)
+    elif isinstance(document, list):
+        for entry in document:
+            _numeric_requirements(entry, found)
+
+
+@functools.lru_cache(maxsize=None)
+def _declared_resources(path: str, mtime: float) -> dict[str, float]:
+    try:
+        with open(path, encoding="utf-8") as handle:
+            document = YAML(typ="safe", pure=True).load(handle)
+    except Exception as err:
+        logger.debug("Cannot read the requirements of %s: %s", path, err)
+        return {}
+    found: dict[str, float] = {}
+    _numeric_requirements(document, found)
+    return found
+
+
+def declared_resources(tool: str) -> dict[str, float]:
+    """
+    Return the numeric fields of the ResourceRequirements of a tool.
+
+    ``tool`` is the URI of a local CWL document. The requirements and hints
+    of the document and of the processes it embeds are all considered, the
+    largest value of each field being kept.
+    """
+    if not tool.startswith("file://"):
+        return {}
+    path = uri_file_path(tool.split("#")[0])
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return {}
+    return dict(_declared_resources(path, mtime))
+
+
+def available_cpus() -> list[int]:
+    """Return the CPUs this process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+class CpuAllocator:
+    """Hand out disjoint sets of CPUs to the tests running at the same time."""
+
+    def __init__(self, cpus: Iterable[int], slots: int) -> None:
+        """Share ``cpus`` between ``slots`` tests running at the same time."""
+        self.cpus = sorted(cpus)
+        self.share = max(1, len(self.cpus) // max(1, slots))
+        self._free = set(self.cpus)
+        self._condition = threading.Condition()
+
+    def size(self, cores: float | None) -> int:
+        """Return how many CPUs a test that declares ``cores`` gets."""
+        wanted = math.ceil(cores) if cores else self.share
+        return max(1, min(len(self.cpus), wanted))
+
+    def acquire(self, cores: float | None) -> list[int]:
+        """Wait for enough CPUs to be free for a test, and take them."""
+        count = self.size(cores)
+        with self._condition:
+            self._condition.wait_for(lambda: len(self._free) >= count)
+            cpus = sorted(self._free)[:count]
+            self._free.difference_update(cpus)
+        return cpus
+
+    def release(self, cpus: Iterable[int]) -> None:
+        """Give back the CPUs of a test that completed."""
+        with self._condition:
+            self._free.update(cpus)
+            self._condition.notify_all()
+
+
+def total_memory() -> int:
+    """Return the physical memory of the host, in MiB."""
+    try:
+        return (os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")) >> 20
+    except (AttributeError, OSError, ValueError):
+        return 0
+
+
+def budget(slots: int, memory: int | None) -> tuple[int, int | None]:
+    """
+    Return the cores and MiB of memory of a test, when ``slots`` run at once.
+
+    That is an equal share of the host, or ``memory`` MiB when the memory of
+    the tests is limited. The memory is None when it is not limited and the
+    memory of the host is unknown.
+    """
+    slots = max(1, slots)
+    cores = max(1, len(available_cpus()) // slots)
+    if memory:
+        return cores, memory
+    host = total_memory()
+    return cores, max(1, host // slots) if host else None
+
+
+_PLACEHOLDER = re.compile(r"\$\{(CWLTEST_[A-Z_]+)\}")
+
+
+def budget_variables(cores: int, ram: int | None) -> dict[str, str]:
+    """
+    Return the variables that tell a runner its budget of cores and memory.
+
+    CWLTEST_RAM is left out without a memory budget.
+    """
+    variables = {"CWLTEST_CORES": str(cores)}
+    if ram:
+        variables["CWLTEST_RAM"] = str(ram)
+    return variables
+
+
+def expand_placeholders(arguments: list[str], variables: dict[str, str]) -> list[str]:
+    """Replace the ``${NAME}`` placeholders of ``variables`` in the arguments."""
+    return [
+        _PLACEHOLDER.sub(lambda match: variables.get(match[1], match[0]), argument)
+        for argument in arguments
+    ]
+
+
+def budget_environment(cores: int, ram: int | None) -> dict[str, str]:
+    """
+    Return the environment variables that tell a runner its budget.
+
+    Besides the CWLTEST variables, the number of threads of OpenMP is set,
+    unless it is already.
+    """
+    environment = budget_variables(cores, ram)
+    if "OMP_NUM_THREADS" not in os.environ:
+        environment["OMP_NUM_THREADS"] = str(cores)
+    return environment
+
+
+def cpu_environment(cpus: list[int]) -> dict[str, str]:
+    """Return the environment variables that tell a runner its CPUs."""
+    return {
+        "CWLTEST_CPUS": ",".join(str(cpu) for cpu in cpus),
+        "CWLTEST_NUM_CPUS": str(len(cpus)),
+    }
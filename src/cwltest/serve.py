@@ -0,0 +1,345 @@
+"""
+Run tests on requests to a local HTTP API, from a resident process.
+
+``cwltest serve`` keeps what is costly to set up in memory between runs: the
+compiled cwltest schema, the loaded test files and tool classes (see
+:py:class:`cwltest.utils.SuiteCache`) and a pool of threads to run the tests
+on. It answers:
+
+- ``POST /runs`` with ``{"argv": [...]}``, the cwltest command line options
+  of a run, by streaming JSON lines: ``{"suite": ..., "number": ...,
+  "id": ..., "result": ...}`` for each test as soon as it completes, then
+  ``{"exit_code": ...}``;
+- ``GET /status`` with the number of threads, runs in progress and queued
+  tests.
+
+There is no authentication, and the clients are trusted: a run executes the
+tools of the test files it names, with its runner arguments, as the user of
+the server. So that web pages cannot request runs, run requests must have
+the ``application/json`` content type, which a web page cannot send to
+another site without its consent, and a ``Host`` header naming the server,
+which a page that reached it by DNS rebinding does not have. The runner must
+be one of the ones the server allows. The options that load Python code in
+the server, or that write files on it, are refused: the results are only in
+the response.
+
+Runs in progress share the pool: each free thread takes the next test of the
+next run in turn, so that a short run is not stuck behind a long one. With
+``--pin-cpus``, they also share the CPUs of the pool.
+"""
+
+import argparse
+import concurrent.futures
+import ipaddress
+import json
+import threading
+from collections import deque
+from collections.abc import Callable, Iterable
+from concurrent.futures import Executor, Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, NamedTuple, ParamSpec, TypeVar
+
+from cwltest import logger, resources, utils
+from cwltest.argparser import arg_parser, serve_arg_parser
+from cwltest.main import run
+from cwltest.utils import TestResult, load_optional_fsaccess_plugin
+
+_P = ParamSpec("_P")
+_T = TypeVar("_T")
+
+
+class _WorkItem(NamedTuple):
+    future: Future[Any]
+    fn: Callable[..., Any]
+    args: tuple[Any, ...]
+    kwargs: dict[str, Any]
+
+
+class RunQueue(Executor):
+    """The tests of one run, waiting for a thread of a :py:class:`FairPool`."""
+
+    def __init__(self, pool: "FairPool") -> None:
+        """Queue tests on the threads of ``pool``."""
+        self._pool = pool
+        self._pending: deque[_WorkItem] = deque()
+        self._futures: list[Future[Any]] = []
+        self._shutdown = False
+
+    @property
+    def workers(self) -> int:
+        """Return the number of threads of the pool, shared with the other runs."""
+        return self._pool.workers
+
+    @property
+    def cpu_allocator(self) -> resources.CpuAllocator:
+        """Return the CPUs of the pool, shared with the other runs."""
+        return self._pool.cpu_allocator
+
+    def submit(
+        self, fn: Callable[_P, _T], /, *args: _P.args, **kwargs: _P.kwargs
+    ) -> Future[_T]:
+        """Queue a call, that runs when this queue gets its turn."""
+        future: Future[_T] = Future()
+        with self._pool._condition:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            self._pending.append(_WorkItem(future, fn, args, kwargs))
+            self._futures.append(future)
+            self._pool._condition.notify()
+        return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        """Stop taking tests, and leave the pool once the queued ones are done."""
+        with self._pool._condition:
+            self._shutdown = True
+            if cancel_futures:
+                for item in self._pending:
+                    item.future.cancel()
+                self._pending.clear()
+        if wait:
+            concurrent.futures.wait(self._futures)
+        self._pool._remove(self)
+
+
+class FairPool:
+    """Threads that run the tests of several runs, taking from each in turn."""
+
+    def __init__(self, workers: int) -> None:
+        """Start ``workers`` threads."""
+        self.workers = workers
+        self.cpu_allocator = resources.CpuAllocator(resources.available_cpus(), workers)
+        self._condition = threading.Condition()
+        self._queues: deque[RunQueue] = deque()
+        for _ in range(workers):
+            threading.Thread(target=self._work, daemon=True).start()
+
+    def queue(self) -> RunQueue:
+        """Return a new executor for the tests of a run."""
+        queue = RunQueue(self)
+        with self._condition:
+            self._queues.append(queue)
+        return queue
+
+    def status(self) -> dict[str, int]:
+        """Return the number of threads, runs in progress and queued tests."""
+        with self._condition:
+            return {
+                "workers": self.workers,
+                "runs": len(self._queues),
+                "queued": sum(len(queue._pending) for queue in self._queues),
+            }
+
+    def _remove(self, queue: RunQueue) -> None:
+        with self._condition:
+            if queue in self._queues:
+                self._queues.remove(queue)
+
+    def _next(self) -> _WorkItem:
+        """Wait for a test, from the next run that has one."""
+        with self._condition:
+            while True:
+                for _ in range(len(self._queues)):
+                    queue = self._queues[0]
+                    self._queues.rotate(-1)
+                    if queue._pending:
+                        return queue._pending.popleft()
+                self._condition.wait()
+
+    def _work(self) -> None:
+        while True:
+            item = self._next()
+            if not item.future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = item.fn(*item.args, **item.kwargs)
+            except Exception as err:
+                item.future.set_exception(err)
+            else:
+                item.future.set_result(result)
+
+
+# the options that run programs besides the runner, load code in the server,
+# or write files on it
+_REFUSED_OPTIONS = {
+    "executor": "--executor",
+    "batch_executor": "--batch-executor",
+    "session_hooks": "--session-hooks",
+    "warm_runner": "--warm-runner",
+    "zygote": "--zygote",
+    "matrix": "--matrix",
+    "container_cli": "--container-cli",
+    "junit_xml": "--junit-xml",
+    "badgedir": "--badgedir",
+    "history": "--history",
+    "journal": "--journal",
+    "resume": "--resume",
+    "log_dir": "--log-dir",
+    "cgroup": "--cgroup",
+}
+
+
+def _parse_run(request: Any, tools: set[str]) -> argparse.Namespace:
+    """
+    Parse the options of a run request, ValueError when invalid.
+
+    The runner of the run must be one of ``tools``.
+    """
+    if not isinstance(request, dict) or not isinstance(request.get("argv"), list):
+        raise ValueError('expected {"argv": [...]}')
+    if not all(isinstance(arg, str) for arg in request["argv"]):
+        raise ValueError("argv must be a list of strings")
+    parser = arg_parser()
+    parser.exit_on_error = False
+    try:
+        args, extra = parser.parse_known_args(request["argv"])
+    except argparse.ArgumentError as err:
+        raise ValueError(str(err)) from err
+    except SystemExit as err:
+        raise ValueError("--help and --version are not supported") from err
+    if extra:
+        raise ValueError("unrecognized arguments: %s" % " ".join(extra))
+    if not args.test:
+        raise ValueError("--test is required")
+    for dest, option in _REFUSED_OPTIONS.items():
+        if getattr(args, dest) != parser.get_default(dest):
+            raise ValueError(f"{option} is not supported by cwltest serve")
+    if args.tool not in tools:
+        raise ValueError(
+            f"--tool {args.tool} is not allowed, see the --allow-tool option "
+            "of cwltest serve"
+        )
+    for option, value in (
+        ("--watch", args.watch),
+        ("-l", args.l),
+        ("--show-tags", args.show_tags),
+    ):
+        if value:
+            raise ValueError(f"{option} is not supported by cwltest serve")
+    return args
+
+
+class Server(ThreadingHTTPServer):
+    """HTTP server running tests on a shared :py:class:`FairPool`."""
+
+    daemon_threads = True
+
+    def __init__(
+        self, host: str, port: int, workers: int, tools: Iterable[str] = ()
+    ) -> None:
+        """
+        Listen on ``host`` and ``port``, running tests on ``workers`` threads.
+
+        Runs may use the ``cwl-runner`` runner, and the ones of ``tools``.
+        """
+        super().__init__((host, port), _Handler)
+        self.pool = FairPool(workers)
+        self.suites = utils.SuiteCache()
+        self.tools = {"cwl-runner", *tools}
+
+    def host_names(self) -> set[str]:
+        """Return the values of the Host header of the requests to this server."""
+        host, port = self.server_address[:2]
+        address = ipaddress.ip_address(str(host))
+        names = {f"[{address}]" if address.version == 6 else str(address)}
+        if address.is_loopback:
+            names.add("localhost")
+        with_port = {f"{name}:{port}" for name in names}
+        # clients leave the default port out
+        return with_port | names if port == 80 else with_port
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: Server
+
+    def _send_json(self, code: int, message: dict[str, Any]) -> None:
+        body = json.dumps(message).encode("utf-8") + b"\n"
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        if self.path != "/status":
+            self._send_json(404, {"error": "not found"})
+            return
+        self._send_json(200, self.server.pool.status())
+
+    def do_POST(self) -> None:
+        if self.path != "/runs":
+            self._send_json(404, {"error": "not found"})
+            return
+        if self.headers.get("Host") not in self.server.host_names():
+            self._send_json(403, {"error": "unexpected Host header"})
+            return
+        content_type = self.headers.get("Content-Type", "")
+        if content_type.split(";")[0].strip().lower() != "application/json":
+            self._send_json(415, {"error": "expected application/json"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            args = _parse_run(json.loads(self.rfile.read(length)), self.server.tools)
+        except ValueError as err:
+            self._send_json(400, {"error": str(err)})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        lock = threading.Lock()
+        connected = True
+
+        def stream(message: dict[str, Any]) -> None:
+            nonlocal connected
+            with lock:
+                if not connected:
+                    return
+                try:
+                    self.wfile.write(json.dumps(message).encode("utf-8") + b"\n")
+                    self.wfile.flush()
+                except OSError:
+                    logger.warning(
+                        "Client of the run of %s disconnected", ", ".join(args.test)
+                    )
+                    connected = False
+
+        def on_result(
+            suite_name: str, number: int, test: dict[str, Any], result: TestResult
+        ) -> None:
+            stream(
+                {
+                    "suite": suite_name,
+                    "number": number,
+                    "id": utils.get_test_id(test),
+                    "result": result.to_dict(),
+                }
+            )
+
+        try:
+            exit_code = run(
+                args, self.server.pool.queue(), on_result, self.server.suites
+            )
+        except Exception as err:
+            logger.exception("Run of %s failed", ", ".join(args.test))
+            stream({"error": str(err)})
+            exit_code = 1
+        stream({"exit_code": exit_code})
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug(format, *args)
+
+
+def main(argv: list[str]) -> int:
+    """Run the serve subcommand."""
+    args: argparse.Namespace = serve_arg_parser().parse_args(argv)
+    load_optional_fsaccess_plugin()
+    server = Server(args.host, args.port, args.j, args.allow_tool)
+    host, port = server.server_address[:2]
+    logger.info("Listening on http://%s:%i", host, port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
@@ -1,3 +1,8 @@
+import copy
+import functools
+import hashlib
+import importlib
+import inspect
 import json
 import os
 import re
@@ -6,15 +11,25 @@ import shutil
 import subprocess  # nosec
 import sys
 import tempfile
+import threading
 import time
+import traceback
 from collections import Counter, defaultdict
-from collections.abc import Iterable, MutableMapping, MutableSequence
+from collections.abc import (
+    Callable,
+    Iterable,
+    Iterator,
+    MutableMapping,
+    MutableSequence,
+)
 from importlib.metadata import EntryPoint, entry_points
 from importlib.resources import files
-from typing import Any, cast
+from typing import Any, NamedTuple, TypeVar, cast
 from urllib.parse import urljoin
 
 import junit_xml
+import ruamel.yaml
+import ruamel.yaml.error
 import ruamel.yaml.scanner
 import schema_salad.avro
 import schema_salad.ref_resolver
@@ -24,10 +39,19 @@ from ruamel.yaml.scalarstring import ScalarString
 from schema_salad.exceptions import ValidationException
 
 import cwltest.compare
+import cwltest.limits
+import cwltest.logs
+import cwltest.processes
+import cwltest.resources
 import cwltest.stdfsaccess
+import cwltest.warm
+import cwltest.zygote
 from cwltest import REQUIRED, UNSUPPORTED_FEATURE, logger, templock
 from cwltest.compare import CompareFail, compare
 
+_F = TypeVar("_F", bound=Callable[..., Any])
+_T = TypeVar("_T")
+
 
 class CWLTestConfig:
     """Store configuration values for cwltest."""
@@ -47,6 +71,20 @@ class CWLTestConfig:
         timeout: int | None = None,
         verbose: bool | None = None,
         runner_quiet: bool | None = None,
+        warm_runner: list[str] | None = None,
+        zygote: str | None = None,
+        kill_grace: float | None = None,
+        hang_timeout: float | None = None,
+        memory_limit: int | None = None,
+        cpu_limit: float | None = None,
+        cpu_time_limit: int | None = None,
+        disk_limit: int | None = None,
+        cgroup: str | None = None,
+        cpus: list[int] | None = None,
+        cores: int | None = None,
+        ram: int | None = None,
+        output_limit: int | None = None,
+        log_dir: str | None = None,
     ) -> None:
         """Initialize test configuration."""
         self.basedir: str = basedir or os.getcwd()
@@ -63,6 +101,22 @@ class CWLTestConfig:
         self.timeout: int | None = timeout
         self.verbose: bool = verbose or False
         self.runner_quiet: bool = runner_quiet or True
+        self.warm_runner: list[str] | None = warm_runner
+        self.zygote: str | None = zygote
+        self.kill_grace: float = 3.0 if kill_grace is None else kill_grace
+        self.hang_timeout: float | None = hang_timeout
+        self.memory_limit: int | None = memory_limit
+        self.cpu_limit: float | None = cpu_limit
+        self.cpu_time_limit: int | None = cpu_time_limit
+        self.disk_limit: int | None = disk_limit
+        self.cgroup: str | None = cgroup
+        self.cpus: list[int] | None = cpus
+        # the budget of the runner, in cores and MiB of memory
+        self.cores: int | None = cores
+        self.ram: int | None = ram
+        # bytes of the output and error of a runner kept for the results
+        self.output_limit: int = 256 << 10 if output_limit is None else output_limit
+        self.log_dir: str | None = log_dir
 
 
 class CWLTestReport:
@@ -84,6 +138,36 @@ class CWLTestReport:
         self.job = job
 
 
+class JUnitTestCase(junit_xml.TestCase):
+    """A jUnit XML test case, with properties."""
+
+    def __init__(self, name: str, **kwargs: Any) -> None:
+        """Initialize a test case, without properties."""
+        super().__init__(name, **kwargs)
+        self.properties: dict[str, str] = {}
+
+
+class JUnitTestSuite(junit_xml.TestSuite):
+    """A jUnit XML test suite, that reports the properties of its test cases."""
+
+    def build_xml_doc(self, encoding: str | None = None) -> Any:
+        """Build the XML element of the test suite."""
+        element = super().build_xml_doc(encoding)
+        for case_element, case in zip(
+            element.iter("testcase"), self.test_cases, strict=True
+        ):
+            if properties := getattr(case, "properties", None):
+                properties_element = case_element.makeelement("properties", {})
+                for name, value in properties.items():
+                    properties_element.append(
+                        case_element.makeelement(
+                            "property", {"name": name, "value": value}
+                        )
+                    )
+                case_element.insert(0, properties_element)
+        return element
+
+
 class TestResult:
     """Encapsulate relevant test result data."""
 
@@ -98,8 +182,15 @@ class TestResult:
         tool: str,
         job: str | None,
         message: str = "",
+        orphans: int = 0,
+        attempts: int = 1,
     ) -> None:
-        """Initialize a TestResult object."""
+        """
+        Initialize a TestResult object.
+
+        ``orphans`` is how many processes the runner left running, that were
+        stopped. ``attempts`` is how many times the test ran, with --reruns.
+        """
         self.return_code = return_code
         self.standard_output = standard_output
         self.error_output = error_output
@@ -109,16 +200,49 @@ class TestResult:
         self.entry = entry
         self.tool = tool
         self.job = job
+        self.orphans = orphans
+        self.attempts = attempts
+
+    @property
+    def flaky(self) -> bool:
+        """Tell whether the test passed, but only when run again."""
+        return self.return_code == 0 and self.attempts > 1
+
+    def to_dict(self) -> dict[str, Any]:
+        """Convert this test result to plain JSON serializable objects."""
+        return {
+            "return_code": self.return_code,
+            "standard_output": self.standard_output,
+            "error_output": self.error_output,
+            "duration": self.duration,
+            "classname": self.classname,
+            "entry": self.entry,
+            "tool": self.tool,
+            "job": self.job,
+            "message": self.message,
+            "orphans": self.orphans,
+            "attempts": self.attempts,
+        }
 
-    def create_test_case(self, test: dict[str, Any]) -> junit_xml.TestCase:
-        """Create a jUnit XML test case from this test result."""
+    @classmethod
+    def from_dict(cls, obj: dict[str, Any]) -> "TestResult":
+        """Recreate a test result from the output of :py:meth:`to_dict`."""
+        return cls(**obj)
+
+    def create_test_case(self, test: dict[str, Any]) -> "JUnitTestCase":
+        """
+        Create a jUnit XML test case from this test result.
+
+        A test that ran more than once has an ``attempts`` property, and a
+        ``flaky`` one when it passed on a rerun.
+        """
         doc = test.get("doc", "N/A").strip()
         if test.get("tags"):
             category = ", ".join(test["tags"])
         else:
             category = REQUIRED
         short_name = test.get("short_name")
-        case = junit_xml.TestCase(
+        case = JUnitTestCase(
             doc,
             elapsed_sec=self.duration,
             file=short_name,
@@ -128,6 +252,10 @@ class TestResult:
         )
         if self.return_code > 0:
             case.failure_message = self.message
+        if self.attempts > 1:
+            case.properties["attempts"] = str(self.attempts)
+        if self.flaky:
+            case.properties["flaky"] = "true"
         return case
 
     def create_report_entry(self, test: dict[str, Any]) -> CWLTestReport:
@@ -238,6 +366,17 @@ def generate_badges(
                 print(f"- {base} ({args})", file=out)
 
 
+def get_test_id(test: dict[str, Any]) -> str:
+    """Return an identifier for a test entry that is stable across runs."""
+    if test.get("short_name"):
+        return str(test["short_name"])
+    if test.get("label"):
+        return str(test["label"])
+    if test.get("id") is not None:
+        return shortname(str(test["id"]))
+    return "L{}".format(test.get("line", "?"))
+
+
 def get_test_number_by_key(
     tests: list[dict[str, str]], key: str, value: str
 ) -> int | None:
@@ -248,12 +387,11 @@ def get_test_number_by_key(
     return None
 
 
-def load_and_validate_tests(path: str) -> tuple[Any, dict[str, Any]]:
-    """
-    Load and validate the given test file against the cwltest schema.
-
-    This also processes $import directives.
-    """
+@functools.cache
+def _load_cwltest_schema() -> (
+    tuple[schema_salad.ref_resolver.Loader, schema_salad.avro.schema.Names]
+):
+    """Load and compile the cwltest schema, once per process."""
     schema_resource = files("cwltest").joinpath("cwltest-schema.yml")
     with schema_resource.open("r", encoding="utf-8") as fp:
         cache: dict[str, str | Graph | bool] | None = {
@@ -271,20 +409,102 @@ def load_and_validate_tests(path: str) -> tuple[Any, dict[str, Any]]:
     if not isinstance(avsc_names, schema_salad.avro.schema.Names):
         print(avsc_names)
         raise ValidationException(f"Wrong instance for avsc_names: {type(avsc_names)}")
+    return document_loader, avsc_names
+
+
+def _load_tests_and_files(path: str) -> tuple[Any, dict[str, Any], list[str]]:
+    """Load and validate a test file, also returning the files it was read from."""
+    schema_loader, avsc_names = _load_cwltest_schema()
+    # A fresh loader for each call, so that a modified test file is re-read
+    document_loader = schema_salad.ref_resolver.Loader(schema_loader.ctx)
 
     tests, metadata = schema_salad.schema.load_and_validate(
         document_loader, avsc_names, path, True
     )
     tests = cast(list[dict[str, Any]], _clean_ruamel_list(tests))
+    files = [
+        schema_salad.ref_resolver.uri_file_path(uri)
+        for uri in document_loader.idx
+        if uri.startswith("file://") and "#" not in uri
+    ]
+    return tests, metadata, files
 
+
+def load_and_validate_tests(path: str) -> tuple[Any, dict[str, Any]]:
+    """
+    Load and validate the given test file against the cwltest schema.
+
+    This also processes $import directives.
+    """
+    tests, metadata, _ = _load_tests_and_files(path)
     return tests, metadata
 
 
+def _signature(path: str) -> tuple[int, int] | None:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class SuiteCache:
+    """
+    Keep loaded test files and tool classes in memory between runs.
+
+    An entry is loaded again when one of the files it was read from, including
+    the ones pulled in with $import, changes. Callers get copies, that they may
+    modify.
+    """
+
+    def __init__(self) -> None:
+        """Start with an empty cache."""
+        self._lock = threading.Lock()
+        self._suites: dict[
+            str, tuple[dict[str, tuple[int, int] | None], Any, dict[str, Any]]
+        ] = {}
+        self._tool_classes: dict[str, tuple[tuple[int, int] | None, Any]] = {}
+
+    def load(self, path: str) -> tuple[Any, dict[str, Any]]:
+        """Like :py:func:`load_and_validate_tests`, from the cache if still valid."""
+        key = os.path.abspath(path)
+        with self._lock:
+            cached = self._suites.get(key)
+        if cached is None or any(
+            _signature(file) != signature for file, signature in cached[0].items()
+        ):
+            tests, metadata, files = _load_tests_and_files(path)
+            cached = ({file: _signature(file) for file in files}, tests, metadata)
+            with self._lock:
+                self._suites[key] = cached
+        return copy.deepcopy(cached[1]), copy.deepcopy(cached[2])
+
+    def tool_class(self, tool: str) -> Any:
+        """Return the class of the CWL document at the ``tool`` URI."""
+        signature = (
+            _signature(schema_salad.ref_resolver.uri_file_path(tool))
+            if tool.startswith("file://")
+            else None
+        )
+        with self._lock:
+            cached = self._tool_classes.get(tool)
+        if cached is None or cached[0] != signature:
+            loader = schema_salad.ref_resolver.Loader({"id": "@id"})
+            cwl = loader.resolve_ref(tool)[0]
+            if not isinstance(cwl, dict):
+                raise Exception("Unexpected code path.")
+            cached = (signature, cwl["class"])
+            with self._lock:
+                self._tool_classes[tool] = cached
+        return cached[1]
+
+
 def parse_results(
     results: Iterable[TestResult],
     tests: list[dict[str, Any]],
     suite_name: str | None = None,
     report: junit_xml.TestSuite | None = None,
+    test_numbers: list[int] | None = None,
 ) -> tuple[
     int,  # total
     int,  # passed
@@ -304,6 +524,9 @@ def parse_results(
 
     Returns the total number of tests, dictionary of test counts
     (total, passed, failed, unsupported) by tag, and a jUnit XML report.
+
+    If given, ``test_numbers`` holds the (1-based) position of each test in
+    its test file; it is used for the test case URLs in the report.
     """
     total = 0
     passed = 0
@@ -317,10 +540,11 @@ def parse_results(
     for i, test_result in enumerate(results):
         test_case = test_result.create_test_case(tests[i])
         test_report = test_result.create_report_entry(tests[i])
+        number = test_numbers[i] if test_numbers is not None else i + 1
         test_case.url = (
-            f"cwltest:{suite_name}#{i + 1}"
+            f"cwltest:{suite_name}#{number}"
             if suite_name is not None
-            else "cwltest:#{i + 1}"
+            else "cwltest:#{number}"
         )
         total += 1
         tags = tests[i].get("tags", []) + ["all"]
@@ -363,30 +587,38 @@ def parse_results(
     )
 
 
-def prepare_test_command(
-    tool: str,
+def prepare_test_request(
     args: list[str],
     testargs: list[str] | None,
     test: dict[str, Any],
     cwd: str,
-    quiet: bool | None = True,
-) -> list[str]:
-    """Turn the test into a command line."""
-    test_command = [tool]
-    test_command.extend(args)
+    tool: str = "",
+    variables: dict[str, str] | None = None,
+) -> dict[str, Any]:
+    """
+    Turn the test into the parts of a command line.
+
+    Returns the arguments, output directory, tool and job file to run the
+    test with, as sent to warm runners (see :py:mod:`cwltest.warm`). The
+    ``${NAME}`` placeholders of ``variables`` in the arguments are replaced,
+    see :py:func:`cwltest.resources.budget_variables`.
+    """
+    test_args = list(args)
 
     # Add additional arguments given in test case
     if testargs is not None:
         for testarg in testargs:
             test_case_name, prefix = testarg.split("==")
             if test_case_name in test:
-                test_command.extend([prefix, test[test_case_name]])
+                test_args.extend([prefix, test[test_case_name]])
+    if variables:
+        test_args = cwltest.resources.expand_placeholders(test_args, variables)
 
     # Add prefixes if running on MacOSX so that boot2docker writes to /Users
     with templock:
         if "darwin" in sys.platform and tool.endswith("cwltool"):
             outdir = tempfile.mkdtemp(prefix=os.path.abspath(os.path.curdir))
-            test_command.extend(
+            test_args.extend(
                 [
                     f"--tmp-outdir-prefix={outdir}",
                     f"--tmpdir-prefix={outdir}",
@@ -394,16 +626,46 @@ def prepare_test_command(
             )
         else:
             outdir = tempfile.mkdtemp()
-    test_command.extend([f"--outdir={outdir}"])
-    if quiet:
-        test_command.extend(["--quiet"])
     processfile, jobfile = prepare_test_paths(test, cwd)
-    test_command.extend([os.path.normcase(processfile)])
-    if jobfile:
-        test_command.append(os.path.normcase(jobfile))
+    return {
+        "processfile": os.path.normcase(processfile),
+        "jobfile": os.path.normcase(jobfile) if jobfile else None,
+        "outdir": outdir,
+        "args": test_args,
+    }
+
+
+def _test_command(
+    tool: str, request: dict[str, Any], quiet: bool | None = True
+) -> list[str]:
+    """Assemble the command line of a test prepared by prepare_test_request."""
+    test_command: list[str] = [tool] + request["args"]
+    test_command.append(f"--outdir={request['outdir']}")
+    if quiet:
+        test_command.append("--quiet")
+    test_command.append(request["processfile"])
+    if request["jobfile"]:
+        test_command.append(request["jobfile"])
     return test_command
 
 
+def prepare_test_command(
+    tool: str,
+    args: list[str],
+    testargs: list[str] | None,
+    test: dict[str, Any],
+    cwd: str,
+    quiet: bool | None = True,
+    variables: dict[str, str] | None = None,
+) -> list[str]:
+    """Turn the test into a command line."""
+    return _test_command(
+        tool,
+        prepare_test_request(args, testargs, test, cwd, tool, variables),
+        quiet,
+    )
+
+
 def prepare_test_paths(
     test: dict[str, str],
     cwd: str,
@@ -421,54 +683,241 @@ def prepare_test_paths(
     return processfile, jobfile
 
 
+def prepare_test_uris(
+    config: CWLTestConfig, test: dict[str, str]
+) -> tuple[str, str | None]:
+    """Determine the tool and job URIs to use in the reports."""
+    reltool = os.path.relpath(test["tool"], start=config.test_basedir)
+    tooluri = urljoin(config.test_baseuri, reltool)
+    if test.get("job", None):
+        reljob = os.path.relpath(test["job"], start=config.test_basedir)
+        joburi: str | None = urljoin(config.test_baseuri, reljob)
+    else:
+        joburi = None
+    return tooluri, joburi
+
+
+class _TestHung(Exception):
+    def __init__(self, timeout: float, snapshot: str) -> None:
+        super().__init__(timeout, snapshot)
+        self.timeout = timeout
+        self.snapshot = snapshot
+
+
+class _LimitExceeded(Exception):
+    pass
+
+
+def _check_disk(outdir: str, disk_limit: int) -> None:
+    """Raise _LimitExceeded when the files in ``outdir`` exceed ``disk_limit`` MiB."""
+    size = cwltest.processes.directory_size(outdir)[1]
+    if size > disk_limit << 20:
+        raise _LimitExceeded(
+            f"Test exceeded the disk limit of {disk_limit} MiB: "
+            f"{size / (1 << 20):.1f} MiB in its output directory"
+        )
+
+
+def _wait(
+    process: "subprocess.Popen[bytes] | cwltest.zygote.ZygoteProcess",
+    timeout: float | None,
+    hang_timeout: float | None,
+    outdir: str,
+    disk_limit: int | None = None,
+) -> None:
+    """
+    Wait for a runner like Popen.wait, also watching its progress.
+
+    Raises _TestHung, with a snapshot of the processes of the runner, when
+    it made no progress for ``hang_timeout`` seconds, and _LimitExceeded
+    when the files of its output directory exceed ``disk_limit`` MiB.
+    """
+    if not hang_timeout and not disk_limit:
+        process.wait(timeout=timeout)
+        return
+    start = time.monotonic()
+    deadline = None if timeout is None else start + timeout
+    # the runner leads its own process group
+    pgid = cast(int, process.pid)
+    monitor = None
+    interval = 1.0
+    if hang_timeout:
+        monitor = cwltest.processes.ProgressMonitor(pgid, outdir)
+        monitor.progressed()
+        interval = max(0.1, min(5.0 if not disk_limit else 1.0, hang_timeout / 5))
+    last_progress = start
+    while True:
+        wait = interval
+        if deadline is not None:
+            wait = min(wait, max(0.0, deadline - time.monotonic()))
+        try:
+            process.wait(timeout=wait)
+            return
+        except subprocess.TimeoutExpired:
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                raise subprocess.TimeoutExpired(
+                    process.args, cast(float, timeout)
+                ) from None
+            if disk_limit:
+                _check_disk(outdir, disk_limit)
+            if monitor is None or not hang_timeout:
+                continue
+            if monitor.progressed():
+                last_progress = now
+            elif now - last_progress >= hang_timeout:
+                raise _TestHung(
+                    hang_timeout, cwltest.processes.snapshot(pgid)
+                ) from None
+
+
 def run_test_plain(
     config: CWLTestConfig,
     test: dict[str, str],
     test_number: int | None = None,
 ) -> TestResult:
     """Plain test runner."""
+    orphans: list[int] = []
+    result = _run_test_plain(config, test, test_number, orphans)
+    result.orphans = sum(orphans)
+    if result.orphans:
+        logger.warning(
+            "Stopped %i processes left running by test %s",
+            result.orphans,
+            test_number or test.get("id", "?"),
+        )
+    return result
+
+
+def _run_test_plain(
+    config: CWLTestConfig,
+    test: dict[str, str],
+    test_number: int | None,
+    orphans: list[int],
+) -> TestResult:
     out: dict[str, Any] = {}
     outstr = outerr = ""
     test_command: list[str] = []
     duration = 0.0
     number = "?"
 
-    reltool = os.path.relpath(test["tool"], start=config.test_basedir)
-    tooluri = urljoin(config.test_baseuri, reltool)
-    if test.get("job", None):
-        reljob = os.path.relpath(test["job"], start=config.test_basedir)
-        joburi = urljoin(config.test_baseuri, reljob)
-    else:
-        joburi = None
+    tooluri, joburi = prepare_test_uris(config, test)
 
     if test_number is not None:
         number = str(test_number)
-    process: subprocess.Popen[str] | None = None
+    process: subprocess.Popen[bytes] | cwltest.zygote.ZygoteProcess | None = None
+    output: cwltest.logs.RunnerOutput | None = None
+    cgroup: cwltest.limits.TestCgroup | None = None
     try:
         cwd = os.getcwd()
-        test_command = prepare_test_command(
-            config.tool, config.args, config.testargs, test, cwd, config.runner_quiet
+        variables = (
+            cwltest.resources.budget_variables(config.cores, config.ram)
+            if config.cores
+            else None
+        )
+        request = prepare_test_request(
+            config.args, config.testargs, test, cwd, config.tool, variables
         )
+        test_command = _test_command(config.tool, request, config.runner_quiet)
         if config.verbose:
             sys.stderr.write(f"Running: {' '.join(test_command)}\n")
         sys.stderr.flush()
         start_time = time.time()
-        stderr = subprocess.PIPE if not config.verbose else None
-        process = subprocess.Popen(  # nosec
-            test_command,
-            stdout=subprocess.PIPE,
-            stderr=stderr,
-            universal_newlines=True,
-            cwd=cwd,
-        )
-        outstr, outerr = process.communicate(timeout=config.timeout)
-        return_code = process.poll()
+        return_code: int | None
+        if config.warm_runner:
+            if config.runner_quiet:
+                request["args"] = request["args"] + ["--quiet"]
+            return_code, outstr, outerr = cwltest.warm.run_request(
+                config.warm_runner, request, config.timeout
+            )
+        else:
+            # with a cgroup, it limits the memory of all the processes at once
+            limits = cwltest.limits.rlimits(
+                None if config.cgroup else config.memory_limit,
+                config.cpu_time_limit,
+                config.disk_limit,
+            )
+            if config.cgroup and (config.memory_limit or config.cpu_limit):
+                cgroup = cwltest.limits.TestCgroup(
+                    config.cgroup, config.memory_limit, config.cpu_limit
+                )
+            procs = cgroup.procs if cgroup else None
+            env = cwltest.resources.cpu_environment(config.cpus) if config.cpus else {}
+            if config.cores:
+                env.update(
+                    cwltest.resources.budget_environment(config.cores, config.ram)
+                )
+            output = cwltest.logs.RunnerOutput(
+                config.log_dir,
+                f"{number}-{get_test_id(test)}",
+                not config.verbose,
+                config.output_limit,
+            )
+            if config.zygote:
+                process = cwltest.zygote.spawn(
+                    config.zygote,
+                    test_command,
+                    cwd,
+                    output.stdout_pipe,
+                    output.stderr_pipe,
+                    limits,
+                    procs,
+                    config.cpus,
+                    env,
+                )
+            else:
+                process = subprocess.Popen(  # nosec
+                    (
+                        cwltest.limits.wrap(test_command, limits, procs, config.cpus)
+                        if limits or procs or config.cpus
+                        else test_command
+                    ),
+                    stdout=output.stdout_pipe,
+                    stderr=output.stderr_pipe,
+                    cwd=cwd,
+                    # its own process group, to stop its subprocesses with it
+                    start_new_session=True,
+                    env={**os.environ, **env} if env else None,
+                )
+            output.started()
+            cwltest.processes.register(cast(cwltest.processes.Process, process))
+            _wait(
+                process,
+                config.timeout,
+                config.hang_timeout,
+                request["outdir"],
+                config.disk_limit,
+            )
+            return_code = process.poll()
+            # the processes left in its group may hold its output open
+            orphans.append(
+                cwltest.processes.reap_orphans(
+                    cast(cwltest.processes.Process, process), config.kill_grace
+                )
+            )
+            outstr, outerr = output.excerpts()
+            if config.disk_limit:
+                _check_disk(request["outdir"], config.disk_limit)
+            if return_code and (
+                message := cwltest.limits.exceeded(
+                    return_code,
+                    outerr,
+                    cgroup,
+                    config.memory_limit,
+                    config.cpu_time_limit,
+                    config.disk_limit,
+                )
+            ):
+                raise _LimitExceeded(message)
         duration = time.time() - start_time
         if return_code:
             raise subprocess.CalledProcessError(return_code, " ".join(test_command))
 
         logger.debug('outstr: "%s".', outstr)
-        out = json.loads(outstr) if outstr else {}
+        if output is not None:
+            out = output.output_object()
+        else:
+            out = json.loads(outstr) if outstr else {}
     except subprocess.CalledProcessError as err:
         if err.returncode == UNSUPPORTED_FEATURE and REQUIRED not in test.get(
             "tags", ["required"]
@@ -557,6 +1006,62 @@ def run_test_plain(
             joburi,
             invalid_json_msg,
         )
+    except _TestHung as err:
+        logger.error(
+            """Test %s hung: %s""",
+            number,
+            shlex.join(test_command),
+        )
+        logger.error(test.get("doc", "").replace("\n", " ").strip())
+        if process:
+            orphans.append(
+                cwltest.processes.kill_tree(
+                    cast(cwltest.processes.Process, process), config.kill_grace
+                )
+            )
+            process.wait()
+        if output is not None:
+            outstr, outerr = output.excerpts()
+        return TestResult(
+            2,
+            outstr,
+            outerr,
+            time.time() - start_time,
+            config.classname,
+            config.entry,
+            tooluri,
+            joburi,
+            f"Test hung: no progress for {err.timeout:g} seconds, with the "
+            f"processes:\n{err.snapshot}",
+        )
+    except _LimitExceeded as err:
+        logger.error(
+            """Test %s failed: %s""",
+            number,
+            shlex.join(test_command),
+        )
+        logger.error(test.get("doc", "").replace("\n", " ").strip())
+        logger.error(str(err))
+        if process and process.returncode is None:
+            orphans.append(
+                cwltest.processes.kill_tree(
+                    cast(cwltest.processes.Process, process), config.kill_grace
+                )
+            )
+            process.wait()
+        if output is not None:
+            outstr, outerr = output.excerpts()
+        return TestResult(
+            1,
+            outstr,
+            outerr,
+            time.time() - start_time,
+            config.classname,
+            config.entry,
+            tooluri,
+            joburi,
+            str(err),
+        )
     except subprocess.TimeoutExpired:
         logger.error(
             """Test %s timed out: %s""",
@@ -564,11 +1069,16 @@ def run_test_plain(
             shlex.join(test_command),
         )
         logger.error(test.get("doc", "").replace("\n", " ").strip())
-        # Kill and re-communicate to get the logs and reap the child, as
-        # instructed in the subprocess docs.
+        # Kill and wait, to reap the child before reading its logs
         if process:
-            process.kill()
-            outstr, outerr = process.communicate()
+            orphans.append(
+                cwltest.processes.kill_tree(
+                    cast(cwltest.processes.Process, process), config.kill_grace
+                )
+            )
+            process.wait()
+        if output is not None:
+            outstr, outerr = output.excerpts()
         return TestResult(
             2,
             outstr,
@@ -583,13 +1093,17 @@ def run_test_plain(
     finally:
         if process is not None and process.returncode is None:
             logger.error("""Terminating lingering process""")
-            process.terminate()
-            for _ in range(0, 3):
-                time.sleep(1)
-                if process.poll() is not None:
-                    break
-            if process.returncode is None:
-                process.kill()
+            orphans.append(
+                cwltest.processes.kill_tree(
+                    cast(cwltest.processes.Process, process), config.kill_grace
+                )
+            )
+        if process is not None:
+            cwltest.processes.unregister(cast(cwltest.processes.Process, process))
+        if output is not None:
+            output.close()
+        if cgroup is not None:
+            cgroup.remove()
 
     fail_message = ""
 
@@ -640,6 +1154,395 @@ def run_test_plain(
     )
 
 
+def run_test_function(
+    execute: Callable[
+        [CWLTestConfig, str, str | None], tuple[int, dict[str, Any] | None] | None
+    ],
+    config: CWLTestConfig,
+    test: dict[str, str],
+) -> TestResult:
+    """
+    Run a test with a Python function instead of a command line runner.
+
+    ``execute`` has the signature of the ``pytest_cwl_execute_test`` hook
+    (see :py:mod:`cwltest.hooks`); when it returns None, the test is run with
+    :py:func:`run_test_plain` instead.
+    """
+    processfile, jobfile = prepare_test_paths(test, config.basedir)
+    start_time = time.time()
+    try:
+        executed = execute(config, processfile, jobfile)
+    except Exception as err:
+        return exception_test_result(
+            config, test, "The executor", err, time.time() - start_time
+        )
+    if executed is None:
+        return run_test_plain(config, test)
+    returncode, out = executed
+    return function_test_result(config, test, returncode, out, time.time() - start_time)
+
+
+def run_tests_batch(
+    execute_batch: Callable[
+        [list[tuple[CWLTestConfig, str, str | None]]],
+        Iterable[tuple[int, tuple[int, dict[str, Any] | None]]] | None,
+    ],
+    execute: (
+        Callable[
+            [CWLTestConfig, str, str | None],
+            tuple[int, dict[str, Any] | None] | None,
+        ]
+        | None
+    ),
+    tests: list[tuple[CWLTestConfig, dict[str, str]]],
+) -> Iterator[tuple[int, TestResult]]:
+    """
+    Run several tests at once with a Python function.
+
+    ``execute_batch`` has the signature of the
+    ``pytest_cwl_execute_tests_batch`` hook (see :py:mod:`cwltest.hooks`).
+    Yields the position of each test in ``tests`` with its result, as they
+    complete. When ``execute_batch`` returns None, the tests are run one by
+    one with :py:func:`run_test_function` and ``execute``, or with
+    :py:func:`run_test_plain`. Tests the batch gives no result for fail, with
+    the traceback when ``execute_batch`` raised.
+    """
+    start_time = time.time()
+    requests = [
+        (config, *prepare_test_paths(test, config.basedir)) for config, test in tests
+    ]
+    pending = set(range(len(tests)))
+    error: Exception | None = None
+    try:
+        executed = execute_batch(requests)
+        if executed is not None:
+            for index, (returncode, out) in executed:
+                if index not in pending:
+                    logger.warning("Ignoring an unexpected result for test %s", index)
+                    continue
+                pending.remove(index)
+                config, test = tests[index]
+                yield index, function_test_result(
+                    config, test, returncode, out, time.time() - start_time
+                )
+    except Exception as err:
+        error = err
+    else:
+        if executed is None:
+            for index, (config, test) in enumerate(tests):
+                if execute is None:
+                    yield index, run_test_plain(config, test)
+                else:
+                    yield index, run_test_function(execute, config, test)
+            return
+    for index in sorted(pending):
+        config, test = tests[index]
+        if error is not None:
+            yield index, exception_test_result(
+                config, test, "The batch executor", error, time.time() - start_time
+            )
+            continue
+        tooluri, joburi = prepare_test_uris(config, test)
+        yield index, TestResult(
+            1,
+            "",
+            "",
+            time.time() - start_time,
+            config.classname,
+            config.entry,
+            tooluri,
+            joburi,
+            "No result from the batch executor",
+        )
+
+
+def exception_test_result(
+    config: CWLTestConfig,
+    test: dict[str, str],
+    what: str,
+    err: Exception,
+    duration: float,
+) -> TestResult:
+    """Return the failure of a test because ``what`` raised ``err``."""
+    tooluri, joburi = prepare_test_uris(config, test)
+    logger.error("Test %s failed: %s raised %r", get_test_id(test), what, err)
+    return TestResult(
+        1,
+        "",
+        "",
+        duration,
+        config.classname,
+        config.entry,
+        tooluri,
+        joburi,
+        f"{what} raised:\n{''.join(traceback.format_exception(err))}",
+    )
+
+
+def function_test_result(
+    config: CWLTestConfig,
+    test: dict[str, str],
+    returncode: int,
+    out: dict[str, Any] | None,
+    duration: float,
+) -> TestResult:
+    """Check what a function returned for a test against its expected output."""
+    processfile, jobfile = prepare_test_paths(test, config.basedir)
+    tooluri, joburi = prepare_test_uris(config, test)
+    outerr = ""
+    outstr = json.dumps(out) if out is not None else "{}"
+    if returncode == UNSUPPORTED_FEATURE:
+        if REQUIRED not in test.get("tags", ["required"]):
+            return TestResult(
+                UNSUPPORTED_FEATURE,
+                outstr,
+                "",
+                duration,
+                config.classname,
+                config.entry,
+                tooluri,
+                joburi,
+            )
+    elif returncode != 0:
+        if not bool(test.get("should_fail", False)):
+            logger.warning("Test failed unexpectedly: %s %s", processfile, jobfile)
+            logger.warning(test.get("doc"))
+            message = "Returned non-zero but it should be zero"
+            return TestResult(
+                1,
+                outstr,
+                outerr,
+                duration,
+                config.classname,
+                config.entry,
+                tooluri,
+                joburi,
+                message,
+            )
+        return TestResult(
+            0,
+            outstr,
+            outerr,
+            duration,
+            config.classname,
+            config.entry,
+            tooluri,
+            joburi,
+        )
+    if bool(test.get("should_fail", False)):
+        return TestResult(
+            1,
+            outstr,
+            outerr,
+            duration,
+            config.classname,
+            config.entry,
+            tooluri,
+            joburi,
+            "Test should failed, but it did not.",
+        )
+
+    fail_message = ""
+
+    try:
+        compare(test.get("output"), out)
+    except CompareFail as ex:
+        logger.warning("""Test failed: %s %s""", processfile, jobfile)
+        logger.warning(test.get("doc"))
+        logger.warning("Compare failure %s", ex)
+        fail_message = str(ex)
+
+    return TestResult(
+        (1 if fail_message else 0),
+        outstr,
+        outerr,
+        duration,
+        config.classname,
+        config.entry,
+        tooluri,
+        joburi,
+        fail_message,
+    )
+
+
+def _load_entry_point_or_function(name: str, group: str) -> Any:
+    for entry_point in entry_points(group=group):
+        if entry_point.name == name:
+            return entry_point.load()
+    module_name, _, function_name = name.partition(":")
+    if not function_name:
+        raise ValueError(f"{name} is neither a {group} entry point nor MODULE:FUNCTION")
+    try:
+        module = importlib.import_module(module_name)
+        return getattr(module, function_name)
+    except (ImportError, AttributeError) as err:
+        raise ValueError(f"Cannot load {name}: {err}") from err
+
+
+@functools.cache
+def load_executor(
+    name: str,
+) -> Callable[
+    [CWLTestConfig, str, str | None], tuple[int, dict[str, Any] | None] | None
+]:
+    """
+    Load a function to run tests with, like the pytest_cwl_execute_test hook.
+
+    ``name`` is the name of a ``cwltest.executor`` entry point, or
+    ``MODULE:FUNCTION``. Raises ValueError when it cannot be loaded.
+    """
+    return cast(
+        Callable[
+            [CWLTestConfig, str, str | None],
+            tuple[int, dict[str, Any] | None] | None,
+        ],
+        _load_entry_point_or_function(name, "cwltest.executor"),
+    )
+
+
+@functools.cache
+def load_batch_executor(
+    name: str,
+) -> Callable[
+    [list[tuple[CWLTestConfig, str, str | None]]],
+    Iterable[tuple[int, tuple[int, dict[str, Any] | None]]] | None,
+]:
+    """
+    Load a function to run tests in batches, like pytest_cwl_execute_tests_batch.
+
+    ``name`` is the name of a ``cwltest.batch_executor`` entry point, or
+    ``MODULE:FUNCTION``. Raises ValueError when it cannot be loaded.
+    """
+    return cast(
+        Callable[
+            [list[tuple[CWLTestConfig, str, str | None]]],
+            Iterable[tuple[int, tuple[int, dict[str, Any] | None]]] | None,
+        ],
+        _load_entry_point_or_function(name, "cwltest.batch_executor"),
+    )
+
+
+def load_session_hooks(
+    name: str,
+) -> tuple[Callable[..., Any] | None, Callable[..., Any] | None]:
+    """
+    Load the pytest_cwl_session_start and pytest_cwl_session_finish functions.
+
+    ``name`` is the name of a module, or the path of a Python file, that
+    defines either or both. Raises ValueError when it cannot be loaded. Like
+    hooks, call them with :py:func:`call_hook`.
+    """
+    try:
+        module = cwltest.warm.load_module(name)
+    except (ImportError, OSError) as err:
+        raise ValueError(f"Cannot load {name}: {err}") from err
+    start = getattr(module, "pytest_cwl_session_start", None)
+    finish = getattr(module, "pytest_cwl_session_finish", None)
+    if start is None and finish is None:
+        raise ValueError(
+            f"{name} defines neither pytest_cwl_session_start nor "
+            "pytest_cwl_session_finish"
+        )
+    return start, finish
+
+
+def call_hook(function: Callable[..., _T], **kwargs: Any) -> _T:
+    """Call a hook implementation with the arguments it has parameters for."""
+    parameters = inspect.signature(function).parameters
+    return function(**{name: kwargs[name] for name in parameters if name in kwargs})
+
+
+def bind_session(function: _F, session: Any) -> _F:
+    """Give ``session`` to the calls of a function, if it has such a parameter."""
+    try:
+        parameters = inspect.signature(function).parameters
+    except (TypeError, ValueError):
+        return function
+    if "session" not in parameters:
+        return function
+    return cast(_F, functools.partial(function, session=session))
+
+
+def select_shard(
+    test_ids: list[str], index: int, count: int, durations: dict[str, float]
+) -> list[int]:
+    """
+    Return the positions of the tests that belong to one shard out of ``count``.
+
+    When ``durations`` holds the expected duration of (some of) the tests, the
+    tests are spread so that the shards take about the same time; tests
+    without a known duration count as the average one. Otherwise, tests are
+    assigned by a hash of their identifier, so that adding tests moves no
+    other test to a different shard.
+
+    All shards must be given the same tests and durations.
+    """
+    if not durations:
+        return [
+            position
+            for position, test_id in enumerate(test_ids)
+            if int(hashlib.sha256(test_id.encode("utf-8")).hexdigest(), 16) % count
+            == index
+        ]
+    default = sum(durations.values()) / len(durations)
+    expected = [durations.get(test_id, default) for test_id in test_ids]
+    loads = [0.0] * count
+    selected = []
+    # longest tests first, each to the least loaded shard
+    for position in sorted(
+        range(len(test_ids)), key=lambda p: (-expected[p], test_ids[p], p)
+    ):
+        shard = loads.index(min(loads))
+        loads[shard] += expected[position]
+        if shard == index:
+            selected.append(position)
+    return sorted(selected)
+
+
+class MatrixVariant(NamedTuple):
+    """A CWL runner and arguments to run the tests with, in a matrix run."""
+
+    name: str
+    tool: str | None
+    args: list[str]
+
+
+def load_matrix(path: str) -> list[MatrixVariant]:
+    """
+    Load a matrix of CWL runners and arguments from a YAML file.
+
+    The file holds a list of mappings with a ``tool`` (defaults to the one of
+    the command line), ``args`` added to the ones of the command line, and a
+    unique ``name`` (defaults to the tool and arguments). Raises ValueError
+    when the file is not valid.
+    """
+    with open(path, encoding="utf-8") as stream:
+        try:
+            spec = ruamel.yaml.YAML(typ="safe").load(stream)
+        except ruamel.yaml.error.YAMLError as err:
+            raise ValueError(f"{path}: {err}") from err
+    if not isinstance(spec, list) or not spec:
+        raise ValueError(f"{path}: expected a list of runners and arguments")
+    variants = []
+    for number, entry in enumerate(spec, start=1):
+        if not isinstance(entry, dict) or not set(entry) <= {"name", "tool", "args"}:
+            raise ValueError(
+                f"{path}: entry {number} must be a mapping of name, tool and args"
+            )
+        tool = entry.get("tool")
+        args = entry.get("args", [])
+        if tool is not None and not isinstance(tool, str):
+            raise ValueError(f"{path}: the tool of entry {number} is not a string")
+        if not isinstance(args, list) or not all(isinstance(a, str) for a in args):
+            raise ValueError(f"{path}: the args of entry {number} are not strings")
+        name = entry.get("name") or " ".join([tool or "default"] + args)
+        variants.append(MatrixVariant(str(name), tool, args))
+    names = [variant.name for variant in variants]
+    if len(set(names)) != len(names):
+        raise ValueError(f"{path}: the names of the entries are not unique")
+    return variants
+
+
 def shortname(name: str) -> str:
     """
     Return the short name of a given name.
@@ -0,0 +1,238 @@
+"""
+Run tests on long-lived CWL runner processes, to save their start up time.
+
+A warm runner reads requests from its standard input and answers each one on
+its standard output, one JSON document per line:
+
+- request: ``{"processfile": ..., "jobfile": ..., "outdir": ..., "args":
+  [...]}``, where ``jobfile`` may be null and ``args`` are the runner
+  arguments to use besides the output directory and the files;
+- response: ``{"returncode": ..., "stdout": ..., "stderr": ...}``, with what
+  the runner would have exited with and written as a command.
+
+Up to as many runners as tests run at the same time are started, and kept
+for the next tests. A runner that times out is killed and replaced.
+
+``python -m cwltest.warm MODULE:FUNCTION`` is a warm runner for runners that
+provide a ``FUNCTION(argsl, stdout)`` entry point, like ``cwltool.main:main``.
+MODULE can also be the path of a Python file.
+"""
+
+import atexit
+import contextlib
+import importlib
+import importlib.util
+import inspect
+import io
+import json
+import os
+import queue
+import subprocess  # nosec
+import sys
+import threading
+import traceback
+from collections.abc import Callable
+from types import ModuleType
+from typing import IO, Any, cast
+
+from cwltest import logger
+
+
+class WarmRunner:
+    """A runner process that answers one request at a time."""
+
+    def __init__(self, command: list[str]) -> None:
+        """Start the runner with ``command``."""
+        self.process = subprocess.Popen(  # nosec
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+        )
+        self._responses: queue.Queue[str | None] = queue.Queue()
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def _read(self) -> None:
+        for line in cast(IO[str], self.process.stdout):
+            self._responses.put(line)
+        self._responses.put(None)
+
+    def run(self, request: dict[str, Any], timeout: float | None) -> dict[str, Any]:
+        """
+        Send a request and wait for its response.
+
+        Raises subprocess.TimeoutExpired when there is no response within
+        ``timeout`` seconds, and RuntimeError when the runner exited.
+        """
+        try:
+            stdin = cast(IO[str], self.process.stdin)
+            stdin.write(json.dumps(request) + "\n")
+            stdin.flush()
+        except OSError as err:
+            raise RuntimeError(f"the warm runner exited: {err}") from err
+        try:
+            line = self._responses.get(timeout=timeout)
+        except queue.Empty as err:
+            raise subprocess.TimeoutExpired(
+                self.process.args, cast(float, timeout)
+            ) from err
+        if line is None:
+            raise RuntimeError(
+                f"the warm runner exited with code {self.process.wait()}"
+            )
+        return cast(dict[str, Any], json.loads(line))
+
+    def close(self) -> None:
+        """Stop the runner: let it finish on end of input, or kill it."""
+        with contextlib.suppress(OSError):
+            cast(IO[str], self.process.stdin).close()
+        try:
+            self.process.wait(5)
+        except subprocess.TimeoutExpired:
+            self.kill()
+
+    def kill(self) -> None:
+        """Kill the runner, when it is stuck in a request."""
+        self.process.kill()
+        self.process.wait()
+
+
+class _Pool:
+    def __init__(self, command: list[str]) -> None:
+        self.command = command
+        self.idle: list[WarmRunner] = []
+        self.lock = threading.Lock()
+
+    def acquire(self) -> WarmRunner:
+        with self.lock:
+            while self.idle:
+                runner = self.idle.pop()
+                if runner.process.poll() is None:
+                    return runner
+        logger.debug("Starting warm runner: %s", " ".join(self.command))
+        return WarmRunner(self.command)
+
+    def release(self, runner: WarmRunner) -> None:
+        with self.lock:
+            self.idle.append(runner)
+
+    def close(self) -> None:
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for runner in idle:
+            runner.close()
+
+
+_pools: dict[tuple[str, ...], _Pool] = {}
+_pools_lock = threading.Lock()
+
+
+@atexit.register
+def _close_pools() -> None:
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+
+
+def run_request(
+    command: list[str], request: dict[str, Any], timeout: float | None
+) -> tuple[int, str, str]:
+    """
+    Run a request on an idle warm runner started with ``command``.
+
+    Returns the exit code, standard output and error of the test. Raises
+    subprocess.TimeoutExpired when the test takes more than ``timeout``
+    seconds, after killing the runner.
+    """
+    with _pools_lock:
+        pool = _pools.setdefault(tuple(command), _Pool(command))
+    runner = pool.acquire()
+    try:
+        response = runner.run(request, timeout)
+    except subprocess.TimeoutExpired:
+        runner.kill()
+        raise
+    except (RuntimeError, ValueError) as err:
+        runner.kill()
+        return 1, "", f"Warm runner failure: {err}"
+    pool.release(runner)
+    return (
+        int(response.get("returncode", 1)),
+        response.get("stdout", ""),
+        response.get("stderr", ""),
+    )
+
+
+def load_module(name: str) -> ModuleType:
+    """Import a module by name, or from the path of a Python file."""
+    if name.endswith(".py") or os.path.sep in name:
+        module_spec = importlib.util.spec_from_file_location(
+            "_cwltest_" + os.path.splitext(os.path.basename(name))[0], name
+        )
+        if module_spec is None or module_spec.loader is None:
+            raise ImportError(f"Cannot load {name}")
+        module = importlib.util.module_from_spec(module_spec)
+        module_spec.loader.exec_module(module)
+        return module
+    return importlib.import_module(name)
+
+
+def load_function(spec: str) -> Callable[..., Any]:
+    """Import the function of a ``MODULE:FUNCTION`` specification."""
+    module_name, _, function_name = spec.rpartition(":")
+    return cast(Callable[..., Any], getattr(load_module(module_name), function_name))
+
+
+def serve_requests(
+    function: Callable[..., Any], requests: IO[str], responses: IO[str]
+) -> None:
+    """Answer the requests with ``function(argsl, stdout)``, until end of input."""
+    accepts_stderr = "stderr" in inspect.signature(function).parameters
+    for line in requests:
+        request = json.loads(line)
+        argsl = list(request.get("args", [])) + ["--outdir", request["outdir"]]
+        argsl.append(request["processfile"])
+        if request.get("jobfile"):
+            argsl.append(request["jobfile"])
+        stdout, stderr = io.StringIO(), io.StringIO()
+        kwargs: dict[str, Any] = {"argsl": argsl, "stdout": stdout}
+        if accepts_stderr:
+            kwargs["stderr"] = stderr
+        # stray output must not mix with the responses
+        with contextlib.redirect_stdout(stderr), contextlib.redirect_stderr(stderr):
+            try:
+                returncode = function(**kwargs)
+            except SystemExit as err:
+                returncode = (
+                    err.code if isinstance(err.code, int) else int(err.code is not None)
+                )
+            except Exception:
+                traceback.print_exc(file=stderr)
+                returncode = 1
+        responses.write(
+            json.dumps(
+                {
+                    "returncode": returncode or 0,
+                    "stdout": stdout.getvalue(),
+                    "stderr": stderr.getvalue(),
+                }
+            )
+            + "\n"
+        )
+        responses.flush()
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run a warm runner for a ``MODULE:FUNCTION`` entry point."""
+    if argv is None:
+        argv = sys.argv[1:]
+    if len(argv) != 1 or ":" not in argv[0]:
+        print("Usage: python -m cwltest.warm MODULE:FUNCTION", file=sys.stderr)
+        return 1
+    serve_requests(load_function(argv[0]), sys.stdin, sys.stdout)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
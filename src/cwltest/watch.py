@@ -0,0 +1,182 @@
+"""Watch the files used by a test suite and report which of them changed."""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import sys
+import time
+from collections.abc import Iterable
+from typing import Any
+
+from ruamel.yaml import YAML
+from schema_salad.ref_resolver import uri_file_path
+
+from cwltest import logger
+
+# Keys whose values may name another local file that a test depends on
+_REFERENCE_KEYS = ("run", "$import", "$include", "location", "path")
+
+# inotify(7) event mask: anything that may change the content of a file
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_MASK = (
+    _IN_MODIFY
+    | _IN_ATTRIB
+    | _IN_CLOSE_WRITE
+    | _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+)
+
+
+def _local_path(location: str, base: str) -> str | None:
+    """Turn a reference into a local filesystem path, if it is one."""
+    if location.startswith("file://"):
+        return uri_file_path(location.split("#")[0])
+    if "://" in location or location.startswith("_:"):
+        return None
+    return os.path.normpath(os.path.join(base, location.split("#")[0]))
+
+
+def _references(obj: Any, base: str) -> Iterable[str]:
+    """Yield the local files that a CWL document or input object points to."""
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            if key in _REFERENCE_KEYS and isinstance(value, str):
+                if (path := _local_path(value, base)) is not None:
+                    yield path
+            else:
+                yield from _references(value, base)
+    elif isinstance(obj, list):
+        for entry in obj:
+            yield from _references(entry, base)
+
+
+def get_test_dependencies(test: dict[str, Any]) -> set[str]:
+    """
+    Determine the local files that the outcome of a test depends on.
+
+    These are the tool and the job file, and the files they refer to
+    (workflow steps, ``$import``/``$include`` directives, and inputs), found
+    transitively.
+    """
+    yaml = YAML(typ="safe", pure=True)
+    pending = [
+        path
+        for ref in (test.get("tool"), test.get("job"))
+        if isinstance(ref, str) and (path := _local_path(ref, os.getcwd()))
+    ]
+    found: set[str] = set()
+    while pending:
+        path = pending.pop()
+        if path in found:
+            continue
+        found.add(path)
+        if not path.endswith((".cwl", ".yml", ".yaml", ".json")):
+            continue
+        try:
+            with open(path, encoding="utf-8") as handle:
+                document = yaml.load(handle)
+        except Exception:  # nosec
+            # missing or unparsable files are still watched, only not scanned
+            continue
+        pending.extend(_references(document, os.path.dirname(path)))
+    return found
+
+
+def _signature(path: str) -> tuple[int, int] | None:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class _Inotify:
+    """Minimal inotify(7) binding, used to sleep until a directory changes."""
+
+    def __init__(self) -> None:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self.fd: int = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self._directories: set[str] = set()
+
+    def add(self, directory: str) -> None:
+        if directory not in self._directories:
+            if self._add_watch(self.fd, os.fsencode(directory), _IN_MASK) >= 0:
+                self._directories.add(directory)
+
+    def wait(self, timeout: float | None) -> None:
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if readable:
+            # editors often write a file in several steps
+            time.sleep(0.05)
+            try:
+                while os.read(self.fd, 65536):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class FileWatcher:
+    """Detect modifications to a set of files, using inotify if available."""
+
+    def __init__(self, interval: float = 1.0) -> None:
+        """Poll every ``interval`` seconds when inotify is not available."""
+        self.interval = interval
+        self._signatures: dict[str, tuple[int, int] | None] = {}
+        self._inotify: _Inotify | None = None
+        if sys.platform.startswith("linux"):
+            try:
+                self._inotify = _Inotify()
+            except (OSError, AttributeError) as err:
+                logger.debug("inotify is not available (%s), polling instead", err)
+
+    def watch(self, paths: Iterable[str]) -> None:
+        """Set the files to watch, keeping the state of already known files."""
+        signatures = {}
+        for path in paths:
+            if path in self._signatures:
+                signatures[path] = self._signatures[path]
+            else:
+                signatures[path] = _signature(path)
+            if self._inotify is not None and os.path.isdir(
+                directory := os.path.dirname(path) or "."
+            ):
+                self._inotify.add(directory)
+        self._signatures = signatures
+
+    def wait_for_changes(self) -> set[str]:
+        """Block until at least one watched file changed, return those files."""
+        while True:
+            if self._inotify is not None:
+                # the timeout catches changes in directories created later on
+                self._inotify.wait(max(self.interval, 5.0))
+            else:
+                time.sleep(self.interval)
+            changed = set()
+            for path, signature in self._signatures.items():
+                if (current := _signature(path)) != signature:
+                    self._signatures[path] = current
+                    changed.add(path)
+            if changed:
+                return changed
+
+    def close(self) -> None:
+        """Release the inotify file descriptor, if any."""
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
@@ -0,0 +1,341 @@
+"""
+Start tests by forking a process that already imported the CWL runner.
+
+A zygote is a Python process that imports the module of a console script
+entry point of the runner once, like ``cwltool.main:run``, and forks a child
+for each test. The child gets the standard output and error of the test
+through file descriptors passed over a Unix socket, sets ``sys.argv`` to the
+command line of the test and calls the entry point. So each test still runs
+in its own process, without paying for the start up of the interpreter and
+the imports of the runner.
+
+The parent side mimics the part of :py:class:`subprocess.Popen` that
+:py:func:`cwltest.utils.run_test_plain` uses, so that timeouts and exit codes
+are handled the same way. POSIX only.
+"""
+
+import atexit
+import contextlib
+import itertools
+import json
+import os
+import select
+import signal
+import socket
+import subprocess  # nosec
+import sys
+import threading
+import traceback
+from collections.abc import Callable
+from typing import Any
+
+from cwltest import logger
+from cwltest.limits import apply
+from cwltest.warm import load_function
+
+_MESSAGE_SIZE = 1 << 20
+
+
+class ZygoteProcess:
+    """A test process forked by a zygote, with the API of subprocess.Popen."""
+
+    def __init__(self, args: list[str]) -> None:
+        """Represent the process running the command line ``args``."""
+        self.args = args
+        self.pid: int | None = None
+        self.returncode: int | None = None
+        self._started = threading.Event()
+        self._exited = threading.Event()
+
+    def _set_pid(self, pid: int) -> None:
+        self.pid = pid
+        self._started.set()
+
+    def _set_returncode(self, returncode: int) -> None:
+        self.returncode = returncode
+        self._started.set()
+        self._exited.set()
+
+    def poll(self) -> int | None:
+        """Return the exit code, None while running."""
+        return self.returncode
+
+    def wait(self, timeout: float | None = None) -> int:
+        """Wait for the process to exit and return its exit code."""
+        if not self._exited.wait(timeout):
+            raise subprocess.TimeoutExpired(self.args, timeout or 0)
+        return self.returncode  # type: ignore[return-value]
+
+    def send_signal(self, sig: int) -> None:
+        """Send a signal to the process, if it is still running."""
+        self._started.wait()
+        if self.pid is not None and self.returncode is None:
+            with contextlib.suppress(ProcessLookupError):
+                os.kill(self.pid, sig)
+
+    def terminate(self) -> None:
+        """Terminate the process with SIGTERM."""
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self) -> None:
+        """Kill the process with SIGKILL."""
+        self.send_signal(signal.SIGKILL)
+
+
+class Zygote:
+    """A zygote process, and the test processes it forked."""
+
+    def __init__(self, spec: str) -> None:
+        """Start a zygote that imports the ``MODULE:FUNCTION`` entry point."""
+        self.spec = spec
+        self._socket, child = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        with child:
+            self.process = subprocess.Popen(  # nosec
+                [sys.executable, "-m", "cwltest.zygote", spec, str(child.fileno())],
+                pass_fds=[child.fileno()],
+            )
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._children: dict[int, ZygoteProcess] = {}
+        self.alive = True
+        self._closing = False
+        threading.Thread(target=self._receive, daemon=True).start()
+
+    def _receive(self) -> None:
+        while True:
+            try:
+                message = self._socket.recv(_MESSAGE_SIZE)
+            except OSError:
+                message = b""
+            if not message:
+                break
+            response = json.loads(message)
+            with self._lock:
+                child = self._children.get(response["id"])
+                if "returncode" in response:
+                    self._children.pop(response["id"], None)
+            if child is None:
+                continue
+            if "returncode" in response:
+                child._set_returncode(response["returncode"])
+            else:
+                child._set_pid(response["pid"])
+        if not self._closing:
+            logger.warning("The zygote for %s exited", self.spec)
+        with self._lock:
+            self.alive = False
+            children, self._children = self._children, {}
+        for child in children.values():
+            # the exit codes of the tests still running are lost
+            child._set_returncode(1)
+
+    def spawn(
+        self,
+        args: list[str],
+        cwd: str,
+        stdout: int,
+        stderr: int | None,
+        limits: list[tuple[int, int, int]] | None = None,
+        procs: str | None = None,
+        cpus: list[int] | None = None,
+        env: dict[str, str] | None = None,
+    ) -> ZygoteProcess:
+        """
+        Fork a process running the command line ``args`` in ``cwd``.
+
+        Its standard output and error go to the file descriptors ``stdout``
+        and ``stderr``, or the standard error of cwltest if None. The process
+        sets the rlimits of ``limits``, joins the cgroup of ``procs`` and only
+        runs on ``cpus`` first, see :py:func:`cwltest.limits.apply`, and adds
+        ``env`` to its environment.
+        """
+        child = ZygoteProcess(args)
+        try:
+            with self._lock:
+                if not self.alive:
+                    raise OSError("the zygote exited")
+                request_id = next(self._ids)
+                self._children[request_id] = child
+                request = {
+                    "id": request_id,
+                    "argv": args,
+                    "cwd": cwd,
+                    "limits": limits or [],
+                    "procs": procs,
+                    "cpus": cpus,
+                    "env": env or {},
+                }
+                socket.send_fds(
+                    self._socket,
+                    [json.dumps(request).encode("utf-8")],
+                    [stdout, 2 if stderr is None else stderr],
+                )
+        except OSError:
+            child._set_returncode(1)
+            raise
+        child._started.wait()
+        return child
+
+    def close(self) -> None:
+        """Stop the zygote; the test processes it forked keep running."""
+        self._closing = True
+        with contextlib.suppress(OSError):
+            self._socket.shutdown(socket.SHUT_RDWR)
+        self._socket.close()
+        try:
+            self.process.wait(5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+_zygotes: dict[str, Zygote] = {}
+_zygotes_lock = threading.Lock()
+
+
+@atexit.register
+def _close_zygotes() -> None:
+    with _zygotes_lock:
+        for zygote in _zygotes.values():
+            zygote.close()
+
+
+def spawn(
+    spec: str,
+    args: list[str],
+    cwd: str,
+    stdout: int,
+    stderr: int | None,
+    limits: list[tuple[int, int, int]] | None = None,
+    procs: str | None = None,
+    cpus: list[int] | None = None,
+    env: dict[str, str] | None = None,
+) -> ZygoteProcess:
+    """
+    Fork a test process from the zygote of ``spec``, started on first use.
+
+    ``args`` is the command line of the test, for ``sys.argv``. The standard
+    output and error of the test go to the file descriptors ``stdout`` and
+    ``stderr``, the standard error to the one of cwltest if None.
+    ``limits``, ``procs``, ``cpus`` and ``env`` are the resource limits and
+    the additional environment of the test.
+    """
+    with _zygotes_lock:
+        zygote = _zygotes.get(spec)
+        if zygote is None or not zygote.alive:
+            logger.debug("Starting zygote for %s", spec)
+            zygote = _zygotes[spec] = Zygote(spec)
+    try:
+        return zygote.spawn(args, cwd, stdout, stderr, limits, procs, cpus, env)
+    except OSError:
+        # the zygote may have died since, try once more with a new one
+        with _zygotes_lock:
+            if _zygotes.get(spec) is zygote:
+                zygote = _zygotes[spec] = Zygote(spec)
+        return zygote.spawn(args, cwd, stdout, stderr, limits, procs, cpus, env)
+
+
+def _run_child(
+    function: Callable[[], Any], request: dict[str, Any], fds: list[int]
+) -> None:
+    """Run the entry point in a forked child, then exit."""
+    returncode: Any = 1
+    try:
+        # its own process group, like the runners started by cwltest
+        os.setsid()
+        apply(
+            [tuple(limit) for limit in request.get("limits", [])],
+            request.get("procs"),
+            request.get("cpus"),
+        )
+        os.environ.update(request.get("env", {}))
+        os.chdir(request["cwd"])
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.dup2(fds[0], 1)
+        os.dup2(fds[1], 2)
+        for fd in [devnull, *fds]:
+            if fd > 2:
+                os.close(fd)
+        sys.argv = list(request["argv"])
+        try:
+            returncode = function()
+        except SystemExit as err:
+            returncode = err.code
+        except Exception:
+            traceback.print_exc()
+            returncode = 1
+        if returncode is None:
+            returncode = 0
+        elif not isinstance(returncode, int):
+            print(returncode, file=sys.stderr)
+            returncode = 1
+    finally:
+        with contextlib.suppress(Exception):
+            sys.stdout.flush()
+            sys.stderr.flush()
+        os._exit(returncode if isinstance(returncode, int) else 1)
+
+
+def _serve(control: socket.socket, function: Callable[[], Any]) -> None:
+    """Fork a child for each request, and report their pids and exit codes."""
+    wakeup_read, wakeup_write = os.pipe()
+    os.set_blocking(wakeup_write, False)
+    os.set_blocking(wakeup_read, False)
+    signal.set_wakeup_fd(wakeup_write)
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+    children: dict[int, int] = {}
+    while True:
+        readable, _, _ = select.select([control.fileno(), wakeup_read], [], [])
+        if wakeup_read in readable:
+            with contextlib.suppress(BlockingIOError):
+                while os.read(wakeup_read, 4096):
+                    pass
+        if control.fileno() in readable:
+            message, fds, _, _ = socket.recv_fds(control, _MESSAGE_SIZE, 2)
+            if not message:
+                return
+            request = json.loads(message)
+            request_id = request["id"]
+            pid = os.fork()
+            if pid == 0:
+                signal.set_wakeup_fd(-1)
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                control.close()
+                os.close(wakeup_read)
+                os.close(wakeup_write)
+                _run_child(function, request, fds)
+            for fd in fds:
+                os.close(fd)
+            children[pid] = request_id
+            control.send(json.dumps({"id": request_id, "pid": pid}).encode("utf-8"))
+        while children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            if (request_id := children.pop(pid, None)) is not None:
+                control.send(
+                    json.dumps(
+                        {
+                            "id": request_id,
+                            "returncode": os.waitstatus_to_exitcode(status),
+                        }
+                    ).encode("utf-8")
+                )
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run a zygote for a ``MODULE:FUNCTION`` entry point on a socket fd."""
+    if argv is None:
+        argv = sys.argv[1:]
+    spec, fd = argv
+    function = load_function(spec)
+    with socket.socket(fileno=int(fd)) as control:
+        _serve(control, function)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
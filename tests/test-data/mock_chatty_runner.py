@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+"""Mock CWL runner that writes a lot to its standard error."""
+
+import os
+import sys
+
+
+def main() -> int:
+    for line in range(int(os.environ["MOCK_CHATTER_LINES"])):
+        print(f"debug line {line}", file=sys.stderr)
+    print("{}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""Mock CWL runner that records its CPU affinity, environment and arguments."""
+
+import json
+import os
+import sys
+
+
+def main() -> int:
+    with open(os.environ["MOCK_ENV_FILE"], "a") as record:
+        record.write(
+            json.dumps(
+                {
+                    "affinity": sorted(os.sched_getaffinity(0)),
+                    "env": {
+                        name: value
+                        for name, value in os.environ.items()
+                        if name.startswith("CWLTEST_")
+                    },
+                    "argv": sys.argv[1:],
+                }
+            )
+            + "\n"
+        )
+    print("{}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""Mock implementation of a pytest_cwl_execute_test like executor."""
+
+import sys
+from collections.abc import Iterator
+from typing import Any
+
+from cwltest import UNSUPPORTED_FEATURE, utils
+
+
+def execute(
+    config: utils.CWLTestConfig, processfile: str, jobfile: str | None
+) -> tuple[int, dict[str, Any] | None]:
+    assert config.outdir
+    if processfile.endswith("return-unsupported.cwl"):
+        return UNSUPPORTED_FEATURE, None
+    if processfile.endswith("return-1.cwl"):
+        return 1, None
+    return 0, {}
+
+
+def execute_raising(
+    config: utils.CWLTestConfig, processfile: str, jobfile: str | None
+) -> tuple[int, dict[str, Any] | None]:
+    if processfile.endswith("return-1.cwl"):
+        raise RuntimeError("mock executor failure")
+    return execute(config, processfile, jobfile)
+
+
+_leaked: list[bytes] = []
+
+
+def execute_leaky(
+    config: utils.CWLTestConfig, processfile: str, jobfile: str | None
+) -> tuple[int, dict[str, Any] | None]:
+    if jobfile and jobfile.endswith("empty.yml"):
+        _leaked.append(b"x" * (64 << 20))
+    return execute(config, processfile, jobfile)
+
+
+def execute_batch(
+    tests: list[tuple[utils.CWLTestConfig, str, str | None]],
+) -> Iterator[tuple[int, tuple[int, dict[str, Any] | None]]]:
+    """Run the tests of a batch, the last one completing first."""
+    print(f"Batch of {len(tests)} tests", file=sys.stderr)
+    for index in reversed(range(len(tests))):
+        yield index, execute(*tests[index])
+
+
+def execute_batch_raising(
+    tests: list[tuple[utils.CWLTestConfig, str, str | None]],
+) -> Iterator[tuple[int, tuple[int, dict[str, Any] | None]]]:
+    """Run the tests of a batch, until one that fails."""
+    for index in reversed(range(len(tests))):
+        if tests[index][1].endswith("return-1.cwl"):
+            raise RuntimeError("mock batch failure")
+        yield index, execute(*tests[index])
+
+
+def execute_batch_unimplemented(
+    tests: list[tuple[utils.CWLTestConfig, str, str | None]],
+) -> None:
+    """Leave the tests to the per-test executor."""
+    return None
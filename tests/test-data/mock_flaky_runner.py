@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""Mock CWL runner that fails its first runs, recording their output directory."""
+
+import os
+import sys
+
+
+def main() -> int:
+    if "--version" in sys.argv[1:]:
+        print("mock_flaky_runner 1.0")
+        return 0
+    with open(os.environ["MOCK_FLAKY_FILE"], "a+") as record:
+        record.seek(0)
+        runs = len(record.readlines())
+        outdir = [arg for arg in sys.argv[1:] if arg.startswith("--outdir=")]
+        record.write(f"{outdir[0] if outdir else ''}\n")
+    if runs < int(os.environ["MOCK_FLAKY_FAILURES"]):
+        print("transient failure", file=sys.stderr)
+        return 1
+    print("{}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
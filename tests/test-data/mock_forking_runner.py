@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""Mock CWL runner that leaves a subprocess running, or hangs with it."""
+
+import argparse
+import os
+import subprocess  # nosec
+import sys
+import time
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("processfile")
+    parser.add_argument("jobfile", nargs="?", default=None)
+    parser.add_argument("--outdir")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args()
+
+    # like most leftover processes, it keeps the stdout and stderr of the runner
+    child = subprocess.Popen(  # nosec
+        [sys.executable, "-c", "import time; time.sleep(1000)"]
+    )
+    with open(os.environ["MOCK_CHILD_PIDFILE"], "w") as pidfile:
+        pidfile.write(str(child.pid))
+    if args.processfile.endswith("timeout.cwl"):
+        time.sleep(1000)
+    print("{}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""Mock CWL runner that uses more of a resource than it should."""
+
+import argparse
+import os
+import sys
+import time
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("processfile")
+    parser.add_argument("jobfile", nargs="?", default=None)
+    parser.add_argument("--outdir")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args()
+
+    hunger = os.environ["MOCK_HUNGER"]
+    if hunger == "disk":
+        for index in range(100):
+            with open(os.path.join(args.outdir, f"file{index}"), "wb") as output:
+                output.write(b"\0" * (1 << 20))
+            time.sleep(0.1)
+    elif hunger == "file":
+        with open(os.path.join(args.outdir, "file"), "wb") as output:
+            output.write(b"\0" * (100 << 20))
+    elif hunger == "memory":
+        print(len(bytearray(1 << 30)))
+    elif hunger == "cpu":
+        while True:
+            pass
+    print("{}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,27 @@
+"""Mock session hooks, and an executor that checks it is given the session."""
+
+import sys
+from typing import Any
+
+import mock_executor
+
+from cwltest import utils
+
+
+def pytest_cwl_session_start(tests: list[dict[str, Any]]) -> dict[str, str]:
+    print(f"Session started for {len(tests)} tests", file=sys.stderr)
+    return {"token": "session-token"}
+
+
+def pytest_cwl_session_finish(session: dict[str, str]) -> None:
+    print(f"Session {session['token']} finished", file=sys.stderr)
+
+
+def execute(
+    config: utils.CWLTestConfig,
+    processfile: str,
+    jobfile: str | None,
+    session: dict[str, str],
+) -> tuple[int, dict[str, Any] | None]:
+    assert session == {"token": "session-token"}
+    return mock_executor.execute(config, processfile, jobfile)
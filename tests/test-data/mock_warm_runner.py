@@ -0,0 +1,25 @@
+"""Mock implementation of a runner's main(argsl, stdout) entry point."""
+
+import os
+import sys
+from time import sleep
+from typing import IO
+
+from cwltest import UNSUPPORTED_FEATURE
+
+calls = 0
+
+
+def main(argsl: list[str], stdout: IO[str], stderr: IO[str] = sys.stderr) -> int:
+    global calls
+    calls += 1
+    print(f"call {calls} in process {os.getpid()}", file=stderr)
+    processfile = [arg for arg in argsl if arg.endswith(".cwl")][0]
+    if processfile.endswith("return-unsupported.cwl"):
+        return UNSUPPORTED_FEATURE
+    if processfile.endswith("return-1.cwl"):
+        return 1
+    if processfile.endswith("timeout.cwl"):
+        sleep(100000)
+    stdout.write("{}")
+    return 0
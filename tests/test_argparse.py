@@ -7,7 +7,7 @@ def test_arg() -> None:
     parsed = parser.parse_args(
         ["--test", "test_name", "-n", "52", "--tool", "cwltool", "-j", "4"]
     )
-    assert parsed.test == "test_name"
+    assert parsed.test == ["test_name"]
     assert parsed.n == "52"
     assert parsed.tool == "cwltool"
     assert parsed.j == 4
@@ -0,0 +1,104 @@
+import os
+import shutil
+
+import pytest
+
+from .util import get_data, run_with_mock_cwl_runner
+
+
+def _run_badgedir(args: list[str]) -> tuple[int, str, str]:
+    cwd = os.getcwd()
+    try:
+        os.chdir(get_data("tests/test-data/"))
+        return run_with_mock_cwl_runner(
+            ["--test", "badgedir.yaml"] + args, cwl_runner="no-such-runner"
+        )
+    finally:
+        os.chdir(cwd)
+
+
+def test_batch_executor(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Tests are handed to the batch executor in batches of a given size."""
+    monkeypatch.setenv("PYTHONPATH", get_data("tests/test-data/"))
+    error_code, _, stderr = _run_badgedir(
+        ["--batch-executor", "mock_executor:execute_batch", "--batch-size", "4"]
+    )
+    assert error_code == 1
+    assert "2 tests passed, 2 failures, 2 unsupported features" in stderr
+    assert stderr.count("Batch of 4 tests") == 1
+    assert stderr.count("Batch of 2 tests") == 1
+
+
+def test_batch_executor_fallback(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Without a batch, the tests run one by one with --executor."""
+    monkeypatch.setenv("PYTHONPATH", get_data("tests/test-data/"))
+    error_code, _, stderr = _run_badgedir(
+        [
+            "--batch-executor",
+            "mock_executor:execute_batch_unimplemented",
+            "--executor",
+            "mock_executor:execute",
+        ]
+    )
+    assert error_code == 1
+    assert "2 tests passed, 2 failures, 2 unsupported features" in stderr
+
+
+def test_raising_batch_executor(monkeypatch: pytest.MonkeyPatch) -> None:
+    """The tests left in a batch that raised fail, not the run."""
+    monkeypatch.setenv("PYTHONPATH", get_data("tests/test-data/"))
+    error_code, _, stderr = _run_badgedir(
+        ["--batch-executor", "mock_executor:execute_batch_raising"]
+    )
+    assert error_code == 1
+    # only the unsupported tests completed before the batch raised
+    assert "0 tests passed, 4 failures, 2 unsupported features" in stderr
+    assert "Traceback" not in stderr
+
+
+def test_invalid_batch_executor() -> None:
+    """A batch executor that cannot be loaded is reported before running tests."""
+    error_code, _, stderr = _run_badgedir(["--batch-executor", "no_such_module:run"])
+    assert error_code == 1
+    assert "Invalid --batch-executor" in stderr
+
+
+def test_batch_hook(pytester: pytest.Pytester) -> None:
+    """The pytest plugin runs the tests with the batch hook when implemented."""
+    for name in ["return-0.cwl", "return-1.cwl", "return-unsupported.cwl"]:
+        shutil.copy(get_data(f"tests/test-data/{name}"), pytester.path)
+    shutil.copy(get_data("tests/test-data/empty.yml"), pytester.path)
+    shutil.copy(
+        get_data("tests/test-data/badgedir.yaml"),
+        pytester.path / "badgedir.cwltest.yml",
+    )
+    pytester.makeconftest(f"""
+import sys
+sys.path.insert(0, {get_data("tests/test-data/")!r})
+from mock_executor import execute_batch as pytest_cwl_execute_tests_batch
+""")
+    result = pytester.runpytest("-n0", "-s", "--cwl-batch-size", "4")
+    result.assert_outcomes(passed=2, failed=4)
+    result.stderr.fnmatch_lines(["Batch of 4 tests", "Batch of 2 tests"])
+
+
+def test_raising_batch_hook(pytester: pytest.Pytester) -> None:
+    """The tests left in a batch that raised fail with its traceback."""
+    for name in ["return-0.cwl", "return-1.cwl", "return-unsupported.cwl"]:
+        shutil.copy(get_data(f"tests/test-data/{name}"), pytester.path)
+    shutil.copy(get_data("tests/test-data/empty.yml"), pytester.path)
+    shutil.copy(
+        get_data("tests/test-data/badgedir.yaml"),
+        pytester.path / "badgedir.cwltest.yml",
+    )
+    pytester.makeconftest(f"""
+import sys
+sys.path.insert(0, {get_data("tests/test-data/")!r})
+from mock_executor import (
+    execute_batch_raising as pytest_cwl_execute_tests_batch,
+)
+""")
+    result = pytester.runpytest("-n0", "--cwl-batch-size", "6")
+    result.assert_outcomes(failed=6)
+    assert result.stdout.str().count("RuntimeError: mock batch failure") >= 4
+    assert "StopIteration" not in result.stdout.str()
@@ -0,0 +1,133 @@
+import json
+import os
+import socket
+import subprocess  # nosec
+import threading
+from pathlib import Path
+from typing import Any
+
+import defusedxml.ElementTree as ET
+
+from cwltest.distributed import Coordinator, run_worker, worker_main
+
+from .util import get_data
+
+
+def _options(test_data: str) -> dict[str, str | None]:
+    return {
+        "basedir": test_data,
+        "test_basedir": test_data,
+        "entry": "tests.yml",
+        "entry_line": "0",
+        "tool": get_data("tests/test-data/mock_cwl_runner.py"),
+    }
+
+
+def _test(name: str) -> dict[str, Any]:
+    return {
+        "tool": get_data(f"tests/test-data/{name}"),
+        "job": get_data("tests/test-data/empty.yml"),
+        "output": {},
+        "line": "0",
+    }
+
+
+def test_coordinator_with_local_workers(tmp_path: Path) -> None:
+    """Several local workers share the tests of a coordinator."""
+    junit_xml_report = tmp_path / "junit-report.xml"
+    address = f"unix:{tmp_path / 'cwltest.sock'}"
+    cwd = get_data("tests/test-data/")
+    coordinator = subprocess.Popen(  # nosec
+        [
+            "cwltest",
+            "coordinator",
+            "--listen",
+            address,
+            "--test",
+            "badgedir.yaml",
+            "--tool",
+            get_data("tests/test-data/mock_cwl_runner.py"),
+            "--junit-xml",
+            str(junit_xml_report),
+        ],
+        cwd=cwd,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    workers = [
+        subprocess.Popen(  # nosec
+            ["cwltest", "worker", "--connect", address, "-j", "2"], cwd=tmp_path
+        )
+        for _ in range(2)
+    ]
+    _, stderr = coordinator.communicate(timeout=120)
+    for worker in workers:
+        assert worker.wait(timeout=60) == 0
+
+    assert coordinator.returncode == 1
+    assert "2 tests passed, 2 failures, 2 unsupported features" in stderr
+    tree = ET.parse(junit_xml_report)
+    assert (root := tree.getroot()) is not None
+    assert root.attrib["tests"] == "6"
+
+
+def test_lost_worker_requeues_its_test() -> None:
+    """The test of a worker that disconnects is handed to another worker."""
+    coordinator = Coordinator("tcp:127.0.0.1:0", lease_timeout=60)
+    future = coordinator.submit_test(
+        _options(get_data("tests/test-data/")), _test("return-0.cwl"), 1
+    )
+    host, port = coordinator.address[len("tcp:") :].rsplit(":", 1)
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as lost:
+        lost.connect((host, int(port)))
+        stream = lost.makefile("rwb")
+        stream.readline()
+        stream.write(json.dumps({"type": "request"}).encode() + b"\n")
+        stream.flush()
+        assert json.loads(stream.readline())["type"] == "test"
+        stream.close()
+
+    cwd = os.getcwd()
+    worker = threading.Thread(target=run_worker, args=(coordinator.address,))
+    try:
+        worker.start()
+        assert future.result(timeout=30).return_code == 0
+        coordinator.shutdown()
+        worker.join(timeout=30)
+    finally:
+        os.chdir(cwd)
+    assert not worker.is_alive()
+
+
+def test_expired_lease_is_requeued(tmp_path: Path) -> None:
+    """A test without result within the lease timeout is handed out again."""
+    coordinator = Coordinator(f"unix:{tmp_path / 'cwltest.sock'}", lease_timeout=1)
+    future = coordinator.submit_test(
+        _options(get_data("tests/test-data/")), _test("return-1.cwl"), 1
+    )
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as hung:
+        hung.connect(str(tmp_path / "cwltest.sock"))
+        stream = hung.makefile("rwb")
+        stream.readline()
+        stream.write(json.dumps({"type": "request"}).encode() + b"\n")
+        stream.flush()
+        assert json.loads(stream.readline())["type"] == "test"
+
+        cwd = os.getcwd()
+        worker = threading.Thread(target=run_worker, args=(coordinator.address,))
+        try:
+            worker.start()
+            assert future.result(timeout=30).return_code == 1
+            # the expired lease is forgotten once its test completed
+            assert not coordinator._expired
+            coordinator.shutdown()
+            worker.join(timeout=30)
+        finally:
+            os.chdir(cwd)
+        assert not worker.is_alive()
+
+
+def test_worker_failure_exit_code(tmp_path: Path) -> None:
+    """A worker that cannot reach its coordinator exits with an error."""
+    address = f"unix:{tmp_path / 'nobody.sock'}"
+    assert worker_main(["--connect", address, "--connect-timeout", "1"]) == 1
@@ -0,0 +1,70 @@
+import os
+from pathlib import Path
+
+import defusedxml.ElementTree as ET
+import pytest
+
+from .util import get_data, run_with_mock_cwl_runner
+
+
+def test_executor(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Tests run with a Python function, in a pool of processes."""
+    monkeypatch.setenv("PYTHONPATH", get_data("tests/test-data/"))
+    cwd = os.getcwd()
+    try:
+        os.chdir(get_data("tests/test-data/"))
+        error_code, _, stderr = run_with_mock_cwl_runner(
+            ["--test", "badgedir.yaml", "--executor", "mock_executor:execute"],
+            cwl_runner="no-such-runner",
+        )
+    finally:
+        os.chdir(cwd)
+    assert error_code == 1
+    assert "2 tests passed, 2 failures, 2 unsupported features" in stderr
+
+
+def test_raising_executor(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """A test whose executor raises fails with the traceback, not the run."""
+    monkeypatch.setenv("PYTHONPATH", get_data("tests/test-data/"))
+    junit_xml_report = tmp_path / "junit-report.xml"
+    cwd = os.getcwd()
+    try:
+        os.chdir(get_data("tests/test-data/"))
+        error_code, _, stderr = run_with_mock_cwl_runner(
+            [
+                "--test",
+                "badgedir.yaml",
+                "--executor",
+                "mock_executor:execute_raising",
+                "--junit-xml",
+                str(junit_xml_report),
+            ],
+            cwl_runner="no-such-runner",
+        )
+    finally:
+        os.chdir(cwd)
+    assert error_code == 1
+    assert "2 tests passed, 2 failures, 2 unsupported features" in stderr
+    assert "Traceback" not in stderr
+    tree = ET.parse(junit_xml_report)
+    assert (root := tree.getroot()) is not None
+    failures = [
+        failure
+        for failure in root.iter("failure")
+        if "RuntimeError: mock executor failure" in (failure.text or "")
+    ]
+    assert len(failures) == 2
+
+
+def test_invalid_executor() -> None:
+    """An executor that cannot be loaded is reported before running tests."""
+    error_code, _, stderr = run_with_mock_cwl_runner(
+        [
+            "--test",
+            get_data("tests/test-data/badgedir.yaml"),
+            "--executor",
+            "no_such_module:execute",
+        ]
+    )
+    assert error_code == 1
+    assert "Invalid --executor" in stderr
@@ -0,0 +1,155 @@
+import json
+import os
+from pathlib import Path
+
+import defusedxml.ElementTree as ET
+
+from cwltest import UNSUPPORTED_FEATURE, utils
+from cwltest.history import RunHistory
+
+from .util import get_data, run_with_mock_cwl_runner
+
+
+def _result(return_code: int) -> utils.TestResult:
+    return utils.TestResult(return_code, "", "", 1.0, "", "", "tool.cwl", None)
+
+
+def test_known_unsupported_tags(tmp_path: Path) -> None:
+    """Only optional tags that are consistently unsupported are reported."""
+    history = RunHistory(str(tmp_path / "history.json"))
+    for _ in range(2):
+        history.record(
+            "runner 1.0",
+            "suite",
+            [
+                ({"tags": ["js"]}, _result(UNSUPPORTED_FEATURE)),
+                ({"tags": ["docker"]}, _result(UNSUPPORTED_FEATURE)),
+                ({"tags": ["docker", "js"]}, _result(UNSUPPORTED_FEATURE)),
+                ({"tags": ["shell"]}, _result(0)),
+                ({"tags": ["required", "inline"]}, _result(UNSUPPORTED_FEATURE)),
+            ],
+        )
+    history.record("runner 1.0", "suite", [({"tags": ["docker"]}, _result(1))])
+    history.save()
+
+    history = RunHistory(str(tmp_path / "history.json"))
+    assert history.known_unsupported_tags("runner 1.0", 3600) == {"js"}
+    assert history.known_unsupported_tags("runner 1.0", 0) == set()
+    assert history.known_unsupported_tags("runner 2.0", 3600) == set()
+
+
+def test_known_unsupported_once_per_run(tmp_path: Path) -> None:
+    """A run counts once for a tag, and only when all its tests were unsupported."""
+    history = RunHistory(str(tmp_path / "history.json"))
+    history.record(
+        "runner 1.0",
+        "suite",
+        [
+            ({"id": "one", "tags": ["js"]}, _result(UNSUPPORTED_FEATURE)),
+            ({"id": "two", "tags": ["js"]}, _result(UNSUPPORTED_FEATURE)),
+        ],
+    )
+    assert history.known_unsupported_tags("runner 1.0", 3600) == set()
+    for _ in range(2):
+        history.record(
+            "runner 1.0",
+            "suite",
+            [
+                ({"id": "one", "tags": ["tool", "js"]}, _result(UNSUPPORTED_FEATURE)),
+                ({"id": "two", "tags": ["tool"]}, _result(0)),
+            ],
+        )
+    assert history.known_unsupported_tags("runner 1.0", 3600) == {"js"}
+
+
+def test_expected_durations(tmp_path: Path) -> None:
+    """The median of the recorded durations is used, per suite."""
+    history = RunHistory(str(tmp_path / "history.json"))
+    for duration in (1.0, 9.0, 2.0):
+        result = _result(0)
+        result.duration = duration
+        history.record("runner 1.0", "suite", [({"id": "test"}, result)])
+    assert history.expected_durations("runner 1.0", "suite") == {"test": 2.0}
+    assert history.expected_durations("runner 1.0", "other") == {}
+
+
+def test_skip_known_unsupported(tmp_path: Path) -> None:
+    """Known unsupported tests are reported as unsupported without running."""
+    history = tmp_path / "history.json"
+    junit_xml_report = tmp_path / "junit-report.xml"
+    args = [
+        "--test",
+        "optional-unsupported.yml",
+        "--history",
+        str(history),
+        "--skip-known-unsupported",
+    ]
+    cwd = os.getcwd()
+    try:
+        os.chdir(get_data("tests/test-data/"))
+        for _ in range(2):
+            error_code, stdout, stderr = run_with_mock_cwl_runner(args)
+            assert error_code == 0
+            assert "Not running tests with known unsupported tags" not in stderr
+        error_code, stdout, stderr = run_with_mock_cwl_runner(
+            args + ["--junit-xml", str(junit_xml_report)]
+        )
+    finally:
+        os.chdir(cwd)
+
+    assert error_code == 0
+    assert "Not running tests with known unsupported tags: optional" in stderr
+    assert "0 tests passed, 1 unsupported features" in stderr
+    (runner,) = json.loads(history.read_text())["runners"].values()
+    assert runner["tags"]["optional"]["streak"] == 2
+    tree = ET.parse(junit_xml_report)
+    assert (root := tree.getroot()) is not None
+    assert (testcase_el := root.find("testsuite/testcase")) is not None
+    assert (skipped_el := testcase_el.find("skipped")) is not None
+    assert skipped_el.attrib["message"] == "Unsupported"
+
+
+def test_known_unsupported_required(tmp_path: Path) -> None:
+    """Required tests run even with a tag known to be unsupported."""
+    args = [
+        "--test",
+        "shared-tag-unsupported.yml",
+        "--history",
+        str(tmp_path / "history.json"),
+        "--skip-known-unsupported",
+    ]
+    cwd = os.getcwd()
+    try:
+        os.chdir(get_data("tests/test-data/"))
+        for _ in range(3):
+            error_code, stdout, stderr = run_with_mock_cwl_runner(args)
+            assert error_code == 1
+    finally:
+        os.chdir(cwd)
+
+    assert "Not running tests with known unsupported tags: optional" in stderr
+    assert "Does not support required feature" in stderr
+    assert "0 tests passed, 1 failures, 1 unsupported features" in stderr
+
+
+def test_adaptive_timeouts(tmp_path: Path) -> None:
+    """Timeouts come from the durations scaled to the speed of the host."""
+    history = RunHistory(str(tmp_path / "history.json"))
+    # recorded before the speeds were: ignored
+    history.record("runner 1.0", "suite", [({"id": "slow"}, _result(0))])
+    for duration in (40.0, 50.0, 60.0):
+        result = _result(0)
+        result.duration = duration
+        history.record("runner 1.0", "suite", [({"id": "slow"}, result)], 2.0)
+    for _ in range(3):
+        history.record("runner 1.0", "suite", [({"id": "fast"}, _result(0))], 1.0)
+    history.record("runner 1.0", "suite", [({"id": "new"}, _result(0))], 1.0)
+    history.save()
+
+    history = RunHistory(str(tmp_path / "history.json"))
+    # 59 seconds at the 95th percentile, on a host twice as fast
+    assert history.adaptive_timeouts("runner 1.0", "suite", 3.0, 1.0) == {
+        "slow": 89,
+        "fast": 30,
+    }
+    assert history.adaptive_timeouts("runner 1.0", "other", 3.0, 1.0) == {}
@@ -0,0 +1,139 @@
+import json
+import os
+import stat
+from pathlib import Path
+
+import pytest
+
+from cwltest import images
+
+from .util import get_data, run_with_mock_cwl_runner
+
+_STUB_DOCKER = """#!/bin/sh
+echo "$@" >> "$DOCKER_LOG"
+case "$1" in
+    image) exit 1 ;;
+    pull)
+        case "$2" in
+            bad/*) echo "no such image" >&2; exit 1 ;;
+        esac
+        sleep 0.2
+        ;;
+esac
+"""
+
+
+@pytest.fixture
+def docker_log(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Put a stub docker first on the PATH, logging its arguments."""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    docker = bin_dir / "docker"
+    docker.write_text(_STUB_DOCKER)
+    docker.chmod(docker.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    log = tmp_path / "docker.log"
+    monkeypatch.setenv("DOCKER_LOG", str(log))
+    return log
+
+
+def _tool(path: Path, requirements: object) -> str:
+    path.write_text(
+        json.dumps(
+            {
+                "class": "CommandLineTool",
+                "cwlVersion": "v1.0",
+                "inputs": [],
+                "outputs": [],
+                "baseCommand": "true",
+                "hints": requirements,
+            }
+        )
+    )
+    return str(path)
+
+
+def test_required_images(tmp_path: Path) -> None:
+    """The images of the tool and of the documents it runs are found."""
+    step = _tool(
+        tmp_path / "step.cwl",
+        {"DockerRequirement": {"dockerPull": "example/step"}},
+    )
+    workflow = tmp_path / "workflow.cwl"
+    workflow.write_text(
+        json.dumps(
+            {
+                "class": "Workflow",
+                "hints": [{"class": "DockerRequirement", "dockerPull": "example/wf"}],
+                "steps": [{"id": "step", "run": step}],
+            }
+        )
+    )
+    assert images.required_images({"tool": str(workflow)}) == {
+        "example/wf",
+        "example/step",
+    }
+
+
+def test_prefetch_once(tmp_path: Path, docker_log: Path) -> None:
+    """Each image is pulled once; waiting returns once it is pulled."""
+    prefetcher = images.ImagePrefetcher(["docker"], 2)
+    prefetcher.prefetch(["example/a", "example/b"])
+    prefetcher.prefetch(["example/a"])
+    prefetcher.wait(["example/a"])
+    assert "pull example/a" in docker_log.read_text().splitlines()
+    prefetcher.wait()
+    prefetcher.shutdown()
+    assert sorted(docker_log.read_text().splitlines()) == [
+        "image inspect example/a",
+        "image inspect example/b",
+        "pull example/a",
+        "pull example/b",
+    ]
+
+
+def test_prefetch_images(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, docker_log: Path
+) -> None:
+    """The images of the selected tests are pulled before they run."""
+    monkeypatch.setenv("MOCK_ENV_FILE", str(tmp_path / "record.jsonl"))
+    tests = [
+        {
+            "tool": _tool(
+                tmp_path / "a.cwl",
+                [{"class": "DockerRequirement", "dockerPull": "example/a"}],
+            ),
+            "output": {},
+            "doc": "A test in a container",
+        },
+        {
+            "tool": _tool(
+                tmp_path / "b.cwl",
+                {"DockerRequirement": {"dockerPull": "example/a"}},
+            ),
+            "output": {},
+            "doc": "A test in the same container",
+        },
+        {
+            "tool": _tool(
+                tmp_path / "c.cwl",
+                {"DockerRequirement": {"dockerPull": "bad/c"}},
+            ),
+            "output": {},
+            "doc": "A test in a container that cannot be pulled",
+        },
+    ]
+    test_file = tmp_path / "tests.yml"
+    test_file.write_text(json.dumps(tests))
+    error_code, stdout, stderr = run_with_mock_cwl_runner(
+        ["--test", str(test_file), "--prefetch-images", "-j", "3"],
+        get_data("tests/test-data/mock_env_runner.py"),
+    )
+    assert error_code == 0, stderr
+    assert sorted(docker_log.read_text().splitlines()) == [
+        "image inspect bad/c",
+        "image inspect example/a",
+        "pull bad/c",
+        "pull example/a",
+    ]
+    assert stderr.count("Pulling image bad/c failed: no such image") == 1
@@ -0,0 +1,79 @@
+import json
+import os
+from pathlib import Path
+
+import defusedxml.ElementTree as ET
+
+from .util import get_data, run_with_mock_cwl_runner
+
+
+def _testcases(junit_xml_report: Path) -> list[dict[str, str]]:
+    tree = ET.parse(junit_xml_report)
+    assert (root := tree.getroot()) is not None
+    return [
+        {
+            **testcase.attrib,
+            "outcome": ",".join(child.tag for child in testcase),
+        }
+        for testcase in root.iter("testcase")
+    ]
+
+
+def test_resume(tmp_path: Path) -> None:
+    """A resumed run only runs the remaining tests, and reports on all."""
+    journal = tmp_path / "journal.jsonl"
+    full_report = tmp_path / "full.xml"
+    resumed_report = tmp_path / "resumed.xml"
+    args = ["--test", "badgedir.yaml"]
+    cwd = os.getcwd()
+    try:
+        os.chdir(get_data("tests/test-data/"))
+        run_with_mock_cwl_runner(
+            args + ["--journal", str(journal), "--junit-xml", str(full_report)]
+        )
+        # keep the first three results, and a line cut short by a crash
+        lines = journal.read_text().splitlines(keepends=True)
+        assert len(lines) == 6
+        journal.write_text("".join(lines[:3]) + lines[3][:20])
+        error_code, stdout, stderr = run_with_mock_cwl_runner(
+            args + ["--resume", str(journal), "--junit-xml", str(resumed_report)]
+        )
+    finally:
+        os.chdir(cwd)
+
+    assert error_code == 1
+    assert "Resuming" in stderr and "3 of 6 tests already completed" in stderr
+    assert stderr.count("Test [") == 3
+    assert "Ignoring truncated line 4" in stderr
+    records = [json.loads(line) for line in journal.read_text().splitlines()[4:]]
+    assert sorted(record["number"] for record in records) == [4, 5, 6]
+    full, resumed = _testcases(full_report), _testcases(resumed_report)
+    for testcase in full[3:] + resumed[3:]:
+        testcase.pop("time")
+    assert full == resumed
+
+
+def test_resume_history(tmp_path: Path) -> None:
+    """The results resumed from the journal are not recorded in the history again."""
+    journal = tmp_path / "journal.jsonl"
+    history = tmp_path / "history.json"
+    args = ["--test", "badgedir.yaml", "--history", str(history)]
+    cwd = os.getcwd()
+    try:
+        os.chdir(get_data("tests/test-data/"))
+        run_with_mock_cwl_runner(args + ["--journal", str(journal)])
+        lines = journal.read_text().splitlines(keepends=True)
+        journal.write_text("".join(lines[:3]))
+        resumed = {json.loads(line)["id"] for line in lines[:3]}
+        run_with_mock_cwl_runner(args + ["--resume", str(journal)])
+    finally:
+        os.chdir(cwd)
+
+    (runner,) = json.loads(history.read_text())["runners"].values()
+    samples = {
+        key.partition("#")[2]: len(record["durations"])
+        for key, record in runner["tests"].items()
+    }
+    assert len(samples) == 6
+    for test_id, count in samples.items():
+        assert count == (1 if test_id in resumed else 2), test_id
@@ -0,0 +1,124 @@
+import os
+import resource
+import subprocess  # nosec
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from cwltest import limits
+
+from .util import get_data, run_with_mock_cwl_runner
+
+
+@pytest.mark.parametrize(
+    "hunger,limit,message",
+    [
+        ("disk", ["--test-disk", "5"], "Test exceeded the disk limit of 5 MiB"),
+        ("file", ["--test-disk", "5"], "Test exceeded the disk limit of 5 MiB"),
+        (
+            "memory",
+            ["--test-memory", "200"],
+            "Test exceeded the memory limit of 200 MiB",
+        ),
+        (
+            "cpu",
+            ["--test-cpu-time", "1"],
+            "Test exceeded the CPU time limit of 1 seconds",
+        ),
+    ],
+)
+@pytest.mark.skipif(not os.path.isdir("/proc"), reason="needs /proc")
+def test_limit_exceeded(
+    monkeypatch: pytest.MonkeyPatch, hunger: str, limit: list[str], message: str
+) -> None:
+    """Only the test that exceeds a limit fails, with the limit it exceeded."""
+    monkeypatch.setenv("MOCK_HUNGER", hunger)
+    start = time.monotonic()
+    error_code, stdout, stderr = run_with_mock_cwl_runner(
+        ["--test", get_data("tests/test-data/short-names.yml"), "--timeout", "30"]
+        + limit,
+        get_data("tests/test-data/mock_hungry_runner.py"),
+    )
+    assert error_code == 1
+    assert message in stderr
+    assert time.monotonic() - start < 20
+
+
+def test_within_limits(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Tests within the limits pass."""
+    monkeypatch.setenv("MOCK_HUNGER", "none")
+    error_code, stdout, stderr = run_with_mock_cwl_runner(
+        [
+            "--test",
+            get_data("tests/test-data/short-names.yml"),
+            "--test-disk",
+            "5",
+            "--test-memory",
+            "500",
+            "--test-cpu-time",
+            "10",
+        ],
+        get_data("tests/test-data/mock_hungry_runner.py"),
+    )
+    assert error_code == 0, stderr
+
+
+def test_invalid_cgroup(tmp_path: Path) -> None:
+    """A directory that is not a cgroup is rejected."""
+    error_code, stdout, stderr = run_with_mock_cwl_runner(
+        [
+            "--test",
+            get_data("tests/test-data/short-names.yml"),
+            "--cgroup",
+            str(tmp_path),
+            "--test-memory",
+            "100",
+        ]
+    )
+    assert error_code == 1
+    assert "Invalid --cgroup" in stderr
+
+
+def test_test_cpus_requires_cgroup() -> None:
+    """--test-cpus cannot be enforced without a cgroup."""
+    error_code, stdout, stderr = run_with_mock_cwl_runner(
+        ["--test", get_data("tests/test-data/short-names.yml"), "--test-cpus", "1"]
+    )
+    assert error_code == 1
+    assert "--test-cpus requires --cgroup" in stderr
+
+
+def test_check_cgroup_controllers(tmp_path: Path) -> None:
+    """The controllers needed must be enabled for the tests of the cgroup."""
+    (tmp_path / "cgroup.subtree_control").write_text("cpu io\n")
+    limits.check_cgroup(str(tmp_path), ["cpu"])
+    with pytest.raises(ValueError, match="memory controllers are not enabled"):
+        limits.check_cgroup(str(tmp_path), ["cpu", "memory"])
+
+
+def test_wrap() -> None:
+    """The wrapper sets the limits, then runs the command in its place."""
+    command = [
+        sys.executable,
+        "-c",
+        "import os, resource; "
+        "print(resource.getrlimit(resource.RLIMIT_FSIZE)[0], os.getpid())",
+    ]
+    process = subprocess.Popen(  # nosec
+        limits.wrap(command, limits.rlimits(None, None, 1), None),
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    stdout, _ = process.communicate(timeout=60)
+    fsize, pid = stdout.split()
+    hard = resource.getrlimit(resource.RLIMIT_FSIZE)[1]
+    expected = 1 << 20 if hard == resource.RLIM_INFINITY else min(1 << 20, hard)
+    assert int(fsize) == expected
+    assert int(pid) == process.pid
+    missing = subprocess.run(  # nosec
+        limits.wrap(["no-such-runner"], [], None), capture_output=True, text=True
+    )
+    assert missing.returncode == 127
+    assert "cannot run no-such-runner" in missing.stderr
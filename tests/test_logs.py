@@ -0,0 +1,123 @@
+import os
+import subprocess  # nosec
+import sys
+import time
+from pathlib import Path
+
+import defusedxml.ElementTree as ET
+import pytest
+
+from cwltest import logs
+
+from .util import get_data, run_with_mock_cwl_runner
+
+
+def test_excerpt(tmp_path: Path) -> None:
+    """Only the head and the tail of a long output are kept."""
+    path = tmp_path / "stderr"
+    path.write_bytes(b"0123456789" * 10)
+    with open(path, "rb") as stream:
+        assert logs.excerpt(stream, 100) == "0123456789" * 10
+        assert logs.excerpt(stream, 20) == (
+            "0123456789\n[... 80 bytes omitted ...]\n0123456789"
+        )
+        assert logs.excerpt(stream, 20, str(path)) == (
+            f"0123456789\n[... 80 bytes omitted, the whole output is in {path} "
+            "...]\n0123456789"
+        )
+
+
+def test_runner_output(tmp_path: Path) -> None:
+    """The output object is parsed from the file, which is removed unless kept."""
+    output = logs.RunnerOutput(None, "1-test/one", True, 1024)
+    output.stdout.write(b'{"out": 1}\r\n')
+    output.stderr.write(b"done\n")  # type: ignore[union-attr]
+    output.stdout.flush()
+    output.stderr.flush()  # type: ignore[union-attr]
+    assert output.output_object() == {"out": 1}
+    assert output.excerpts() == ('{"out": 1}\n', "done\n")
+    output.close()
+    assert not Path(output.directory).exists()
+
+    kept = logs.RunnerOutput(str(tmp_path / "logs"), "1-test/one", False, 1024)
+    assert kept.stderr is None
+    assert kept.output_object() == {}
+    kept.close()
+    assert Path(kept.directory, "stdout").exists()
+    assert Path(kept.directory).name.startswith("1-test_one-")
+
+
+def test_output_held_open() -> None:
+    """A process that keeps the output open does not hold the test."""
+    output = logs.RunnerOutput(None, "1-test", True, 1024)
+    child = subprocess.Popen(  # nosec
+        [sys.executable, "-c", "print('{}', flush=True); import time; time.sleep(60)"],
+        stdout=output.stdout_pipe,
+        stderr=output.stderr_pipe,
+        start_new_session=True,
+    )
+    try:
+        output.started()
+        deadline = time.monotonic() + 30
+        while not os.path.getsize(output.stdout.name):
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+        start = time.monotonic()
+        assert output.output_object() == {}
+        assert time.monotonic() - start < logs.DRAIN_TIMEOUT + 5
+        output.close()
+    finally:
+        child.kill()
+        child.wait()
+
+
+def test_output_limit(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """The report has the head and tail of the output, the log directory all."""
+    junit_xml_report = tmp_path / "junit-report.xml"
+    log_dir = tmp_path / "logs"
+    monkeypatch.setenv("MOCK_CHATTER_LINES", "100000")
+    error_code, stdout, stderr = run_with_mock_cwl_runner(
+        [
+            "--test",
+            get_data("tests/test-data/short-names.yml"),
+            "--output-limit",
+            "4",
+            "--log-dir",
+            str(log_dir),
+            "--junit-xml",
+            str(junit_xml_report),
+        ],
+        get_data("tests/test-data/mock_chatty_runner.py"),
+    )
+    assert error_code == 0, stderr
+    (logged,) = log_dir.glob("*/stderr")
+    assert logged.stat().st_size > 1 << 20
+    tree = ET.parse(junit_xml_report)
+    assert (root := tree.getroot()) is not None
+    assert (system_err := root.find("testsuite/testcase/system-err")) is not None
+    text = system_err.text or ""
+    assert len(text) < 5000
+    assert text.startswith("debug line 0\n")
+    assert text.endswith("debug line 99999\n")
+    assert f"the whole output is in {logged}" in text
+
+
+def test_output_not_disk_limited(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """The disk limit of a test applies to its output directory, not its logs."""
+    monkeypatch.setenv("MOCK_CHATTER_LINES", "200000")
+    error_code, stdout, stderr = run_with_mock_cwl_runner(
+        [
+            "--test",
+            get_data("tests/test-data/short-names.yml"),
+            "--test-disk",
+            "1",
+            "--log-dir",
+            str(tmp_path),
+        ],
+        get_data("tests/test-data/mock_chatty_runner.py"),
+    )
+    assert error_code == 0, stderr
+    (logged,) = tmp_path.glob("*/stderr")
+    assert logged.stat().st_size > 1 << 20
@@ -0,0 +1,63 @@
+import os
+from pathlib import Path
+
+import defusedxml.ElementTree as ET
+import pytest
+
+from cwltest.utils import MatrixVariant, load_matrix
+
+from .util import get_data, run_with_mock_cwl_runner
+
+
+def test_matrix(tmp_path: Path) -> None:
+    """Each test runs with each runner, with a report for each of them."""
+    matrix = tmp_path / "matrix.yml"
+    matrix.write_text("- name: plain\n- name: broken\n  args: [--no-such-option]\n")
+    junit_xml_report = tmp_path / "junit-report.xml"
+    cwd = os.getcwd()
+    try:
+        os.chdir(get_data("tests/test-data/"))
+        error_code, stdout, stderr = run_with_mock_cwl_runner(
+            [
+                "--test",
+                "badgedir.yaml",
+                "--matrix",
+                str(matrix),
+                "--junit-xml",
+                str(junit_xml_report),
+                "--badgedir",
+                str(tmp_path / "badges"),
+            ]
+        )
+    finally:
+        os.chdir(cwd)
+
+    assert error_code == 1
+    assert "plain/badgedir: 2 tests passed, 2 failures" in stderr
+    assert "broken/badgedir: 0 tests passed, 6 failures" in stderr
+    tree = ET.parse(junit_xml_report)
+    assert (root := tree.getroot()) is not None
+    assert [suite.attrib["name"] for suite in root.iter("testsuite")] == [
+        "plain/badgedir",
+        "broken/badgedir",
+    ]
+    assert (tmp_path / "badges" / "broken" / "badgedir" / "all.json").exists()
+    lines = stdout.splitlines()
+    assert lines[0].split() == ["test", "plain", "broken"]
+    assert lines[1].startswith("[1] success_w_job")
+    assert lines[1].split()[2:5:2] == ["passed", "failed"]
+    assert lines[-1].startswith("total")
+    assert len(lines) == 8
+
+
+def test_load_matrix(tmp_path: Path) -> None:
+    """Names default to the tool and arguments, and must be unique."""
+    matrix = tmp_path / "matrix.yml"
+    matrix.write_text("- tool: cwltool\n  args: [--parallel]\n- {}\n")
+    assert load_matrix(str(matrix)) == [
+        MatrixVariant("cwltool --parallel", "cwltool", ["--parallel"]),
+        MatrixVariant("default", None, []),
+    ]
+    matrix.write_text("- {}\n- {}\n")
+    with pytest.raises(ValueError, match="not unique"):
+        load_matrix(str(matrix))
@@ -0,0 +1,121 @@
+import os
+import subprocess  # nosec
+from pathlib import Path
+
+import defusedxml.ElementTree as ET
+
+from cwltest import UNSUPPORTED_FEATURE, utils
+from cwltest.journal import Journal
+from cwltest.merge import merge
+
+from .util import get_data, run_with_mock_cwl_runner
+
+
+def _testcases(junit_xml_report: Path) -> list[dict[str, str]]:
+    tree = ET.parse(junit_xml_report)
+    assert (root := tree.getroot()) is not None
+    assert (testsuite_el := root.find("testsuite")) is not None
+    assert root.attrib["tests"] == testsuite_el.attrib["tests"]
+    assert root.attrib["failures"] == testsuite_el.attrib["failures"]
+    testcases = []
+    for testcase in root.iter("testcase"):
+        attributes = dict(testcase.attrib)
+        attributes.pop("time")
+        attributes["outcome"] = ",".join(child.tag for child in testcase)
+        testcases.append(attributes)
+    return testcases
+
+
+def test_merge_shards(tmp_path: Path) -> None:
+    """Merging the shards of a run gives the same reports as the full run."""
+    cwd = os.getcwd()
+    try:
+        os.chdir(get_data("tests/test-data/"))
+        run_with_mock_cwl_runner(
+            [
+                "--test",
+                "badgedir.yaml",
+                "--junit-xml",
+                str(tmp_path / "full.xml"),
+                "--badgedir",
+                str(tmp_path / "full"),
+            ]
+        )
+        for shard in (1, 2):
+            run_with_mock_cwl_runner(
+                [
+                    "--test",
+                    "badgedir.yaml",
+                    "--shard",
+                    f"{shard}/2",
+                    "--journal",
+                    str(tmp_path / f"shard{shard}.jsonl"),
+                ]
+            )
+    finally:
+        os.chdir(cwd)
+
+    process = subprocess.run(  # nosec
+        [
+            "cwltest",
+            "merge",
+            str(tmp_path / "shard1.jsonl"),
+            str(tmp_path / "shard2.jsonl"),
+            "--junit-xml",
+            str(tmp_path / "merged.xml"),
+            "--badgedir",
+            str(tmp_path / "merged"),
+        ],
+        capture_output=True,
+        text=True,
+    )
+    assert process.returncode == 1
+    assert "2 tests passed, 2 failures, 2 unsupported features" in process.stderr
+    assert _testcases(tmp_path / "merged.xml") == _testcases(tmp_path / "full.xml")
+    badges = sorted(path.name for path in (tmp_path / "full").iterdir())
+    assert badges == sorted(path.name for path in (tmp_path / "merged").iterdir())
+    for badge in badges:
+        full = (tmp_path / "full" / badge).read_text()
+        assert full == (tmp_path / "merged" / badge).read_text()
+
+
+def test_merge_policy(tmp_path: Path) -> None:
+    """Latest or worst result wins."""
+    test = {"id": "flaky", "tags": ["optional"], "line": "0"}
+    for name, return_codes in (
+        ("first", [1, UNSUPPORTED_FEATURE]),
+        ("second", [0]),
+    ):
+        journal = Journal(str(tmp_path / f"{name}.jsonl"))
+        for return_code in return_codes:
+            result = utils.TestResult(return_code, "", "", 1.0, "", "", "t.cwl", None)
+            journal.append("suite", 1, "flaky", test, result)
+        journal.close()
+    paths = [str(tmp_path / "first.jsonl"), str(tmp_path / "second.jsonl")]
+    assert merge(paths, "latest") == (1, 0, 0)
+    assert merge(paths, "worst") == (1, 1, 0)
+
+
+def test_merge_junit_cases(tmp_path: Path) -> None:
+    """The test cases are written whole, whatever their outputs hold."""
+    journal = Journal(str(tmp_path / "journal.jsonl"))
+    for number, test_id in enumerate(("one", "two"), start=1):
+        result = utils.TestResult(
+            1, "{}\n\x1b[0m", "line 1\nline 2\n", 1.0, "", "", "t.cwl", None, "failed"
+        )
+        test = {"id": test_id, "line": str(number)}
+        journal.append("suite", number, test_id, test, result)
+    journal.close()
+    merge([str(tmp_path / "journal.jsonl")], junit_xml_path=str(tmp_path / "m.xml"))
+
+    tree = ET.parse(tmp_path / "m.xml")
+    assert (root := tree.getroot()) is not None
+    testcases = list(root.iter("testcase"))
+    assert len(testcases) == 2
+    for testcase in testcases:
+        assert (system_out := testcase.find("system-out")) is not None
+        assert system_out.text == "{}\n[0m"
+        assert (system_err := testcase.find("system-err")) is not None
+        assert system_err.text == "line 1\nline 2\n"
+        assert (failure := testcase.find("failure")) is not None
+        assert failure.text == "failed"
@@ -0,0 +1,53 @@
+import os
+from pathlib import Path
+
+import defusedxml.ElementTree as ET
+
+from cwltest.main import _suite_names
+
+from .util import get_data, run_with_mock_cwl_runner
+
+
+def test_multiple_test_files(tmp_path: Path) -> None:
+    """Several test files run together, and are reported separately."""
+    junit_xml_report = tmp_path / "junit-report.xml"
+    badgedir = tmp_path / "badges"
+    cwd = os.getcwd()
+    try:
+        os.chdir(get_data("tests/test-data/"))
+        error_code, _, stderr = run_with_mock_cwl_runner(
+            [
+                "--test",
+                "badgedir.yaml",
+                "--test",
+                "short-names.yml",
+                "--junit-xml",
+                str(junit_xml_report),
+                "--badgedir",
+                str(badgedir),
+            ]
+        )
+    finally:
+        os.chdir(cwd)
+
+    assert error_code == 1
+    assert "badgedir: 2 tests passed, 2 failures" in stderr
+    assert "short-names: 1 tests passed, 0 failures" in stderr
+    assert "3 tests passed, 2 failures, 2 unsupported features" in stderr
+    tree = ET.parse(junit_xml_report)
+    assert (root := tree.getroot()) is not None
+    assert root.attrib["tests"] == "7"
+    assert {
+        suite.attrib["name"]: suite.attrib["tests"] for suite in root.iter("testsuite")
+    } == {"badgedir": "6", "short-names": "1"}
+    assert (badgedir / "badgedir" / "all.json").exists()
+    assert (badgedir / "short-names" / "all.json").exists()
+
+
+def test_suite_names() -> None:
+    """Test files of the same name are told apart by their directories."""
+    assert _suite_names(["a/tests.yml", "b/other.yaml"]) == ["tests", "other"]
+    assert _suite_names(["v1.0/tests.yml", "v1.2/tests.yml"]) == [
+        "v1.0/tests",
+        "v1.2/tests",
+    ]
@@ -0,0 +1,59 @@
+import os
+import pytest
+
+from cwltest.pool import RecyclingProcessPool, WorkerDied
+
+from .util import get_data, run_with_mock_cwl_runner
+
+
+def test_recycle_after_tasks() -> None:
+    """Workers are replaced after a number of tasks."""
+    with RecyclingProcessPool(1, max_tasks=2) as pool:
+        pids = [pool.submit(os.getpid).result() for _ in range(4)]
+    assert pids[0] == pids[1] != pids[2] == pids[3]
+
+
+def test_recycle_past_rss() -> None:
+    """Workers are replaced when they use too much memory."""
+    with RecyclingProcessPool(1, max_rss=1) as pool:
+        pids = [pool.submit(os.getpid).result() for _ in range(2)]
+    assert pids[0] != pids[1]
+
+
+def test_worker_died() -> None:
+    """A call fails when its worker dies, and the next call gets a new worker."""
+    with RecyclingProcessPool(1) as pool:
+        died = pool.submit(os._exit, 3)
+        with pytest.raises(WorkerDied, match="exit code 3"):
+            died.result()
+        assert pool.submit(os.getpid).result() != os.getpid()
+
+
+def test_track_memory(monkeypatch: pytest.MonkeyPatch) -> None:
+    """The tests that grow the memory of the workers are reported."""
+    monkeypatch.setenv("PYTHONPATH", get_data("tests/test-data/"))
+    cwd = os.getcwd()
+    try:
+        os.chdir(get_data("tests/test-data/"))
+        error_code, _, stderr = run_with_mock_cwl_runner(
+            [
+                "--test",
+                "badgedir.yaml",
+                "--executor",
+                "mock_executor:execute_leaky",
+                "--track-memory",
+                "--max-tests-per-worker",
+                "2",
+                "-j1",
+            ],
+            cwl_runner="no-such-runner",
+        )
+    finally:
+        os.chdir(cwd)
+    assert error_code == 1
+    assert "2 tests passed, 2 failures, 2 unsupported features" in stderr
+    assert "Largest memory growths of the workers:" in stderr
+    report = stderr.split("Largest memory growths of the workers:")[1]
+    assert "[1] success_w_job: +64" in report
+    assert "MiB resident, +64.0 MiB traced" in report
+    assert "success_wo_job" not in report
@@ -0,0 +1,124 @@
+import json
+from pathlib import Path
+
+import pytest
+
+import cwltest.compare
+from cwltest import preflight
+from cwltest.stdfsaccess import StdFsAccess
+from cwltest.utils import absuri
+
+from .util import get_data, run_with_mock_cwl_runner
+
+
+def _tests(tmp_path: Path) -> Path:
+    """Write a test file whose tests refer to existing and missing files."""
+    tool = tmp_path / "tool.cwl"
+    tool.write_text(
+        json.dumps(
+            {
+                "class": "CommandLineTool",
+                "cwlVersion": "v1.0",
+                "inputs": {
+                    "reference": {
+                        "type": "File",
+                        "default": {"class": "File", "location": "reference.txt"},
+                    }
+                },
+                "outputs": [],
+                "baseCommand": "true",
+            }
+        )
+    )
+    (tmp_path / "reference.txt").write_text("reference")
+    tool_without_default = tmp_path / "tool-without-default.cwl"
+    tool_without_default.write_text(tool.read_text().replace("reference.txt", "x"))
+    (tmp_path / "input.txt").write_text("input")
+    (tmp_path / "good.json").write_text(
+        json.dumps({"input": {"class": "File", "path": "input.txt"}})
+    )
+    (tmp_path / "broken.json").write_text(
+        json.dumps(
+            {
+                "input": {"class": "File", "location": "no-such-input.txt"},
+                "directory": {"class": "Directory", "location": "input.txt"},
+                "literal": {"class": "File", "contents": "literal"},
+            }
+        )
+    )
+    tests = [
+        {
+            "id": "good",
+            "tool": "tool.cwl",
+            "job": "good.json",
+            "output": {},
+            "doc": "Good",
+        },
+        {
+            "id": "broken",
+            "tool": "tool.cwl",
+            "job": "broken.json",
+            "output": {},
+            "doc": "Broken",
+        },
+        {
+            "id": "no_default",
+            "tool": "tool-without-default.cwl",
+            "output": {},
+            "doc": "No default",
+        },
+        {"id": "no_job", "tool": "tool.cwl", "output": {}, "doc": "No job"},
+    ]
+    test_file = tmp_path / "tests.yml"
+    test_file.write_text(json.dumps(tests))
+    return test_file
+
+
+def test_check_tests(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """All the missing files of each test are reported."""
+    monkeypatch.setattr(cwltest.compare, "fs_access", StdFsAccess(""))
+    _tests(tmp_path)
+    problems = preflight.check_tests(
+        [
+            {"tool": absuri(str(tmp_path / "tool.cwl"))},
+            {"tool": absuri(str(tmp_path / "no-such-tool.cwl"))},
+            {
+                "tool": absuri(str(tmp_path / "tool.cwl")),
+                "job": absuri(str(tmp_path / "broken.json")),
+            },
+        ]
+    )
+    assert problems == [
+        [],
+        [f"missing tool {tmp_path / 'no-such-tool.cwl'}"],
+        [
+            f"missing File {tmp_path / 'no-such-input.txt'}",
+            f"missing Directory {tmp_path / 'input.txt'}",
+        ],
+    ]
+
+
+@pytest.mark.parametrize(
+    "option,error_code,runs",
+    [("--preflight-only", 1, 0), ("--skip-broken", 1, 2), ("--preflight", 0, 4)],
+)
+def test_preflight(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    option: str,
+    error_code: int,
+    runs: int,
+) -> None:
+    """The problems are reported up front; the broken tests run or not."""
+    record = tmp_path / "record.jsonl"
+    monkeypatch.setenv("MOCK_ENV_FILE", str(record))
+    code, stdout, stderr = run_with_mock_cwl_runner(
+        ["--test", str(_tests(tmp_path)), option],
+        get_data("tests/test-data/mock_env_runner.py"),
+    )
+    assert code == error_code
+    assert f"Test [2] broken: missing File {tmp_path / 'no-such-input.txt'}" in stderr
+    assert f"Test [2] broken: missing Directory {tmp_path / 'input.txt'}" in stderr
+    assert f"Test [3] no_default: missing File {tmp_path / 'x'}" in stderr
+    assert "Pre-flight check: 2 of 4 tests refer to missing files" in stderr
+    assert len(record.read_text().splitlines() if record.exists() else []) == runs
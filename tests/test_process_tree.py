@@ -0,0 +1,57 @@
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from .util import get_data, run_with_mock_cwl_runner
+
+
+def _alive(pid: int) -> bool:
+    try:
+        with open(f"/proc/{pid}/stat") as stat:
+            return stat.read().rpartition(")")[2].split()[0] != "Z"
+    except OSError:
+        return False
+
+
+def _run(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, test: str) -> str:
+    pidfile = tmp_path / "child.pid"
+    monkeypatch.setenv("MOCK_CHILD_PIDFILE", str(pidfile))
+    start = time.monotonic()
+    error_code, _, stderr = run_with_mock_cwl_runner(
+        [
+            "--test",
+            get_data(f"tests/test-data/{test}"),
+            "--timeout",
+            "2",
+            "--kill-grace",
+            "1",
+        ],
+        get_data("tests/test-data/mock_forking_runner.py"),
+    )
+    # the child holds the output of the runner open, not the test
+    assert time.monotonic() - start < 10
+    child = int(pidfile.read_text())
+    for _ in range(20):
+        if not _alive(child):
+            break
+        time.sleep(0.1)
+    assert not _alive(child)
+    return stderr
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc"), reason="needs /proc")
+def test_orphans_reaped(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """The processes a runner leaves running are stopped and reported."""
+    stderr = _run(tmp_path, monkeypatch, "short-names.yml")
+    assert "Stopped 1 processes left running by test 1" in stderr
+    assert "Stopped 1 processes left running by the runners" in stderr
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc"), reason="needs /proc")
+def test_timeout_kills_tree(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """The subprocesses of a runner that times out are stopped with it."""
+    stderr = _run(tmp_path, monkeypatch, "timeout.yml")
+    assert "Test 1 timed out" in stderr
+    assert "Stopped 1 processes left running by test 1" in stderr
@@ -0,0 +1,120 @@
+import json
+from pathlib import Path
+
+import defusedxml.ElementTree as ET
+import pytest
+
+from cwltest import utils
+from cwltest.history import RunHistory, runner_identity
+
+from .util import get_data, run_with_mock_cwl_runner
+
+
+def _result(return_code: int, attempts: int) -> utils.TestResult:
+    return utils.TestResult(
+        return_code, "", "", 1.0, "", "", "tool.cwl", None, attempts=attempts
+    )
+
+
+def test_rerun_passes(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """A test that passes on a rerun passes, and is reported as flaky."""
+    record = tmp_path / "record.txt"
+    history = tmp_path / "history.json"
+    junit_xml_report = tmp_path / "junit-report.xml"
+    monkeypatch.setenv("MOCK_FLAKY_FILE", str(record))
+    monkeypatch.setenv("MOCK_FLAKY_FAILURES", "1")
+    error_code, stdout, stderr = run_with_mock_cwl_runner(
+        [
+            "--test",
+            get_data("tests/test-data/short-names.yml"),
+            "--reruns",
+            "2",
+            "--history",
+            str(history),
+            "--junit-xml",
+            str(junit_xml_report),
+        ],
+        get_data("tests/test-data/mock_flaky_runner.py"),
+    )
+    assert error_code == 0, stderr
+    assert "Test [1] opt-error failed, running it again (rerun 1 of 2)" in stderr
+    outdirs = record.read_text().splitlines()
+    assert len(outdirs) == 2
+    assert outdirs[0] != outdirs[1]
+    tree = ET.parse(junit_xml_report)
+    assert (root := tree.getroot()) is not None
+    properties = {
+        prop.attrib["name"]: prop.attrib["value"]
+        for prop in root.iterfind("testsuite/testcase/properties/property")
+    }
+    assert properties == {"attempts": "2", "flaky": "true"}
+    (runner,) = json.loads(history.read_text())["runners"].values()
+    assert runner["tests"]["short-names#opt-error"]["flaky"] == [1]
+
+
+def test_reruns_exhausted(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """A test that fails every rerun fails."""
+    record = tmp_path / "record.txt"
+    monkeypatch.setenv("MOCK_FLAKY_FILE", str(record))
+    monkeypatch.setenv("MOCK_FLAKY_FAILURES", "10")
+    error_code, stdout, stderr = run_with_mock_cwl_runner(
+        [
+            "--test",
+            get_data("tests/test-data/short-names.yml"),
+            "--reruns",
+            "2",
+            "--reruns-delay",
+            "0.1",
+        ],
+        get_data("tests/test-data/mock_flaky_runner.py"),
+    )
+    assert error_code == 1
+    assert "running it again in 0.1 seconds (rerun 1 of 2)" in stderr
+    assert "running it again in 0.2 seconds (rerun 2 of 2)" in stderr
+    assert len(record.read_text().splitlines()) == 3
+
+
+def test_flaky_tests(tmp_path: Path) -> None:
+    """Only the runs with reruns, of the tests that passed, tell flakiness."""
+    history = RunHistory(str(tmp_path / "history.json"))
+    for attempts in (1, 2, 1, 3):
+        history.record(
+            "runner 1.0",
+            "suite",
+            [
+                ({"id": "flaky"}, _result(0, attempts)),
+                ({"id": "steady"}, _result(0, 1)),
+                ({"id": "broken"}, _result(1, 3)),
+            ],
+            reruns=True,
+        )
+    history.record("runner 1.0", "suite", [({"id": "flaky"}, _result(0, 1))])
+    assert history.flaky_tests("runner 1.0", "suite") == {"flaky": 0.5}
+    assert history.flaky_tests("runner 1.0", "other") == {}
+
+
+def test_isolate_flaky(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """The tests flaky often enough run after the others."""
+    runner = get_data("tests/test-data/mock_flaky_runner.py")
+    history = RunHistory(str(tmp_path / "history.json"))
+    for _ in range(3):
+        history.record(
+            runner_identity(runner),
+            "short-names",
+            [({"id": "opt-error"}, _result(0, 2))],
+            reruns=True,
+        )
+    history.save()
+    monkeypatch.setenv("MOCK_FLAKY_FILE", str(tmp_path / "record.txt"))
+    monkeypatch.setenv("MOCK_FLAKY_FAILURES", "0")
+    args = ["--test", get_data("tests/test-data/short-names.yml")]
+    error_code, stdout, stderr = run_with_mock_cwl_runner(
+        args + ["--isolate-flaky", "0.5"], runner
+    )
+    assert error_code == 1
+    assert "--isolate-flaky requires --history" in stderr
+    error_code, stdout, stderr = run_with_mock_cwl_runner(
+        args + ["--history", history.path, "--isolate-flaky", "0.5"], runner
+    )
+    assert error_code == 0, stderr
+    assert "Running 1 flaky tests after the others, one at a time" in stderr
@@ -0,0 +1,151 @@
+import json
+import os
+import threading
+from pathlib import Path
+
+import pytest
+from schema_salad.ref_resolver import file_uri
+
+from cwltest import main, resources
+from cwltest.argparser import arg_parser
+from cwltest.serve import FairPool
+
+from .util import get_data, run_with_mock_cwl_runner
+
+
+def test_cpu_allocator_disjoint() -> None:
+    """The running tests get disjoint CPUs, as many as they declare."""
+    allocator = resources.CpuAllocator(range(8), 4)
+    assert allocator.share == 2
+    first = allocator.acquire(None)
+    second = allocator.acquire(3.5)
+    assert len(first) == 2 and len(second) == 4
+    assert not set(first) & set(second)
+    assert allocator.size(100) == 8
+
+
+def test_cpu_allocator_waits() -> None:
+    """A test waits for enough CPUs to be released."""
+    allocator = resources.CpuAllocator(range(4), 2)
+    held = allocator.acquire(3)
+    acquired: list[list[int]] = []
+    waiter = threading.Thread(target=lambda: acquired.append(allocator.acquire(2)))
+    waiter.start()
+    waiter.join(0.2)
+    assert waiter.is_alive()
+    allocator.release(held)
+    waiter.join(5)
+    assert len(acquired[0]) == 2
+
+
+def test_declared_resources(tmp_path: Path) -> None:
+    """The numeric fields of the ResourceRequirements are found, expressions not."""
+    tool = tmp_path / "tool.cwl"
+    tool.write_text(
+        json.dumps(
+            {
+                "class": "Workflow",
+                "hints": [{"class": "ResourceRequirement", "coresMin": 2}],
+                "steps": {
+                    "step": {
+                        "run": {
+                            "class": "CommandLineTool",
+                            "requirements": {
+                                "ResourceRequirement": {
+                                    "coresMin": 4,
+                                    "ramMin": "$(inputs.ram)",
+                                }
+                            },
+                        }
+                    }
+                },
+            }
+        )
+    )
+    assert resources.declared_resources(file_uri(str(tool))) == {"coresMin": 4}
+    assert resources.declared_resources("http://example.com/tool.cwl") == {}
+
+
+@pytest.mark.skipif(
+    not hasattr(os, "sched_getaffinity"), reason="needs sched_getaffinity"
+)
+def test_pin_cpus(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """The runners run on the CPUs they are told about."""
+    record = tmp_path / "record.jsonl"
+    monkeypatch.setenv("MOCK_ENV_FILE", str(record))
+    error_code, stdout, stderr = run_with_mock_cwl_runner(
+        ["--test", get_data("tests/test-data/short-names.yml"), "--pin-cpus"],
+        get_data("tests/test-data/mock_env_runner.py"),
+    )
+    assert error_code == 0, stderr
+    runs = [json.loads(line) for line in record.read_text().splitlines()]
+    assert len(runs) == 1
+    cpus = runs[0]["affinity"]
+    assert set(cpus) <= os.sched_getaffinity(0)
+    assert runs[0]["env"]["CWLTEST_CPUS"] == ",".join(str(cpu) for cpu in cpus)
+    assert runs[0]["env"]["CWLTEST_NUM_CPUS"] == str(len(cpus))
+
+
+def test_expand_placeholders() -> None:
+    """Only the placeholders of known variables are replaced."""
+    assert resources.expand_placeholders(
+        ["--cores=${CWLTEST_CORES}", "${CWLTEST_OTHER}", "$HOME", "{}"],
+        resources.budget_variables(2, 1024),
+    ) == ["--cores=2", "${CWLTEST_OTHER}", "$HOME", "{}"]
+
+
+def test_budget(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """The runners are told their share of the cores and memory."""
+    record = tmp_path / "record.jsonl"
+    monkeypatch.setenv("MOCK_ENV_FILE", str(record))
+    error_code, stdout, stderr = run_with_mock_cwl_runner(
+        [
+            "--test",
+            get_data("tests/test-data/short-names.yml"),
+            "--test-memory",
+            "500",
+            "--",
+            "--max-cores=${CWLTEST_CORES}",
+            "--max-memory=${CWLTEST_RAM}M",
+        ],
+        get_data("tests/test-data/mock_env_runner.py"),
+    )
+    assert error_code == 0, stderr
+    (run,) = [json.loads(line) for line in record.read_text().splitlines()]
+    cores = str(len(resources.available_cpus()))
+    assert run["env"]["CWLTEST_CORES"] == cores
+    assert run["env"]["CWLTEST_RAM"] == "500"
+    assert f"--max-cores={cores}" in run["argv"]
+    assert "--max-memory=500M" in run["argv"]
+
+
+def test_budget_unknown_memory(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Without the memory of the host, the runners get no memory budget."""
+    monkeypatch.setattr(resources, "total_memory", lambda: 0)
+    assert resources.budget(1, None)[1] is None
+    assert resources.budget(1, 500)[1] == 500
+    variables = resources.budget_variables(2, None)
+    assert variables == {"CWLTEST_CORES": "2"}
+    assert resources.expand_placeholders(
+        ["--max-memory=${CWLTEST_RAM}M"], variables
+    ) == ["--max-memory=${CWLTEST_RAM}M"]
+
+
+def test_budget_executor_width(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """The host is shared between the workers of the executor, not -j."""
+    record = tmp_path / "record.jsonl"
+    monkeypatch.setenv("MOCK_ENV_FILE", str(record))
+    monkeypatch.setattr(resources, "total_memory", lambda: 4000)
+    args = arg_parser().parse_args(
+        [
+            "--test",
+            get_data("tests/test-data/short-names.yml"),
+            "--tool",
+            get_data("tests/test-data/mock_env_runner.py"),
+        ]
+    )
+    assert main.run(args, FairPool(4).queue()) == 0
+    (run,) = [json.loads(line) for line in record.read_text().splitlines()]
+    cores = max(1, len(resources.available_cpus()) // 4)
+    assert run["env"]["CWLTEST_CORES"] == str(cores)
+    assert run["env"]["CWLTEST_RAM"] == "1000"
@@ -0,0 +1,150 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from collections.abc import Iterator
+from typing import Any
+
+import pytest
+
+from cwltest.argparser import arg_parser
+from cwltest.main import run
+from cwltest.serve import FairPool, Server
+
+from .util import get_data
+
+
+@pytest.fixture
+def server() -> Iterator[Server]:
+    server = Server("127.0.0.1", 0, 2, [get_data("tests/test-data/mock_cwl_runner.py")])
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+def _post(
+    server: Server, request: dict[str, Any], headers: dict[str, str] | None = None
+) -> list[dict[str, Any]]:
+    host, port = server.server_address[:2]
+    with urllib.request.urlopen(  # nosec
+        urllib.request.Request(
+            f"http://{host!s}:{port}/runs",
+            data=json.dumps(request).encode(),
+            headers=headers or {"Content-Type": "application/json"},
+            method="POST",
+        ),
+        timeout=120,
+    ) as response:
+        return [json.loads(line) for line in response]
+
+
+def test_runs(server: Server) -> None:
+    """Results are streamed, and the test file is loaded only once."""
+    argv = [
+        "--test",
+        get_data("tests/test-data/badgedir.yaml"),
+        "--tool",
+        get_data("tests/test-data/mock_cwl_runner.py"),
+    ]
+    first = _post(server, {"argv": argv})
+    assert first[-1] == {"exit_code": 1}
+    assert sorted(message["number"] for message in first[:-1]) == [1, 2, 3, 4, 5, 6]
+    return_codes = {m["id"]: m["result"]["return_code"] for m in first[:-1]}
+    assert return_codes["failure_w_job"] == 1
+
+    second = _post(server, {"argv": argv + ["-n", "2-3"]})
+    assert second[-1] == {"exit_code": 1}
+    assert sorted(m["id"] for m in second[:-1]) == ["failure_w_job", "success_wo_job"]
+    assert len(server.suites._suites) == 1
+    assert server.pool.status() == {"workers": 2, "runs": 0, "queued": 0}
+
+
+def test_invalid_run(server: Server) -> None:
+    """Invalid options are answered with an error."""
+    with pytest.raises(urllib.error.HTTPError) as err:
+        _post(server, {"argv": ["--test", "x.yml", "--no-such-option"]})
+    assert err.value.code == 400
+    assert "--no-such-option" in json.loads(err.value.read())["error"]
+
+
+@pytest.mark.parametrize(
+    "argv,error",
+    [
+        (["--tool", "sh"], "--tool sh is not allowed"),
+        (["--executor", "os:system"], "--executor is not supported"),
+        (["--zygote", "os:system"], "--zygote is not supported"),
+        (["--container-cli", "sh -c"], "--container-cli is not supported"),
+        (["--junit-xml", "/tmp/x.xml"], "--junit-xml is not supported"),
+        (["--history", "/tmp/x.json"], "--history is not supported"),
+        (["--log-dir", "/tmp"], "--log-dir is not supported"),
+        (["--cgroup", "/sys/fs/cgroup"], "--cgroup is not supported"),
+    ],
+)
+def test_refused_options(server: Server, argv: list[str], error: str) -> None:
+    """The options that run other programs, load code or write files are refused."""
+    with pytest.raises(urllib.error.HTTPError) as err:
+        _post(server, {"argv": ["--test", "x.yml", *argv]})
+    assert err.value.code == 400
+    assert error in json.loads(err.value.read())["error"]
+
+
+@pytest.mark.parametrize(
+    "headers,code",
+    [
+        ({"Content-Type": "text/plain"}, 415),
+        ({"Content-Type": "application/json", "Host": "evil.example:8123"}, 403),
+    ],
+)
+def test_cross_site_requests(
+    server: Server, headers: dict[str, str], code: int
+) -> None:
+    """Requests a web page could send, or send by DNS rebinding, are refused."""
+    with pytest.raises(urllib.error.HTTPError) as err:
+        _post(server, {"argv": ["--test", "x.yml"]}, headers)
+    assert err.value.code == code
+
+
+def test_fair_pool() -> None:
+    """The runs sharing a pool take turns."""
+    pool = FairPool(1)
+    first, second = pool.queue(), pool.queue()
+    started = threading.Event()
+    gate = threading.Event()
+    order: list[str] = []
+
+    def block() -> None:
+        started.set()
+        gate.wait()
+
+    first.submit(block)
+    started.wait()
+    jobs = [first.submit(order.append, f"first{i}") for i in range(2)]
+    jobs += [second.submit(order.append, f"second{i}") for i in range(2)]
+    gate.set()
+    for job in jobs:
+        job.result(timeout=10)
+    assert order == ["second0", "first0", "second1", "first1"]
+    first.shutdown()
+    second.shutdown()
+    assert pool.status()["runs"] == 0
+
+
+def test_shared_cpus() -> None:
+    """The runs sharing a pool pin their tests to the CPUs of the pool."""
+    pool = FairPool(2)
+    args = arg_parser().parse_args(
+        [
+            "--test",
+            get_data("tests/test-data/short-names.yml"),
+            "--tool",
+            get_data("tests/test-data/mock_cwl_runner.py"),
+            "--pin-cpus",
+        ]
+    )
+    assert run(args, pool.queue()) == 0
+    assert args.cpu_allocator is pool.cpu_allocator
@@ -0,0 +1,75 @@
+import os
+import shutil
+
+import pytest
+
+from .util import get_data, run_with_mock_cwl_runner
+
+
+def test_session_hooks(monkeypatch: pytest.MonkeyPatch) -> None:
+    """The context of the session start hook is given to the executor."""
+    monkeypatch.setenv("PYTHONPATH", get_data("tests/test-data/"))
+    cwd = os.getcwd()
+    try:
+        os.chdir(get_data("tests/test-data/"))
+        error_code, _, stderr = run_with_mock_cwl_runner(
+            [
+                "--test",
+                "badgedir.yaml",
+                "--session-hooks",
+                "mock_session",
+                "--executor",
+                "mock_session:execute",
+                "-n",
+                "1-4",
+            ],
+            cwl_runner="no-such-runner",
+        )
+    finally:
+        os.chdir(cwd)
+    assert error_code == 1
+    assert "2 tests passed, 2 failures, 0 unsupported features" in stderr
+    assert stderr.index("Session started for 4 tests") < stderr.index(
+        "Session session-token finished"
+    )
+
+
+def test_invalid_session_hooks() -> None:
+    """Session hooks that cannot be loaded are reported before running tests."""
+    error_code, _, stderr = run_with_mock_cwl_runner(
+        [
+            "--test",
+            get_data("tests/test-data/badgedir.yaml"),
+            "--session-hooks",
+            get_data("tests/test-data/mock_executor.py"),
+        ]
+    )
+    assert error_code == 1
+    assert "Invalid --session-hooks" in stderr
+    assert "defines neither" in stderr
+
+
+def test_session_hooks_plugin(pytester: pytest.Pytester) -> None:
+    """The pytest plugin calls the session hooks once around the CWL tests."""
+    for name in ["return-0.cwl", "return-1.cwl", "return-unsupported.cwl"]:
+        shutil.copy(get_data(f"tests/test-data/{name}"), pytester.path)
+    shutil.copy(get_data("tests/test-data/empty.yml"), pytester.path)
+    shutil.copy(
+        get_data("tests/test-data/badgedir.yaml"),
+        pytester.path / "badgedir.cwltest.yml",
+    )
+    pytester.makeconftest(f"""
+import sys
+sys.path.insert(0, {get_data("tests/test-data/")!r})
+from mock_session import (
+    execute as pytest_cwl_execute_test,
+    pytest_cwl_session_finish,
+    pytest_cwl_session_start,
+)
+""")
+    result = pytester.runpytest("-n0", "-s")
+    result.assert_outcomes(passed=2, failed=4)
+    result.stderr.fnmatch_lines(
+        ["Session started for 6 tests", "Session session-token finished"]
+    )
+    assert result.stderr.str().count("Session started") == 1
@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+from cwltest.argparser import arg_parser
+from cwltest.utils import select_shard
+
+from .util import get_data, run_with_mock_cwl_runner
+
+TEST_IDS = [f"test_{number}" for number in range(40)]
+
+
+def _shards(
+    test_ids: list[str], count: int, durations: dict[str, float]
+) -> list[list[str]]:
+    return [
+        [test_ids[p] for p in select_shard(test_ids, index, count, durations)]
+        for index in range(count)
+    ]
+
+
+@pytest.mark.parametrize("durations", [{}, {"test_3": 10.0, "test_7": 1.0}])
+def test_shards_partition_the_tests(durations: dict[str, float]) -> None:
+    """Each test is in exactly one shard."""
+    shards = _shards(TEST_IDS, 3, durations)
+    assert sorted(sum(shards, [])) == sorted(TEST_IDS)
+
+
+def test_shards_are_balanced_by_duration() -> None:
+    """The longest tests are spread over the shards."""
+    durations = {test_id: 1.0 for test_id in TEST_IDS}
+    durations.update({"test_0": 20.0, "test_1": 20.0})
+    shards = _shards(TEST_IDS, 2, durations)
+    assert ("test_0" in shards[0]) != ("test_1" in shards[0])
+    totals = [sum(durations[test_id] for test_id in shard) for shard in shards]
+    assert totals[0] == totals[1]
+
+
+def test_hashed_shards_are_stable() -> None:
+    """Adding tests does not move the other tests to another shard."""
+    before = _shards(TEST_IDS, 4, {})
+    after = _shards(TEST_IDS + ["new_1", "new_2"], 4, {})
+    for old, new in zip(before, after, strict=True):
+        assert old == [test_id for test_id in new if not test_id.startswith("new")]
+
+
+def test_shard_argument() -> None:
+    assert arg_parser().parse_args(["--test", "t.yml", "--shard", "2/3"]).shard == (
+        1,
+        3,
+    )
+    with pytest.raises(SystemExit):
+        arg_parser().parse_args(["--test", "t.yml", "--shard", "4/3"])
+
+
+def test_shard_run() -> None:
+    """Running all the shards runs all the tests once."""
+    cwd = os.getcwd()
+    stderrs = []
+    try:
+        os.chdir(get_data("tests/test-data/"))
+        for shard in ("1/2", "2/2"):
+            _, _, stderr = run_with_mock_cwl_runner(
+                ["--test", "badgedir.yaml", "--shard", shard]
+            )
+            stderrs.append(stderr)
+    finally:
+        os.chdir(cwd)
+    counts = [stderr.count("Test [") for stderr in stderrs]
+    assert sum(counts) == 6
+    for index, (stderr, count) in enumerate(zip(stderrs, counts, strict=True)):
+        assert f"Running shard {index + 1}/2: {count} tests" in stderr
@@ -1,7 +1,11 @@
+import json
 import os
+import time
 from pathlib import Path
+from typing import Any
 
 import defusedxml.ElementTree as ET
+import pytest
 import schema_salad.ref_resolver
 
 from .util import get_data, run_with_mock_cwl_runner
@@ -41,3 +45,68 @@ def test_timeout_stderr_stdout(tmp_path: Path) -> None:
     except AttributeError as e:
         print(junit_xml_report.read_text())
         raise e
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc"), reason="needs /proc")
+def test_hang_timeout(tmp_path: Path) -> None:
+    """A runner that makes no progress fails as hung, before its timeout."""
+    junit_xml_report = tmp_path / "junit-report.xml"
+    cwd = os.getcwd()
+    try:
+        os.chdir(get_data("tests/test-data/"))
+        start = time.monotonic()
+        error_code, _, stderr = run_with_mock_cwl_runner(
+            [
+                "--test",
+                "timeout.yml",
+                "--timeout",
+                "60",
+                "--hang-timeout",
+                "1",
+                "--junit-xml",
+                str(junit_xml_report),
+            ]
+        )
+        duration = time.monotonic() - start
+    finally:
+        os.chdir(cwd)
+
+    assert error_code == 1
+    assert duration < 30
+    assert "Test 1 hung" in stderr
+    tree = ET.parse(junit_xml_report)
+    assert (root := tree.getroot()) is not None
+    assert (failure_el := root.find("testsuite/testcase/failure")) is not None
+    message = failure_el.text or ""
+    assert "Test hung: no progress for 1 seconds" in message
+    assert "mock_cwl_runner.py" in message
+
+
+@pytest.mark.parametrize(
+    "test_fields,extra_args",
+    [
+        ({"timeout": 2}, []),
+        ({"tags": ["slow", "command_line_tool"]}, ["--tag-timeout", "slow=2"]),
+    ],
+)
+def test_test_and_tag_timeouts(
+    tmp_path: Path, test_fields: dict[str, Any], extra_args: list[str]
+) -> None:
+    """The timeout of a test, or of its tags, replaces --timeout."""
+    test = {
+        "job": get_data("tests/test-data/v1.0/empty.json"),
+        "tool": get_data("tests/test-data/timeout.cwl"),
+        "output": {},
+        "id": "slow",
+        "doc": "A test with its own timeout",
+        **test_fields,
+    }
+    test_file = tmp_path / "tests.yml"
+    test_file.write_text(json.dumps([test]))
+    start = time.monotonic()
+    error_code, _, stderr = run_with_mock_cwl_runner(
+        ["--test", str(test_file), "--timeout", "60", *extra_args]
+    )
+    assert error_code == 1
+    assert "Test 1 timed out" in stderr
+    assert time.monotonic() - start < 14
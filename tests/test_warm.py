@@ -0,0 +1,55 @@
+import os
+import re
+import sys
+from pathlib import Path
+
+import defusedxml.ElementTree as ET
+
+from .util import get_data, run_with_mock_cwl_runner
+
+
+def _run(tmp_path: Path, test_file: str, *args: str) -> tuple[int, str, list[str]]:
+    junit_xml_report = tmp_path / "junit-report.xml"
+    warm_runner = (
+        f"{sys.executable} -m cwltest.warm "
+        + get_data("tests/test-data/mock_warm_runner.py")
+        + ":main"
+    )
+    cwd = os.getcwd()
+    try:
+        os.chdir(get_data("tests/test-data/"))
+        error_code, _, stderr = run_with_mock_cwl_runner(
+            [
+                "--test",
+                test_file,
+                "--warm-runner",
+                warm_runner,
+                "--junit-xml",
+                str(junit_xml_report),
+                "--junit-verbose",
+                *args,
+            ]
+        )
+    finally:
+        os.chdir(cwd)
+    tree = ET.parse(junit_xml_report)
+    assert (root := tree.getroot()) is not None
+    outputs = [system_err.text or "" for system_err in root.iter("system-err")]
+    return error_code, stderr, outputs
+
+
+def test_warm_runner_is_reused(tmp_path: Path) -> None:
+    """All the tests run in one runner process, with the usual outcomes."""
+    error_code, stderr, outputs = _run(tmp_path, "badgedir.yaml")
+    assert error_code == 1
+    assert "2 tests passed, 2 failures, 2 unsupported features" in stderr
+    calls = [re.search(r"call (\d+) in process (\d+)", output) for output in outputs]
+    assert sorted(int(call.group(1)) for call in calls if call) == list(range(1, 7))
+    assert len({call.group(2) for call in calls if call}) == 1
+
+
+def test_warm_runner_timeout(tmp_path: Path) -> None:
+    """A runner that times out is killed, and the test fails."""
+    error_code, stderr, _ = _run(tmp_path, "timeout.yml", "--timeout", "2")
+    assert error_code == 1
+    assert "Test 1 timed out" in stderr
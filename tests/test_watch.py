@@ -0,0 +1,121 @@
+import json
+import shutil
+import signal
+import subprocess  # nosec
+import threading
+import time
+from pathlib import Path
+
+import schema_salad.ref_resolver
+
+from cwltest.watch import FileWatcher, get_test_dependencies
+
+from .util import get_data
+
+
+def test_dependencies(tmp_path: Path) -> None:
+    """Tools, jobs and the files they refer to are dependencies."""
+    (tmp_path / "step.cwl").write_text("class: CommandLineTool\n")
+    (tmp_path / "wf.cwl").write_text(
+        "class: Workflow\nsteps:\n  one:\n    run: step.cwl\n"
+    )
+    (tmp_path / "job.yml").write_text(
+        "input:\n  class: File\n  location: data/input.txt\n"
+        "remote:\n  class: File\n  location: https://example.com/input.txt\n"
+    )
+    test = {
+        "tool": schema_salad.ref_resolver.file_uri(str(tmp_path / "wf.cwl")),
+        "job": schema_salad.ref_resolver.file_uri(str(tmp_path / "job.yml")),
+    }
+    assert get_test_dependencies(test) == {
+        str(tmp_path / "wf.cwl"),
+        str(tmp_path / "step.cwl"),
+        str(tmp_path / "job.yml"),
+        str(tmp_path / "data" / "input.txt"),
+    }
+
+
+def test_file_watcher(tmp_path: Path) -> None:
+    """Only the modified files are reported."""
+    first = tmp_path / "first.cwl"
+    second = tmp_path / "second.cwl"
+    first.write_text("one")
+    second.write_text("two")
+    watcher = FileWatcher(0.1)
+    try:
+        watcher.watch([str(first), str(second)])
+        second.write_text("three")
+        assert watcher.wait_for_changes() == {str(second)}
+    finally:
+        watcher.close()
+
+
+def test_watch_reruns_changed_tests(tmp_path: Path) -> None:
+    """Editing the test file re-runs only the modified entries."""
+    for name in ("return-0.cwl", "return-1.cwl", "mock_cwl_runner.py"):
+        shutil.copy(get_data(f"tests/test-data/{name}"), tmp_path)
+    shutil.copy(get_data("tests/test-data/return-0.cwl"), tmp_path / "other.cwl")
+    (tmp_path / "tests.yml").write_text(
+        "- id: changed\n  tool: return-0.cwl\n  output: {}\n  doc: Changed\n"
+        "- id: unchanged\n  tool: other.cwl\n  output: {}\n  doc: Unchanged\n"
+    )
+    process = subprocess.Popen(  # nosec
+        [
+            "cwltest",
+            "--test",
+            "tests.yml",
+            "--tool",
+            str(tmp_path / "mock_cwl_runner.py"),
+            "--watch",
+            "--watch-interval",
+            "0.1",
+            "--journal",
+            "journal.jsonl",
+        ],
+        cwd=tmp_path,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    assert process.stderr is not None
+    lines: list[str] = []
+    reader = threading.Thread(target=lines.extend, args=(process.stderr,))
+    reader.start()
+
+    def wait_for(text: str, count: int) -> None:
+        deadline = time.monotonic() + 60
+        while sum(text in line for line in lines) < count:
+            assert time.monotonic() < deadline, f"no {text!r} in {lines}"
+            assert process.poll() is None, f"cwltest exited: {lines}"
+            time.sleep(0.1)
+
+    try:
+        wait_for("Test [", 2)
+        # the file is watched once the first run is done
+        wait_for("Watching 2 tests for changes", 1)
+        (tmp_path / "tests.yml").write_text(
+            "- id: changed\n  tool: return-1.cwl\n  output: {}\n  doc: Changed\n"
+            "- id: unchanged\n  tool: other.cwl\n  output: {}\n  doc: Unchanged\n"
+        )
+        wait_for("Test [", 3)
+        wait_for("Watching 2 tests for changes", 2)
+    finally:
+        process.send_signal(signal.SIGINT)
+        process.wait(timeout=60)
+        reader.join(timeout=60)
+    stderr = "".join(lines)
+
+    assert process.returncode == 1
+    assert stderr.count("Test [1/2] changed: Changed") == 2
+    assert stderr.count("Test [2/2] unchanged: Unchanged") == 1
+    assert "Test [1] changed: failed" in stderr
+    assert "1 tests passed, 1 failures, 0 unsupported features" in stderr
+    # the re-runs are journaled like the first run
+    journal = [
+        json.loads(line)
+        for line in (tmp_path / "journal.jsonl").read_text().splitlines()
+    ]
+    assert sorted(record["id"] for record in journal if "id" in record) == [
+        "changed",
+        "changed",
+        "unchanged",
+    ]
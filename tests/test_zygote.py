@@ -0,0 +1,45 @@
+import os
+from pathlib import Path
+
+import defusedxml.ElementTree as ET
+
+from .util import get_data, run_with_mock_cwl_runner
+
+
+def _run(*args: str) -> tuple[int, str]:
+    mock_runner = get_data("tests/test-data/mock_cwl_runner.py")
+    cwd = os.getcwd()
+    try:
+        os.chdir(get_data("tests/test-data/"))
+        error_code, _, stderr = run_with_mock_cwl_runner(
+            ["--zygote", f"{mock_runner}:main", *args], cwl_runner="no-such-runner"
+        )
+    finally:
+        os.chdir(cwd)
+    return error_code, stderr
+
+
+def test_zygote() -> None:
+    """Forked tests have the exit codes of the runner, 33 included."""
+    error_code, stderr = _run("--test", "badgedir.yaml", "-j", "3")
+    assert error_code == 1
+    assert "2 tests passed, 2 failures, 2 unsupported features" in stderr
+
+
+def test_zygote_timeout(tmp_path: Path) -> None:
+    """A forked test that times out is killed, and its outputs are kept."""
+    junit_xml_report = tmp_path / "junit-report.xml"
+    error_code, stderr = _run(
+        "--test",
+        "timeout.yml",
+        "--timeout",
+        "2",
+        "--junit-xml",
+        str(junit_xml_report),
+    )
+    assert error_code == 1
+    assert "Test 1 timed out" in stderr
+    tree = ET.parse(junit_xml_report)
+    assert (root := tree.getroot()) is not None
+    assert (system_err := root.find("testsuite/testcase/system-err")) is not None
+    assert "timeout stderr" in (system_err.text or "")